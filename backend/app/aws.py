@@ -0,0 +1,76 @@
+"""
+Shared boto3 session and client factory
+
+All AWS clients come from one boto3 Session, so credentials are resolved
+once per process, and are configured from Settings: connection pool size,
+retry mode, per-service timeouts and endpoint URLs (e.g. a local stand-in
+such as benchmarks/aws_standin.py). Every client is instrumented for
+/api/metrics.
+"""
+import threading
+from functools import lru_cache
+
+from .config import get_settings
+from .metrics import instrument_client
+
+# Session.client() is not thread-safe
+_client_lock = threading.Lock()
+
+
+@lru_cache()
+def get_session():
+    """Get the process-wide boto3 session"""
+    import boto3
+    settings = get_settings()
+    # Credentials come from the default chain (execution role in Lambda,
+    # env vars or ~/.aws locally); only the profile can be pinned here
+    if settings.aws_profile:
+        return boto3.Session(region_name=settings.aws_region, profile_name=settings.aws_profile)
+    return boto3.Session(region_name=settings.aws_region)
+
+
+def create_client(service_name: str):
+    """
+    Create a boto3 client with the tuned configuration
+
+    Args:
+        service_name: boto3 service name, e.g. "bedrock-runtime"
+
+    Returns:
+        boto3 client
+    """
+    from botocore.config import Config
+    settings = get_settings()
+
+    read_timeouts = {
+        "bedrock-runtime": settings.bedrock_read_timeout,
+        "s3": settings.s3_read_timeout,
+        "lambda": settings.lambda_read_timeout,
+    }
+    endpoint_urls = {
+        "bedrock": settings.bedrock_endpoint_url,
+        "bedrock-runtime": settings.bedrock_endpoint_url,
+        "s3": settings.s3_endpoint_url,
+        "lambda": settings.lambda_endpoint_url,
+    }
+    config = Config(
+        max_pool_connections=settings.aws_max_pool_connections,
+        connect_timeout=settings.aws_connect_timeout,
+        read_timeout=read_timeouts.get(service_name, settings.aws_read_timeout),
+        retries={
+            # "adaptive" adds client-side rate limiting on top of the
+            # jittered exponential backoff of "standard"
+            "mode": settings.aws_retry_mode,
+            "total_max_attempts": settings.aws_max_attempts,
+        },
+        tcp_keepalive=True,
+        # "path" puts the bucket in the URL path, for endpoints without
+        # per-bucket DNS names
+        s3={"addressing_style": settings.s3_addressing_style},
+    )
+    # None keeps boto3's own resolution (AWS_ENDPOINT_URL_* env vars, then AWS)
+    endpoint_url = endpoint_urls.get(service_name) or settings.aws_endpoint_url or None
+
+    with _client_lock:
+        client = get_session().client(service_name, config=config, endpoint_url=endpoint_url)
+    return instrument_client(client)
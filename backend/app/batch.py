@@ -0,0 +1,53 @@
+import asyncio
+from collections import defaultdict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
+
+from .models import PromptRequest, PromptResponse, BatchPromptResult
+
+
+class BatchRunner:
+    """Runs a set of prompt requests concurrently under per-model limits"""
+
+    def __init__(
+        self,
+        invoke: Callable[[PromptRequest], Awaitable[PromptResponse]],
+        per_model_concurrency: int
+    ):
+        """
+        Args:
+            invoke: Coroutine that runs a single prompt request
+            per_model_concurrency: Max in-flight requests for any one model
+        """
+        self.invoke = invoke
+        self.per_model_concurrency = per_model_concurrency
+
+    async def run(self, requests: List[PromptRequest]) -> AsyncIterator[BatchPromptResult]:
+        """
+        Run all requests, yielding each result as soon as it finishes
+
+        Failures are reported in the result's `error` field instead of
+        aborting the rest of the batch.
+        """
+        limits: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self.per_model_concurrency)
+        )
+
+        async def run_one(index: int, request: PromptRequest) -> BatchPromptResult:
+            async with limits[request.model_id]:
+                try:
+                    response = await self.invoke(request)
+                    return BatchPromptResult(index=index, request=request, response=response)
+                except Exception as e:
+                    return BatchPromptResult(index=index, request=request, error=str(e))
+
+        tasks = [
+            asyncio.ensure_future(run_one(index, request))
+            for index, request in enumerate(requests)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away mid-stream: don't keep spending on the rest
+            for task in tasks:
+                task.cancel()
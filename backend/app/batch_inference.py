@@ -0,0 +1,349 @@
+"""
+Bedrock batch inference
+
+Runs large prompt sets as Bedrock model-invocation jobs instead of one
+InvokeModel call per prompt. Batch jobs run asynchronously at batch
+pricing and don't count against the on-demand quotas.
+
+A run goes through three stages, checkpointed in S3 so the job can span
+several Lambda invocations (see JobContinuation):
+
+1. submit: the requests are grouped by model, serialized with each
+   model's adapter into JSONL files ({"recordId", "modelInput"}) and one
+   invocation job is created per model
+2. poll: GetModelInvocationJob until every job has finished
+3. collect: the output files ({"recordId", "modelOutput" | "error"}) are
+   streamed line by line into one NDJSON file of results, each with a
+   PromptResponse-shaped "response" or an "error"
+"""
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from .jobs import JobContinuation
+from .providers import ProviderRegistry
+from .s3_client import ChunkReader
+
+logger = logging.getLogger(__name__)
+
+SUBMITTED = "submitted"
+COLLECTED = "collected"
+
+# Bedrock statuses after which a job produces no more output
+TERMINAL_STATUSES = {"Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"}
+# Statuses whose output files have records to collect
+OUTPUT_STATUSES = {"Completed", "PartiallyCompleted"}
+
+
+class BatchInferenceError(Exception):
+    """Every Bedrock invocation job of a run ended without output"""
+
+    def __init__(self, message: str, jobs: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.jobs = jobs
+
+
+def _record_id(index: int) -> str:
+    """Record IDs carry the request's position in the prompt set"""
+    return f"{index:011d}"
+
+
+class BatchInferenceRunner:
+    """Runs batch inference jobs"""
+
+    def __init__(
+        self,
+        control_client_factory,
+        s3_client,
+        job_store,
+        providers: ProviderRegistry,
+        role_arn: str,
+        prefix: str = "batch-inference",
+        records_per_file: int = 10000,
+        min_records: int = 100,
+        timeout_hours: int = 24,
+        poll_seconds: float = 60,
+        time_budget_seconds: float = 780
+    ):
+        """
+        Args:
+            control_client_factory: Callable returning a Bedrock control-plane client
+            s3_client: S3Client for inputs, outputs and checkpoints
+            job_store: JobStore the progress is reported to
+            providers: Registry resolving each model's request format
+            role_arn: IAM role Bedrock assumes to read and write the S3 prefix
+            prefix: S3 prefix for job inputs, outputs and state
+            records_per_file: Max records per input file
+            min_records: Bedrock's minimum number of records per job
+            timeout_hours: Bedrock job timeout
+            poll_seconds: Delay between status checks
+            time_budget_seconds: Run time after which the job checkpoints and
+                continues in a new execution (keep under the Lambda timeout)
+        """
+        self.control_client_factory = control_client_factory
+        self.s3_client = s3_client
+        self.job_store = job_store
+        self.providers = providers
+        self.role_arn = role_arn
+        self.prefix = prefix.rstrip("/")
+        self.records_per_file = records_per_file
+        self.min_records = min_records
+        self.timeout_hours = timeout_hours
+        self.poll_seconds = poll_seconds
+        self.time_budget_seconds = time_budget_seconds
+        self._control_client = None
+
+    @property
+    def control_client(self):
+        if self._control_client is None:
+            self._control_client = self.control_client_factory()
+        return self._control_client
+
+    def requests_key(self, job_id: str) -> str:
+        return self._key(job_id, "requests.jsonl")
+
+    def results_key(self, job_id: str) -> str:
+        return self._key(job_id, "results.jsonl")
+
+    def check_requests(self, requests: List[Dict[str, Any]]):
+        """
+        Validate a prompt set before it is stored
+
+        Raises:
+            ValueError: if a model can't run as a batch job or has too few records
+        """
+        counts: Dict[str, int] = {}
+        for request in requests:
+            counts[request["model_id"]] = counts.get(request["model_id"], 0) + 1
+        for model_id, count in counts.items():
+            adapter = self.providers.resolve(model_id)
+            if adapter.operation != "InvokeModel":
+                raise ValueError(f"Model {model_id} uses the {adapter.name} adapter, which batch inference doesn't support")
+            if count < self.min_records:
+                raise ValueError(
+                    f"Batch inference needs at least {self.min_records} requests per model "
+                    f"({model_id} has {count}); use /api/prompt/batch for small sets"
+                )
+
+    def store_requests(self, job_id: str, requests: List[Dict[str, Any]]):
+        """Write the prompt set (PromptRequest.invocation_params dicts) for a job"""
+        body = "".join(json.dumps(request, ensure_ascii=False) + "\n" for request in requests)
+        self.s3_client.put_object_bytes(
+            self.requests_key(job_id), body.encode("utf-8"), content_type="application/x-ndjson"
+        )
+
+    def run(self, job_id: str) -> Dict[str, Any]:
+        """
+        Run (or continue) a batch inference job
+
+        Returns:
+            Summary with the results key, record counts and the Bedrock jobs
+
+        Raises:
+            BatchInferenceError: if no Bedrock job produced output
+        """
+        started = time.monotonic()
+        state = self._load_state(job_id) or {"stage": None, "jobs": []}
+
+        if state["stage"] is None:
+            self._submit(job_id, state)
+            state["stage"] = SUBMITTED
+            self._save_state(job_id, state)
+            self._report_progress(job_id, state)
+
+        if state["stage"] == SUBMITTED:
+            while not self._poll(state):
+                self._save_state(job_id, state)
+                self._report_progress(job_id, state)
+                if time.monotonic() - started + self.poll_seconds > self.time_budget_seconds:
+                    raise JobContinuation()
+                time.sleep(self.poll_seconds)
+            if not any(job["status"] in OUTPUT_STATUSES for job in state["jobs"]):
+                messages = "; ".join(f"{job['model_id']}: {job['status']} {job.get('message') or ''}".strip()
+                                     for job in state["jobs"])
+                raise BatchInferenceError(f"No batch inference job produced output ({messages})", state["jobs"])
+            state["summary"] = self._collect(job_id, state)
+            state["stage"] = COLLECTED
+            self._save_state(job_id, state)
+            self._report_progress(job_id, state)
+
+        return {
+            "results_key": self.results_key(job_id),
+            **state["summary"],
+            "jobs": state["jobs"]
+        }
+
+    def iter_results(self, job_id: str) -> Iterator[bytes]:
+        """Stream the NDJSON results of a collected job"""
+        body = self.s3_client.open_object_stream(self.results_key(job_id))
+        yield from body.iter_chunks(64 * 1024)
+
+    # -- stages -------------------------------------------------------------
+
+    def _submit(self, job_id: str, state: Dict[str, Any]):
+        """
+        Write the input files and create one invocation job per model
+
+        The input files and every created job are saved in the state as
+        they are done, so an execution that re-enters this stage (e.g.
+        after a crash) only creates the jobs still missing. Job names and
+        client request tokens are derived from the job ID, so creating a
+        job that was created but not yet recorded returns the same job.
+        """
+        if "inputs" not in state:
+            state["inputs"] = self._write_inputs(job_id)
+            self._save_state(job_id, state)
+
+        bucket = self.s3_client.bucket_name
+        submitted = {job["model_id"] for job in state["jobs"]}
+        for index, (model_id, keys) in enumerate(state["inputs"].items()):
+            if model_id in submitted:
+                continue
+            slug = self._slug(model_id)
+            input_uri = f"s3://{bucket}/{self._key(job_id, f'input/{slug}/')}"
+            output_uri = f"s3://{bucket}/{self._key(job_id, f'output/{slug}/')}"
+            response = self.control_client.create_model_invocation_job(
+                jobName=f"{self._slug(f'prompt-tester-{job_id}')[:58]}-{index}",
+                roleArn=self.role_arn,
+                modelId=model_id,
+                clientRequestToken=f"{job_id}-{slug}"[:256],
+                inputDataConfig={"s3InputDataConfig": {"s3Uri": input_uri, "s3InputFormat": "JSONL"}},
+                outputDataConfig={"s3OutputDataConfig": {"s3Uri": output_uri}},
+                timeoutDurationInHours=self.timeout_hours
+            )
+            state["jobs"].append({
+                "model_id": model_id,
+                "job_arn": response["jobArn"],
+                "input_files": len(keys),
+                "output_prefix": self._key(job_id, f"output/{slug}/"),
+                "status": "Submitted",
+                "message": None
+            })
+            self._save_state(job_id, state)
+
+    def _write_inputs(self, job_id: str) -> Dict[str, List[str]]:
+        """Serialize the prompt set into per-model JSONL input files"""
+        files: Dict[str, List[str]] = {}
+        pending: Dict[str, List[str]] = {}
+
+        def flush(model_id: str):
+            lines = pending.pop(model_id, [])
+            if not lines:
+                return
+            key = self._key(job_id, f"input/{self._slug(model_id)}/{len(files.setdefault(model_id, [])):05d}.jsonl")
+            self.s3_client.put_object_bytes(key, "".join(lines).encode("utf-8"), content_type="application/x-ndjson")
+            files[model_id].append(key)
+
+        body = self.s3_client.open_object_stream(self.requests_key(job_id))
+        with io.TextIOWrapper(body, encoding="utf-8") as text:
+            for index, line in enumerate(text):
+                request = json.loads(line)
+                model_id = request["model_id"]
+                model_input = self.providers.resolve(model_id).build_request(
+                    request.get("prompt"),
+                    request["temperature"],
+                    request["max_tokens"],
+                    request["top_p"],
+                    request.get("system"),
+                    request.get("messages")
+                )
+                lines = pending.setdefault(model_id, [])
+                lines.append(json.dumps({"recordId": _record_id(index), "modelInput": model_input}) + "\n")
+                if len(lines) >= self.records_per_file:
+                    flush(model_id)
+        for model_id in list(pending):
+            flush(model_id)
+        return files
+
+    def _poll(self, state: Dict[str, Any]) -> bool:
+        """Refresh the status of unfinished jobs; True when all have finished"""
+        for job in state["jobs"]:
+            if job["status"] in TERMINAL_STATUSES:
+                continue
+            response = self.control_client.get_model_invocation_job(jobIdentifier=job["job_arn"])
+            job["status"] = response["status"]
+            job["message"] = response.get("message")
+        return all(job["status"] in TERMINAL_STATUSES for job in state["jobs"])
+
+    def _collect(self, job_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Stream every output file into the results file"""
+        summary = {"records": 0, "errors": 0, "tokens_used": 0}
+
+        def lines() -> Iterator[bytes]:
+            for job in state["jobs"]:
+                if job["status"] not in OUTPUT_STATUSES:
+                    continue
+                adapter = self.providers.resolve(job["model_id"])
+                for key in self.s3_client.list_keys(job["output_prefix"]):
+                    if not key.endswith(".jsonl.out"):
+                        continue
+                    body = self.s3_client.open_object_stream(key)
+                    with io.TextIOWrapper(body, encoding="utf-8") as text:
+                        for line in text:
+                            if line.strip():
+                                result = self._parse_record(json.loads(line), job["model_id"], adapter, summary)
+                                yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+
+        self.s3_client.upload_stream(
+            ChunkReader(lines()),
+            "results.jsonl",
+            content_type="application/x-ndjson",
+            s3_key=self.results_key(job_id)
+        )
+        return summary
+
+    def _parse_record(self, record: Dict[str, Any], model_id: str, adapter, summary: Dict[str, int]) -> Dict[str, Any]:
+        summary["records"] += 1
+        result = {"index": int(record["recordId"]), "model_id": model_id, "response": None, "error": None}
+        error = record.get("error")
+        if error is None and "modelOutput" not in record:
+            error = {"errorMessage": "Record has no output"}
+        if error is not None:
+            summary["errors"] += 1
+            result["error"] = error.get("errorMessage") if isinstance(error, dict) else str(error)
+            return result
+        parsed = adapter.parse_response(record["modelOutput"], {})
+        summary["tokens_used"] += parsed.get("tokens_used") or 0
+        result["response"] = {
+            **parsed,
+            "model_id": model_id,
+            # Batch records have no per-request latency
+            "response_time_ms": 0,
+            "timestamp": datetime.utcnow().isoformat(),
+            "cached": False
+        }
+        return result
+
+    # -- S3 state -------------------------------------------------------------
+
+    def _key(self, job_id: str, name: str) -> str:
+        return f"{self.prefix}/{job_id}/{name}"
+
+    @staticmethod
+    def _slug(model_id: str) -> str:
+        return "".join(c if c.isalnum() or c == "-" else "-" for c in model_id)
+
+    def _load_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = self.s3_client.get_object_bytes(self._key(job_id, "state.json"))
+        return json.loads(data) if data else None
+
+    def _save_state(self, job_id: str, state: Dict[str, Any]):
+        self.s3_client.put_object_bytes(
+            self._key(job_id, "state.json"),
+            json.dumps(state).encode("utf-8"),
+            content_type="application/json"
+        )
+
+    def _report_progress(self, job_id: str, state: Dict[str, Any]):
+        progress = {
+            "stage": state["stage"],
+            "jobs": {job["model_id"]: job["status"] for job in state["jobs"]}
+        }
+        try:
+            self.job_store.update(job_id, progress=progress)
+        except Exception:
+            # Progress is informational; never fail the run over it
+            logger.warning("Could not report progress of batch inference job %s", job_id, exc_info=True)
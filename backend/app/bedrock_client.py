@@ -1,8 +1,43 @@
-import json
-import boto3
-from typing import Dict, Any, List
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, List, Iterator, AsyncIterator, Optional
 from botocore.exceptions import ClientError
+from .aws import create_client
+from .config import get_settings
+from .metrics import MODEL_LABELS, REGISTRY, run_in_threadpool, timed, THROTTLE_CODES
 from .models import ModelInfo
+from .providers import Content, ProviderRegistry, flatten_prompt
+from .rate_limiter import RateLimiter, ThrottlingError, estimate_request_tokens
+from .response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_REQUESTS = REGISTRY.counter(
+    "bedrock_single_flight_requests_total",
+    "Deterministic invocations by single-flight role (leader = called Bedrock, follower = shared its call)",
+    ("model_id", "role")
+)
+
+
+@contextmanager
+def _bedrock_errors(action: str):
+    """Re-raise errors of a Bedrock call with `action` as context"""
+    try:
+        yield
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        if error_code in THROTTLE_CODES:
+            raise ThrottlingError(f"Bedrock throttled the request ({error_code}): {error_message}")
+        raise Exception(f"Bedrock error ({error_code}): {error_message}")
+    except Exception as e:
+        raise Exception(f"{action}: {str(e)}")
 
 
 class BedrockClient:
@@ -24,10 +59,37 @@ class BedrockClient:
         # ),
     ]
     
-    def __init__(self):
-        # Hardcoded configuration for simplicity
+    def __init__(
+        self,
+        response_cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        semantic_cache=None
+    ):
         # In Lambda, boto3 automatically uses the execution role
-        self.client = boto3.client("bedrock-runtime", region_name="us-east-1")
+        self.client = create_client("bedrock-runtime")
+        
+        # boto3 calls are blocking, so async callers run them on a bounded
+        # pool; its size is the max number of in-flight Bedrock requests
+        settings = get_settings()
+        self.max_concurrency = settings.bedrock_max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="bedrock"
+        )
+        
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        # Optional SemanticCache for near-duplicate prompts
+        self.semantic_cache = semantic_cache
+        
+        # Deterministic calls in flight, shared by identical concurrent requests
+        self.single_flight = settings.bedrock_single_flight
+        self._in_flight: Dict[str, concurrent.futures.Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self.providers = ProviderRegistry(
+            overrides=settings.bedrock_model_providers,
+            default=settings.bedrock_default_provider
+        )
     
     def get_available_models(self) -> List[ModelInfo]:
         """Get list of available models"""
@@ -39,106 +101,374 @@ class BedrockClient:
         model_id: str,
         temperature: float = 0.7,
         max_tokens: int = 2048,
-        top_p: float = 0.9
+        top_p: float = 0.9,
+        system: Optional[Content] = None,
+        messages: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Invoke a Bedrock model with the given prompt
         
         Args:
-            prompt: The input prompt
+            prompt: The input prompt (None when `messages` is given)
             model_id: Bedrock model ID
             temperature: Sampling temperature (0-1)
             max_tokens: Maximum tokens to generate
             top_p: Top-p sampling parameter
+            system: Optional system prompt
+            messages: Optional conversation [{"role", "content"}]; content
+                blocks with "cache": True end a cacheable prompt prefix
             
         Returns:
             Dict with response text and metadata
         """
-        try:
-            # Build request body based on provider
-            if "anthropic" in model_id:
-                body = self._build_anthropic_request(prompt, temperature, max_tokens, top_p)
-            elif "meta.llama" in model_id:
-                body = self._build_llama_request(prompt, temperature, max_tokens, top_p)
-            elif "amazon.titan" in model_id:
-                body = self._build_titan_request(prompt, temperature, max_tokens, top_p)
-            else:
-                raise ValueError(f"Unsupported model: {model_id}")
-            
-            # Invoke model
-            response = self.client.invoke_model(
-                modelId=model_id,
-                body=json.dumps(body)
+        with _bedrock_errors("Error invoking model"):
+            prepared = self._prepare(
+                prompt, model_id, temperature, max_tokens, top_p, system, messages
             )
+        return self._invoke_prepared(model_id, prepared)
+    
+    def _invoke_prepared(self, model_id: str, prepared: tuple) -> Dict[str, Any]:
+        """Return the cached response of a prepared request, or call the model"""
+        adapter, body, cache_key, semantic_query, cached = prepared
+        if cached is not None:
+            return {**cached, "cached": True}
+        
+        with _bedrock_errors("Error invoking model"):
+            response_body, headers = adapter.invoke(self.client, model_id, body)
             
-            # Parse response
-            response_body = json.loads(response["body"].read())
-            
-            # Extract text based on provider
-            if "anthropic" in model_id:
-                response_text = response_body["content"][0]["text"]
-                tokens_used = response_body.get("usage", {}).get("output_tokens")
-            elif "meta.llama" in model_id:
-                response_text = response_body["generation"]
-                tokens_used = response_body.get("generation_token_count")
-            elif "amazon.titan" in model_id:
-                response_text = response_body["results"][0]["outputText"]
-                tokens_used = response_body.get("inputTextTokenCount", 0) + \
-                             response_body["results"][0].get("tokenCount", 0)
-            else:
-                response_text = str(response_body)
-                tokens_used = None
-            
-            return {
-                "response_text": response_text,
-                "tokens_used": tokens_used,
+            result = {
+                **adapter.parse_response(response_body, headers),
                 "model_id": model_id
             }
+            MODEL_LABELS.admit(model_id)
+            if cache_key:
+                self.response_cache.set(cache_key, result)
+            self._semantic_store(semantic_query, result)
             
-        except ClientError as e:
-            error_code = e.response["Error"]["Code"]
-            error_message = e.response["Error"]["Message"]
-            raise Exception(f"Bedrock error ({error_code}): {error_message}")
-        except Exception as e:
-            raise Exception(f"Error invoking model: {str(e)}")
-    
-    def _build_anthropic_request(
-        self, prompt: str, temperature: float, max_tokens: int, top_p: float
-    ) -> Dict[str, Any]:
-        """Build request body for Anthropic models"""
-        return {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "top_p": top_p,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        }
+            return {**result, "cached": False}
     
-    def _build_llama_request(
-        self, prompt: str, temperature: float, max_tokens: int, top_p: float
+    async def invoke_model_async(
+        self,
+        prompt: str,
+        model_id: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2048,
+        top_p: float = 0.9,
+        system: Optional[Content] = None,
+        messages: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
-        """Build request body for Llama models"""
-        return {
+        """
+        Invoke a Bedrock model without blocking the event loop
+        
+        Runs invoke_model on the client's executor. When all workers are
+        busy, calls wait for a free slot instead of opening more connections.
+        With a rate limiter, the call first waits for admission under the
+        model's quotas (AdmissionTimeoutError if that takes too long).
+        Responses served from the caches skip both.
+        
+        Identical deterministic (temperature 0) requests made while one is
+        already in flight don't call Bedrock again: they wait for that call
+        and get its result (or its error), marked "deduplicated".
+        
+        Args:
+            Same as invoke_model
+            
+        Returns:
+            Dict with response text and metadata
+        """
+        params = {
             "prompt": prompt,
+            "model_id": model_id,
             "temperature": temperature,
+            "max_tokens": max_tokens,
             "top_p": top_p,
-            "max_gen_len": max_tokens
+            "system": system,
+            "messages": messages
         }
+        key = self._single_flight_key(params)
+        if key is None:
+            return await self._invoke_admitted(**params)
+        
+        with self._in_flight_lock:
+            shared = self._in_flight.get(key)
+            if shared is None:
+                # A thread-safe future, so callers on other event loops
+                # (evaluation jobs) can wait on it too
+                shared = concurrent.futures.Future()
+                self._in_flight[key] = shared
+                leader = True
+            else:
+                leader = False
+        
+        if not leader:
+            SINGLE_FLIGHT_REQUESTS.inc(model_id=MODEL_LABELS(model_id), role="follower")
+            # Shielded: a follower giving up must not cancel the shared call
+            result = await asyncio.shield(asyncio.wrap_future(shared))
+            return {**result, "deduplicated": True}
+        
+        SINGLE_FLIGHT_REQUESTS.inc(model_id=MODEL_LABELS(model_id), role="leader")
+        # Run the call as its own task so the followers still get the
+        # result if the leader's request is cancelled (client disconnect)
+        task = asyncio.ensure_future(self._invoke_admitted(**params))
+        task.add_done_callback(functools.partial(self._settle_in_flight, key, shared))
+        return await asyncio.shield(task)
     
-    def _build_titan_request(
-        self, prompt: str, temperature: float, max_tokens: int, top_p: float
+    async def _invoke_admitted(
+        self,
+        prompt: str,
+        model_id: str,
+        temperature: float,
+        max_tokens: int,
+        top_p: float,
+        system: Optional[Content],
+        messages: Optional[List[Dict[str, Any]]]
     ) -> Dict[str, Any]:
-        """Build request body for Amazon Titan models"""
-        return {
-            "inputText": prompt,
-            "textGenerationConfig": {
-                "temperature": temperature,
-                "topP": top_p,
-                "maxTokenCount": max_tokens
+        """Serve a cached response, or wait for admission and call the model on the executor"""
+        # Cache lookups don't use a Bedrock slot, so they run before
+        # admission (off the executor: persistent tiers do I/O)
+        with _bedrock_errors("Error invoking model"):
+            prepared = await run_in_threadpool(
+                self._prepare, prompt, model_id, temperature, max_tokens, top_p, system, messages
+            )
+        if prepared[-1] is not None:
+            return {**prepared[-1], "cached": True}
+        
+        admission, reserved = await self._admit(
+            flatten_prompt(prompt, system, messages), model_id, max_tokens
+        )
+        result = None
+        throttled = False
+        try:
+            loop = asyncio.get_running_loop()
+            # Keep the caller's context (request timings) in the worker thread
+            context = contextvars.copy_context()
+            result = await loop.run_in_executor(
+                self._executor,
+                functools.partial(context.run, self._invoke_prepared, model_id, prepared)
+            )
+            return result
+        except ThrottlingError:
+            throttled = True
+            raise
+        finally:
+            self._release(admission, reserved, max_tokens, result, throttled)
+    
+    def invoke_model_stream(
+        self,
+        prompt: str,
+        model_id: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2048,
+        top_p: float = 0.9,
+        system: Optional[Content] = None,
+        messages: Optional[List[Dict[str, Any]]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Invoke a Bedrock model and yield the completion as it is generated
+        
+        Args:
+            Same as invoke_model
+            
+        Yields:
+            {"type": "chunk", "text": ...} for every text delta, then a final
+            {"type": "done", ...} event with the same fields as invoke_model
+        """
+        with _bedrock_errors("Error streaming model response"):
+            prepared = self._prepare(
+                prompt, model_id, temperature, max_tokens, top_p, system, messages
+            )
+        yield from self._stream_prepared(model_id, prepared)
+    
+    def _stream_prepared(self, model_id: str, prepared: tuple) -> Iterator[Dict[str, Any]]:
+        """Replay the cached response of a prepared request, or stream the model's"""
+        adapter, body, cache_key, semantic_query, cached = prepared
+        if cached is not None:
+            # A cached response is replayed as a single chunk
+            yield {"type": "chunk", "text": cached["response_text"]}
+            yield {"type": "done", **cached, "cached": True}
+            return
+        
+        with _bedrock_errors("Error streaming model response"):
+            parts = []
+            usage = {}
+            for chunk in adapter.invoke_stream(self.client, model_id, body):
+                text = adapter.parse_stream_chunk(chunk, usage)
+                if text:
+                    parts.append(text)
+                    yield {"type": "chunk", "text": text}
+            
+            result = {
+                "response_text": "".join(parts),
+                **adapter.stream_usage(usage),
+                "model_id": model_id
             }
-        }
+            MODEL_LABELS.admit(model_id)
+            if cache_key:
+                self.response_cache.set(cache_key, result)
+            self._semantic_store(semantic_query, result)
+            
+            yield {"type": "done", **result, "cached": False}
+    
+    async def invoke_model_stream_async(
+        self,
+        prompt: str,
+        model_id: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2048,
+        top_p: float = 0.9,
+        system: Optional[Content] = None,
+        messages: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async version of invoke_model_stream
+        
+        Each read from the event stream runs on the client's executor, so a
+        slow chunk never blocks the event loop. Cached responses are
+        replayed without waiting for admission.
+        """
+        with _bedrock_errors("Error streaming model response"):
+            prepared = await run_in_threadpool(
+                self._prepare, prompt, model_id, temperature, max_tokens, top_p, system, messages
+            )
+        if prepared[-1] is not None:
+            for event in self._stream_prepared(model_id, prepared):
+                yield event
+            return
+        
+        admission, reserved = await self._admit(
+            flatten_prompt(prompt, system, messages), model_id, max_tokens
+        )
+        result = None
+        throttled = False
+        try:
+            loop = asyncio.get_running_loop()
+            events = self._stream_prepared(model_id, prepared)
+            context = contextvars.copy_context()
+            done = object()
+            while True:
+                event = await loop.run_in_executor(self._executor, context.run, next, events, done)
+                if event is done:
+                    break
+                if event["type"] == "done":
+                    result = event
+                yield event
+        except ThrottlingError:
+            throttled = True
+            raise
+        finally:
+            self._release(admission, reserved, max_tokens, result, throttled)
+    
+    def _prepare(self, prompt, model_id, temperature, max_tokens, top_p, system, messages) -> tuple:
+        """
+        Build a request and look it up in the response cache, then the
+        semantic cache
+        
+        Returns:
+            (adapter, request body, response cache key or None,
+            SemanticQuery or None, cached response or None)
+        """
+        adapter = self.providers.resolve(model_id)
+        
+        # Build request body based on provider
+        with timed("bedrock-runtime", adapter.operation, "serialize"):
+            body = adapter.build_request(
+                prompt, temperature, max_tokens, top_p, system, messages
+            )
+            
+            # Serve repeated deterministic requests from the cache
+            cache_key = self._cache_key(model_id, body, temperature)
+            if cache_key:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return adapter, body, cache_key, None, cached
+        
+        # Then from an earlier prompt that is nearly the same
+        semantic_query, cached = self._semantic_lookup(
+            prompt, model_id, temperature, max_tokens, top_p, system, messages
+        )
+        return adapter, body, cache_key, semantic_query, cached
+    
+    async def _admit(self, prompt: str, model_id: str, max_tokens: int) -> tuple:
+        """
+        Wait for rate-limiter admission (no-op without a limiter)
+        
+        Returns:
+            (admission or None, tokens reserved)
+        """
+        if self.rate_limiter is None:
+            return None, 0
+        reserved = estimate_request_tokens(prompt, max_tokens, model_id)
+        return await self.rate_limiter.acquire(model_id, reserved), reserved
+    
+    def _release(
+        self,
+        admission,
+        reserved: int,
+        max_tokens: int,
+        result: Optional[Dict[str, Any]],
+        throttled: bool
+    ):
+        """
+        Return an admission slot, refunding what the call didn't use
+        
+        The reservation is the input estimate plus max_tokens, so what was
+        not used is the part of max_tokens the model didn't generate.
+        """
+        if admission is None:
+            return
+        unused = 0
+        if result is not None and result.get("output_tokens") is not None:
+            unused = max(0, max_tokens - result["output_tokens"])
+        admission.release(throttled=throttled, unused_tokens=unused)
+    
+    def _single_flight_key(self, params: Dict[str, Any]) -> Optional[str]:
+        """Key shared by identical deterministic requests, or None to not share"""
+        if not self.single_flight or params["temperature"] != 0:
+            return None
+        return ResponseCache.make_key(params["model_id"], params)
+    
+    def _settle_in_flight(self, key: str, shared: concurrent.futures.Future, task: asyncio.Future):
+        """Hand the leader's outcome to the followers"""
+        # Unregister first: later requests make a new call (or hit the cache)
+        with self._in_flight_lock:
+            self._in_flight.pop(key, None)
+        if task.cancelled():
+            shared.cancel()
+        elif task.exception() is not None:
+            shared.set_exception(task.exception())
+        else:
+            shared.set_result(task.result())
+    
+    def _semantic_lookup(self, prompt, model_id, temperature, max_tokens, top_p, system, messages) -> tuple:
+        """
+        Look a request up in the semantic cache (no-op without one)
+        
+        Returns:
+            (SemanticQuery or None, cached response or None)
+        """
+        if self.semantic_cache is None:
+            return None, None
+        try:
+            with timed("semantic-cache", "Lookup", "search"):
+                query = self.semantic_cache.query(prompt, model_id, temperature, max_tokens, top_p, system, messages)
+                return query, self.semantic_cache.get(query) if query is not None else None
+        except Exception as e:
+            # e.g. the embeddings model throttled: just call the model
+            logger.warning("Semantic cache lookup failed: %s", e)
+            return None, None
+    
+    def _semantic_store(self, query, result: Dict[str, Any]):
+        if query is None:
+            return
+        try:
+            self.semantic_cache.set(query, result)
+        except Exception as e:
+            logger.warning("Semantic cache insert failed: %s", e)
+    
+    def _cache_key(
+        self, model_id: str, body: Dict[str, Any], temperature: float
+    ) -> Optional[str]:
+        """Cache key for the request, or None if it should not be cached"""
+        if self.response_cache is None or not self.response_cache.is_cacheable(temperature):
+            return None
+        return self.response_cache.make_key(model_id, body)
@@ -0,0 +1,214 @@
+"""
+Lazily constructed AWS clients and shared services
+
+Building boto3 clients loads botocore service models and costs tens of
+milliseconds each, so they are created on first use instead of at import
+time. A cold /api/health call never pays for them.
+"""
+import os
+from functools import lru_cache
+
+from .config import get_settings
+
+
+@lru_cache()
+def get_s3_client():
+    """Get the shared S3 client"""
+    from .s3_client import S3Client
+    return S3Client()
+
+
+@lru_cache()
+def get_response_cache():
+    """Get the shared response cache (None if disabled)"""
+    from .response_cache import build_response_cache
+    settings = get_settings()
+    s3_client = get_s3_client() if settings.response_cache_backend.lower() == "s3" else None
+    cache = build_response_cache(settings, s3_client)
+    if cache is not None:
+        from .metrics import REGISTRY
+        REGISTRY.gauge_callback(
+            "response_cache_entries",
+            "Entries in the in-memory response cache",
+            lambda: {(): len(cache.memory)}
+        )
+    return cache
+
+
+@lru_cache()
+def get_semantic_cache():
+    """Get the shared semantic cache (None if disabled)"""
+    from .semantic_cache import build_semantic_cache
+    settings = get_settings()
+    s3_client = get_s3_client() if settings.semantic_cache_snapshot_s3_key else None
+    cache = build_semantic_cache(settings, s3_client)
+    if cache is not None:
+        from .metrics import REGISTRY
+        REGISTRY.gauge_callback(
+            "semantic_cache_entries",
+            "Entries in the semantic cache index",
+            lambda: {(): len(cache.index)}
+        )
+    return cache
+
+
+@lru_cache()
+def get_bedrock_client():
+    """Get the shared Bedrock client"""
+    from .bedrock_client import BedrockClient
+    from .rate_limiter import RateLimiter
+    settings = get_settings()
+    rate_limiter = RateLimiter(settings) if settings.bedrock_rate_limit_enabled else None
+    return BedrockClient(
+        response_cache=get_response_cache(),
+        rate_limiter=rate_limiter,
+        semantic_cache=get_semantic_cache()
+    )
+
+
+@lru_cache()
+def get_model_catalog():
+    """Get the shared Bedrock model catalog"""
+    from .aws import create_client
+    from .model_catalog import ModelCatalog
+    settings = get_settings()
+    bedrock_client = get_bedrock_client()
+    return ModelCatalog(
+        client_factory=lambda: create_client("bedrock"),
+        providers=bedrock_client.providers,
+        fallback=bedrock_client.get_available_models(),
+        ttl_seconds=settings.bedrock_catalog_ttl_seconds,
+        cache_path=settings.bedrock_catalog_cache_path,
+        max_tokens_overrides=settings.bedrock_model_max_tokens,
+        context_overrides=settings.bedrock_model_context_tokens
+    )
+
+
+@lru_cache()
+def get_history_store():
+    """Get the shared prompt history store (None if disabled)"""
+    from .history import build_history_store
+    settings = get_settings()
+    s3_client = get_s3_client() if settings.history_backend.lower() == "s3" else None
+    return build_history_store(settings, s3_client)
+
+
+@lru_cache()
+def get_lambda_client():
+    """Get the shared Lambda client"""
+    from .lambda_client import LambdaClient
+    return LambdaClient()
+
+
+@lru_cache()
+def get_processing_client():
+    """
+    Get the CSV processing backend selected by PROCESSING_BACKEND, behind
+    the result cache unless PROCESSING_CACHE_ENABLED is off
+
+    Both backends expose invoke_processing(csv_key, target, columns).
+    """
+    settings = get_settings()
+    backend = settings.processing_backend.lower()
+    if backend == "local":
+        from .local_processing import LocalProcessingClient
+        client = LocalProcessingClient(
+            s3_client=get_s3_client(),
+            chunk_rows=settings.processing_chunk_rows,
+            max_distinct=settings.processing_max_distinct,
+            indexer=get_columnar_indexer()
+        )
+    elif backend == "remote":
+        client = get_lambda_client()
+    else:
+        raise ValueError(f"Unknown processing backend: {backend}")
+
+    from .processing_cache import build_processing_cache
+    cache = build_processing_cache(settings, client, get_s3_client())
+    return cache if cache is not None else client
+
+
+@lru_cache()
+def get_columnar_indexer():
+    """Get the shared ingest indexer (columnar copies and column indexes)"""
+    from .columnar import ColumnarIndexer
+    settings = get_settings()
+    return ColumnarIndexer(
+        s3_client=get_s3_client(),
+        chunk_rows=settings.processing_chunk_rows,
+        max_distinct=settings.processing_max_distinct,
+        columnar=settings.ingest_columnar,
+        cache_ttl_seconds=settings.ingest_index_cache_ttl_seconds
+    )
+
+
+@lru_cache()
+def get_job_runner():
+    """Get the shared background job runner"""
+    from .jobs import JobRunner, build_job_store
+    settings = get_settings()
+    s3_client = get_s3_client()
+
+    store = build_job_store(settings, s3_client)
+    dispatch = settings.job_dispatch.lower()
+    if dispatch == "auto":
+        # Another invocation only sees the job through a shared store
+        in_lambda = bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+        dispatch = "lambda" if in_lambda and store.shared else "thread"
+
+    runner = JobRunner(
+        store=store,
+        s3_client=s3_client,
+        lambda_client=get_lambda_client(),
+        dispatch=dispatch,
+        workers=settings.job_workers,
+        results_prefix=settings.jobs_s3_prefix,
+        stale_after_seconds=settings.job_stale_after_seconds
+    )
+    runner.register(
+        "process",
+        lambda job_id, **params: get_processing_client().invoke_processing(**params)
+    )
+
+    from .evaluation import EvaluationRunner
+    evaluations = EvaluationRunner(
+        bedrock_client=get_bedrock_client(),
+        s3_client=s3_client,
+        job_store=runner.store,
+        prefix=settings.evaluations_s3_prefix,
+        chunk_rows=settings.evaluation_checkpoint_rows,
+        time_budget_seconds=settings.job_time_budget_seconds,
+        max_retries=settings.evaluation_max_retries
+    )
+    runner.register(
+        "ingest",
+        lambda job_id, csv_key: get_columnar_indexer().ingest(csv_key)
+    )
+    runner.register(
+        "verify_upload",
+        lambda job_id, key: s3_client.verify_staged_upload(key)
+    )
+    runner.register("evaluate", evaluations.run)
+    runner.register("batch_inference", lambda job_id: get_batch_inference_runner().run(job_id))
+    return runner
+
+
+@lru_cache()
+def get_batch_inference_runner():
+    """Get the shared Bedrock batch inference runner"""
+    from .aws import create_client
+    from .batch_inference import BatchInferenceRunner
+    settings = get_settings()
+    return BatchInferenceRunner(
+        control_client_factory=lambda: create_client("bedrock"),
+        s3_client=get_s3_client(),
+        job_store=get_job_runner().store,
+        providers=get_bedrock_client().providers,
+        role_arn=settings.bedrock_batch_role_arn,
+        prefix=settings.bedrock_batch_s3_prefix,
+        records_per_file=settings.bedrock_batch_records_per_file,
+        min_records=settings.bedrock_batch_min_records,
+        timeout_hours=settings.bedrock_batch_timeout_hours,
+        poll_seconds=settings.bedrock_batch_poll_seconds,
+        time_budget_seconds=settings.job_time_budget_seconds
+    )
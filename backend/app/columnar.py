@@ -0,0 +1,433 @@
+"""
+Columnar copies and column-statistics indexes of uploaded CSVs
+
+Ingesting a CSV streams it once and writes two objects next to it:
+
+- {key}.index.json: a sidecar index with the schema, the row count and each
+  column's count, missing, distinct, min/max and top values. It is a few KB,
+  so listings and quick stats never read the CSV
+- {key}.parquet: the same rows in Parquet, one row group per chunk. Every
+  column keeps the CSV's text, so results are the same as from the CSV. A
+  reader fetches the footer and only the column chunks it needs, with
+  ranged GETs (S3RangeFile). It is uploaded in parts while it is written,
+  so neither memory nor /tmp ever holds the whole file
+
+The Parquet copy needs pyarrow; without it only the index is written.
+Indexes record the CSV's ETag, and an index whose ETag no longer matches
+the CSV is ignored. Content-addressed uploads ({sha256 prefix}_{name}) are
+checked against the bytes read, and deleted if the hash doesn't match;
+staged direct uploads are checked against the hash they declared and moved
+to their content-addressed key, which the index and Parquet copy follow.
+"""
+import csv
+import hashlib
+import io
+import itertools
+import json
+import math
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from .cache import TTLCache
+from .local_processing import ColumnStats
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: without it only indexes are written
+    pa = None
+    pq = None
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+COLUMNAR_SUFFIX = ".parquet"
+
+# Filename of a content-addressed upload: {sha256 prefix}_{original name}
+_CONTENT_ADDRESSED = re.compile(r"([0-9a-f]{16})_")
+
+
+class _HashingReader(io.RawIOBase):
+    """Passes a stream through while computing its SHA-256"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        self.digest.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _Pipe:
+    """
+    Bounded in-memory pipe from a writer to a reader thread
+
+    ParquetWriter writes into it while S3Client.upload_stream reads parts
+    out of it; at most `max_bytes` are buffered. Either side can fail the
+    pipe, which raises the error on the other side.
+    """
+
+    closed = False
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._chunks: deque = deque()
+        self._buffered = 0
+        self._written = 0
+        self._eof = False
+        self._error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._written
+
+    def flush(self):
+        pass
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        with self._condition:
+            self._condition.wait_for(lambda: self._buffered < self.max_bytes or self._error is not None)
+            if self._error is not None:
+                raise self._error
+            self._chunks.append(data)
+            self._buffered += len(data)
+            self._written += len(data)
+            self._condition.notify_all()
+        return len(data)
+
+    def finish(self, error: Optional[BaseException] = None):
+        """End of data, or abandon the transfer with `error`"""
+        with self._condition:
+            self._error = error
+            self._eof = True
+            self._condition.notify_all()
+
+    def read(self, size: int = -1) -> bytes:
+        parts, length = [], 0
+        with self._condition:
+            while size < 0 or length < size:
+                self._condition.wait_for(lambda: self._chunks or self._eof)
+                if self._error is not None:
+                    raise self._error
+                if not self._chunks:
+                    break
+                chunk = self._chunks.popleft()
+                if 0 <= size < length + len(chunk):
+                    self._chunks.appendleft(chunk[size - length:])
+                    chunk = chunk[:size - length]
+                self._buffered -= len(chunk)
+                parts.append(chunk)
+                length += len(chunk)
+                self._condition.notify_all()
+        return b"".join(parts)
+
+
+def _finite(value):
+    """JSON has no NaN or Infinity: such statistics are stored as null"""
+    return value if not isinstance(value, float) or math.isfinite(value) else None
+
+
+class S3RangeFile(io.RawIOBase):
+    """Seekable read-only file over an S3 object; every read is a ranged GET"""
+
+    def __init__(self, s3_client, s3_key: str, size: int):
+        self.s3_client = s3_client
+        self.s3_key = s3_key
+        self.size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        end = min(self._position + len(buffer), self.size)
+        if end <= self._position:
+            return 0
+        data = self.s3_client.read_range(self.s3_key, self._position, end - 1)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class _ColumnIndex:
+    """Index entry of one column: ColumnStats plus type and min/max"""
+
+    def __init__(self, max_distinct: int):
+        self.stats = ColumnStats(max_distinct)
+        self.integer = True
+        self.text_min: Optional[str] = None
+        self.text_max: Optional[str] = None
+
+    def update(self, values: tuple):
+        self.stats.update(values)
+        present = [v for v in values if v != ""]
+        if not present:
+            return
+        if self.stats.all_numeric and self.integer:
+            self.integer = all(v.lstrip("+-").isdigit() for v in present)
+        # Kept for every column: it may turn out not to be numeric later on
+        low, high = min(present), max(present)
+        self.text_min = low if self.text_min is None else min(self.text_min, low)
+        self.text_max = high if self.text_max is None else max(self.text_max, high)
+
+    def result(self, name: str, top_n: int) -> Dict[str, Any]:
+        stats = self.stats.result(top_n)
+        if not stats["count"]:
+            kind, low, high = "empty", None, None
+        elif stats["numeric"] is not None:
+            kind = "integer" if self.integer else "number"
+            # "nan" and "inf" parse as numbers
+            stats["numeric"] = {name: _finite(value) for name, value in stats["numeric"].items()}
+            low, high = stats["numeric"]["min"], stats["numeric"]["max"]
+            if self.integer:
+                low, high = int(low), int(high)
+        else:
+            kind, low, high = "string", self.text_min, self.text_max
+        return {"name": name, "type": kind, "min": low, "max": high, **stats}
+
+
+class ColumnarIndexer:
+    """Ingests uploaded CSVs into columnar copies and sidecar indexes"""
+
+    def __init__(
+        self,
+        s3_client,
+        chunk_rows: int = 50000,
+        max_distinct: int = 100000,
+        top_n: int = 20,
+        columnar: bool = True,
+        cache_ttl_seconds: float = 300
+    ):
+        """
+        Args:
+            s3_client: S3Client the CSVs are read from and written next to
+            chunk_rows: Rows per chunk (and per Parquet row group)
+            max_distinct: Distinct values tracked per column
+            top_n: Most frequent values kept per column
+            columnar: Also write the Parquet copy (needs pyarrow)
+            cache_ttl_seconds: How long loaded indexes are kept in memory
+        """
+        self.s3_client = s3_client
+        self.chunk_rows = chunk_rows
+        self.max_distinct = max_distinct
+        self.top_n = top_n
+        self.columnar = columnar and pa is not None
+        self._cache = TTLCache(1024, cache_ttl_seconds)
+
+    @staticmethod
+    def index_key(csv_key: str) -> str:
+        return csv_key + INDEX_SUFFIX
+
+    @staticmethod
+    def columnar_key(csv_key: str) -> str:
+        return csv_key + COLUMNAR_SUFFIX
+
+    def ingest(self, csv_key: str) -> Dict[str, Any]:
+        """
+        Build the index (and Parquet copy) of a CSV in S3
+
+        Args:
+            csv_key: S3 key of the CSV file (or of a staged upload)
+
+        Returns:
+            The index, as stored in {csv_key}.index.json (next to the
+            content-addressed copy for a staged upload)
+        """
+        head = self.s3_client.head_object(csv_key)
+        if head is None:
+            raise ValueError(f"File not found: {csv_key}")
+
+        body = _HashingReader(self.s3_client.open_object_stream(csv_key))
+        with io.TextIOWrapper(io.BufferedReader(body), encoding="utf-8-sig", newline="") as text:
+            reader = csv.reader(text)
+            header = [name.strip() for name in next(reader, None) or []]
+            if not header:
+                raise ValueError("CSV file is empty")
+            width = len(header)
+            columns = [_ColumnIndex(self.max_distinct) for _ in header]
+            # Duplicate names can't be projected by name
+            columnar = self.columnar and len(set(header)) == width
+
+            # The Parquet copy is named after the key the CSV ends up at, known
+            # up front, and streamed there while the rows are read
+            staged = self.s3_client.is_staging_key(csv_key)
+            final_key = self.s3_client.promoted_key(csv_key) if staged else csv_key
+            columnar_key = self.columnar_key(final_key) if columnar else None
+            pipe = _Pipe(self.s3_client.part_size) if columnar else None
+            uploader = ThreadPoolExecutor(max_workers=1) if columnar else None
+            upload = None
+            try:
+                if columnar:
+                    upload = uploader.submit(self._upload_columnar, pipe, columnar_key)
+                schema = pa.schema([(name, pa.string()) for name in header]) if columnar else None
+                with (pq.ParquetWriter(pipe, schema, compression="snappy") if columnar else nullcontext()) as writer:
+                    row_count = 0
+                    while True:
+                        chunk = list(itertools.islice(reader, self.chunk_rows))
+                        if not chunk:
+                            break
+                        # Pad short rows and drop cells beyond the header
+                        rows = [row[:width] if len(row) >= width else row + [""] * (width - len(row)) for row in chunk]
+                        row_count += len(rows)
+                        values = list(zip(*rows))
+                        for column, column_values in zip(columns, values):
+                            column.update(column_values)
+                        if writer is not None:
+                            writer.write_table(pa.Table.from_arrays(
+                                [pa.array(column_values, type=pa.string()) for column_values in values],
+                                schema=schema
+                            ))
+
+                # Make sure nothing at a content-addressed key lies about its content
+                sha256 = body.digest.hexdigest()
+                if staged:
+                    matches = sha256 == csv_key.split("/")[-1].partition("_")[0]
+                else:
+                    declared = _CONTENT_ADDRESSED.match(csv_key.split("/")[-1])
+                    matches = not declared or sha256.startswith(declared.group(1))
+                if not matches:
+                    # No Parquet copy of content that is being discarded
+                    self._abandon(pipe, upload)
+                    if staged:
+                        # Discards the staged upload and raises
+                        self.s3_client.promote_staged_upload(csv_key, sha256)
+                    self.s3_client.delete_keys([csv_key])
+                    raise ValueError(f"Content of {csv_key} doesn't match the hash in its key; the file was deleted")
+
+                if columnar:
+                    pipe.finish()
+                    upload.result()
+                if staged:
+                    # Verified while the bytes were read anyway
+                    csv_key = self.s3_client.promote_staged_upload(csv_key, sha256)["key"]
+                    head = self.s3_client.head_object(csv_key)
+            except BaseException as e:
+                self._abandon(pipe, upload, e)
+                raise
+            finally:
+                if uploader is not None:
+                    uploader.shutdown(wait=False)
+
+        index = {
+            "version": INDEX_VERSION,
+            "csv_key": csv_key,
+            "etag": head["etag"],
+            "size": head["size"],
+            "sha256": sha256,
+            "row_count": row_count,
+            "columnar_key": columnar_key,
+            "max_distinct": self.max_distinct,
+            "top_n": self.top_n,
+            "created_at": datetime.utcnow().isoformat(),
+            "columns": [column.result(name, self.top_n) for name, column in zip(header, columns)]
+        }
+        self.s3_client.put_object_bytes(
+            self.index_key(csv_key),
+            json.dumps(index, ensure_ascii=False).encode("utf-8"),
+            content_type="application/json"
+        )
+        self._cache.set(csv_key, index)
+        return index
+
+    def _upload_columnar(self, pipe: _Pipe, columnar_key: str):
+        try:
+            self.s3_client.upload_stream(
+                pipe,
+                columnar_key.split("/")[-1],
+                content_type="application/vnd.apache.parquet",
+                s3_key=columnar_key
+            )
+        except BaseException as e:
+            # Unblock the writer
+            pipe.finish(e)
+            raise
+
+    @staticmethod
+    def _abandon(pipe: Optional[_Pipe], upload, error: Optional[BaseException] = None):
+        """Stop a Parquet upload in progress; a multipart upload is aborted"""
+        if pipe is None or upload is None or upload.done():
+            return
+        pipe.finish(error or ValueError("Ingest abandoned"))
+        try:
+            upload.result()
+        except Exception:
+            pass
+
+    def get_index(self, csv_key: str, etag: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Load the index of a CSV
+
+        Args:
+            csv_key: S3 key of the CSV file
+            etag: The CSV's current ETag, if already known (else a HEAD request)
+
+        Returns:
+            The index, or None if the CSV was never ingested or changed since
+        """
+        if etag is None:
+            head = self.s3_client.head_object(csv_key)
+            if head is None:
+                return None
+            etag = head["etag"]
+        index = self._cache.get(csv_key)
+        if index is None or index["etag"] != etag:
+            data = self.s3_client.get_object_bytes(self.index_key(csv_key))
+            if data is None:
+                return None
+            index = json.loads(data)
+            self._cache.set(csv_key, index)
+        return index if index["etag"] == etag else None
+
+    def get_indexes(self, files: List[Dict[str, Any]], workers: int = 8) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Load the indexes of a page of list_files results, in parallel"""
+        if not files:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            indexes = pool.map(lambda f: self.get_index(f["key"], f.get("etag")), files)
+            return {f["key"]: index for f, index in zip(files, indexes)}
+
+    def iter_columns(self, index: Dict[str, Any], columns: List[str], batch_rows: int) -> Iterator[Dict[str, tuple]]:
+        """
+        Read only the given columns of an ingested CSV from its Parquet copy
+
+        Yields:
+            {column: tuple of raw CSV values} per batch of rows
+        """
+        if pq is None or not index.get("columnar_key"):
+            raise ValueError(f"No columnar copy of {index['csv_key']}")
+        head = self.s3_client.head_object(index["columnar_key"])
+        if head is None:
+            raise ValueError(f"Columnar copy not found: {index['columnar_key']}")
+        source = S3RangeFile(self.s3_client, index["columnar_key"], head["size"])
+        # pre_buffer coalesces the column chunks of a row group into few GETs
+        parquet = pq.ParquetFile(source, pre_buffer=True)
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=columns):
+            yield {column: tuple(batch.column(column).to_pylist()) for column in columns}
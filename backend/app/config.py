@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 from pathlib import Path
+from typing import Dict
 
 
 class Settings(BaseSettings):
@@ -12,12 +13,132 @@ class Settings(BaseSettings):
     aws_secret_access_key: str = ""
     aws_profile: str = ""
     
+    # AWS client tuning (shared by all boto3 clients)
+    aws_max_pool_connections: int = 50  # Keep >= bedrock_max_concurrency
+    aws_retry_mode: str = "adaptive"  # "legacy", "standard" or "adaptive"
+    aws_max_attempts: int = 5  # Total attempts, including the first call
+    aws_connect_timeout: float = 5
+    aws_read_timeout: float = 60  # Default for services without their own
+    bedrock_read_timeout: float = 300  # Long generations stream for minutes
+    s3_read_timeout: float = 60
+    lambda_read_timeout: float = 310  # Longer than the processing Lambda timeout
+    
+    # Endpoint URLs ("" = AWS); point them at a stand-in to run without AWS
+    aws_endpoint_url: str = ""  # All services, unless overridden below
+    bedrock_endpoint_url: str = ""  # Bedrock runtime and control plane
+    s3_endpoint_url: str = ""
+    lambda_endpoint_url: str = ""
+    s3_addressing_style: str = "auto"  # "auto", "virtual" or "path" (most stand-ins)
+    
     # S3 Configuration
-    s3_bucket_name: str = ""  # Nome do bucket S3
-    s3_upload_folder: str = "uploads"  # Pasta dentro do bucket
+    s3_bucket_name: str = "sant-sumun-dev"  # Nome do bucket S3
+    s3_upload_folder: str = "test/data"  # Pasta dentro do bucket
+    s3_multipart_part_size_mb: int = 8  # Part size for multipart uploads (min 5)
+    s3_upload_concurrency: int = 4  # Parts uploaded in parallel per file
+    s3_list_cache_ttl_seconds: int = 15  # Cache for /api/files pages
+    s3_list_max_pages: int = 3  # LIST calls per filtered /api/files page (then a partial page + cursor)
+    
+    # Bedrock Configuration
+    bedrock_max_concurrency: int = 10  # Max simultaneous Bedrock calls per process
+    bedrock_model_providers: Dict[str, str] = {}  # JSON: {"<model_id or prefix>": "<adapter>"}
+    bedrock_default_provider: str = ""  # Adapter for unknown models, e.g. "converse" ("" = reject)
+    bedrock_single_flight: bool = True  # Identical concurrent temperature=0 calls share one invocation
+    
+    # Model catalog (ListFoundationModels + inference profiles)
+    bedrock_catalog_ttl_seconds: int = 3600  # Refreshed in the background when older
+    bedrock_catalog_cache_path: str = "/tmp/model_catalog.json"  # "" = memory only
+    bedrock_model_max_tokens: Dict[str, int] = {}  # JSON: {"<model_id prefix>": max output tokens}
+    bedrock_default_max_tokens: int = 4096  # Limit for models with no known limit
+    bedrock_model_context_tokens: Dict[str, int] = {}  # JSON: {"<model_id prefix>": context window tokens}
+    token_estimate_tolerance: float = 0.1  # Estimates are discounted by this fraction before rejecting a prompt
+    
+    # Bedrock admission control (per model)
+    bedrock_rate_limit_enabled: bool = True
+    bedrock_default_rpm: int = 50  # Account quota: requests per minute
+    bedrock_default_tpm: int = 400000  # Account quota: tokens per minute
+    bedrock_model_quotas: Dict[str, Dict[str, int]] = {}  # JSON: {"<model_id>": {"rpm": .., "tpm": ..}}
+    bedrock_quota_headroom: float = 0.9  # Fraction of the quota to use
+    bedrock_initial_concurrency: int = 4  # AIMD starting limit (max: bedrock_max_concurrency)
+    bedrock_queue_timeout_seconds: float = 30  # Max wait for admission before HTTP 429
+    batch_per_model_concurrency: int = 4  # Max in-flight batch calls per model
+    batch_max_requests: int = 500  # Max expanded requests per batch
+    
+    # Bedrock batch inference (model-invocation jobs)
+    bedrock_batch_role_arn: str = ""  # Role Bedrock assumes to read/write the S3 prefix ("" = disabled)
+    bedrock_batch_s3_prefix: str = "batch-inference"
+    bedrock_batch_max_requests: int = 100000  # Max expanded requests per job
+    bedrock_batch_min_records: int = 100  # Bedrock's minimum per model-invocation job
+    bedrock_batch_records_per_file: int = 10000  # Records per JSONL input file
+    bedrock_batch_timeout_hours: int = 24
+    bedrock_batch_poll_seconds: float = 60
+    
+    # Response cache
+    response_cache_enabled: bool = True
+    response_cache_deterministic_only: bool = True  # Only cache temperature=0 calls
+    response_cache_max_entries: int = 1024
+    response_cache_ttl_seconds: int = 86400
+    response_cache_backend: str = ""  # "", "sqlite" or "s3"
+    response_cache_sqlite_path: str = "/tmp/response_cache.db"
+    response_cache_s3_prefix: str = "cache/responses"
+    
+    # Semantic cache (near-duplicate prompts; needs numpy)
+    semantic_cache_enabled: bool = False
+    semantic_cache_embedder: str = "hashing"  # "hashing" (local; only whitespace/casing changes hit) or "titan" (Bedrock embeddings; rewordings hit)
+    semantic_cache_embedding_model_id: str = "amazon.titan-embed-text-v2:0"
+    semantic_cache_dimensions: int = 512  # Vector size (Titan v2: 256, 512 or 1024; v1: 1536)
+    semantic_cache_threshold: float = 0.99  # Min cosine similarity for a hit
+    semantic_cache_model_thresholds: Dict[str, float] = {}  # JSON: {"<model_id prefix>": threshold}
+    semantic_cache_deterministic_only: bool = True  # Only cache temperature=0 calls
+    semantic_cache_max_entries: int = 5000  # Then expired / least recently used entries are replaced
+    semantic_cache_ttl_seconds: int = 86400
+    semantic_cache_snapshot_path: str = "/tmp/semantic_cache.npz"  # "" = no local snapshot
+    semantic_cache_snapshot_s3_key: str = ""  # e.g. "cache/semantic/index.npz" ("" = no S3 snapshot)
+    semantic_cache_snapshot_every: int = 50  # Inserts between snapshots
     
     # Lambda Configuration
-    lambda_function_name: str = ""  # Nome da função Lambda
+    lambda_function_name: str = "sumun-preprocess-columns"  # Nome da função Lambda
+    
+    # CSV processing
+    processing_backend: str = "remote"  # "remote" (Lambda) or "local" (in-process)
+    processing_chunk_rows: int = 50000  # Rows aggregated per chunk (local)
+    processing_max_distinct: int = 100000  # Distinct values tracked per column (local)
+    processing_cache_enabled: bool = True  # Reuse results while the CSV's ETag is unchanged
+    processing_cache_max_entries: int = 256
+    processing_cache_ttl_seconds: int = 604800
+    processing_cache_backend: str = "s3"  # "" (memory only) or "s3" (shared by all instances)
+    processing_cache_s3_prefix: str = "cache/processing"
+    
+    # Ingest: column index (+ Parquet copy) written next to each uploaded CSV
+    ingest_enabled: bool = True  # Run an "ingest" job after every upload
+    ingest_columnar: bool = True  # Also write {key}.parquet (needs pyarrow)
+    ingest_index_cache_ttl_seconds: int = 300
+    
+    # Background jobs
+    job_store: str = "memory"  # "memory", "sqlite" or "s3" (shared across Lambdas)
+    job_sqlite_path: str = "/tmp/jobs.db"
+    jobs_s3_prefix: str = "jobs"  # Job status and results in the S3 bucket
+    job_dispatch: str = "auto"  # "thread", "lambda" or "auto" (lambda when running in Lambda with JOB_STORE=s3)
+    job_workers: int = 4  # Thread pool size for "thread" dispatch
+    job_time_budget_seconds: float = 780  # Long jobs checkpoint and continue in a new invocation after this
+    job_stale_after_seconds: float = 960  # Running jobs without a heartbeat for this long can be resumed
+    
+    # Prompt history
+    history_enabled: bool = True
+    history_backend: str = "sqlite"  # "sqlite" or "s3" (SQLite index + JSONL segments in S3)
+    history_sqlite_path: str = "/tmp/history.db"
+    history_s3_prefix: str = "history"
+    history_flush_records: int = 20  # Records per S3 segment
+    history_flush_seconds: float = 5  # Max delay before unshipped records go to S3
+    history_sync_interval_seconds: float = 30  # How often queries pick up other instances' records
+    history_max_unshipped: int = 10000  # Records held for S3 while it fails; oldest dropped past this
+    history_sync_wait_seconds: float = 2  # Max time a query waits for that sync (it finishes in the background)
+    history_compact_interval_seconds: float = 3600  # How often past days' segments are merged (0 = never)
+    
+    # Dataset evaluations
+    evaluation_concurrency: int = 8  # Rows in flight at once (admission control still applies)
+    evaluation_checkpoint_rows: int = 200  # Rows per checkpointed chunk
+    evaluation_max_retries: int = 5  # Per row, on throttling
+    evaluations_s3_prefix: str = "evaluations"  # Checkpoints and partial results
     
     # Application
     app_name: str = "LLM Prompt Tester"
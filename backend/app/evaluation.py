@@ -0,0 +1,337 @@
+"""
+Dataset-driven evaluation
+
+Renders a prompt template for every row of an uploaded CSV, runs the
+prompts through BedrockClient concurrently and writes the responses back
+to S3 as a results CSV.
+
+Rows are streamed from S3 and processed in fixed-size chunks, so memory
+depends on the chunk size and concurrency, not on the dataset. Each
+finished chunk is written to S3 and recorded in a checkpoint, so a run
+that crashes, fails or is cut short by the Lambda timeout resumes at the
+first unfinished chunk. When every row is done the chunks are streamed
+into the final CSV with S3Client.upload_stream.
+"""
+import asyncio
+import csv
+import io
+import itertools
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from .jobs import JobContinuation
+from .rate_limiter import AdmissionTimeoutError, ThrottlingError
+from .s3_client import ChunkReader
+
+RESULT_COLUMNS = ["response_text", "tokens_used", "cache_read_tokens", "latency_ms", "error"]
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{\{|\}\}|\{([^{}]+)\}")
+
+
+class PromptTemplate:
+    """
+    Prompt with {column} placeholders
+
+    Column names may contain spaces and accents; write {{ and }} for
+    literal braces.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.columns: List[str] = []
+        # Precompiled into literal text and column references
+        self._parts: List[tuple] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(template):
+            self._parts.append((False, template[position:match.start()]))
+            if match.group(1) is None:
+                self._parts.append((False, match.group(0)[0]))
+            else:
+                column = match.group(1).strip()
+                self._parts.append((True, column))
+                if column not in self.columns:
+                    self.columns.append(column)
+            position = match.end()
+        self._parts.append((False, template[position:]))
+
+    def check_columns(self, header: List[str]):
+        """Raise ValueError if the template uses columns missing from the CSV"""
+        missing = [column for column in self.columns if column not in header]
+        if missing:
+            raise ValueError(f"Template columns not found in CSV: {', '.join(missing)}")
+
+    def render(self, row: Dict[str, str]) -> str:
+        return "".join(row.get(value, "") if is_column else value for is_column, value in self._parts)
+
+
+class EvaluationRunner:
+    """Runs evaluation jobs"""
+
+    def __init__(
+        self,
+        bedrock_client,
+        s3_client,
+        job_store,
+        prefix: str = "evaluations",
+        chunk_rows: int = 200,
+        time_budget_seconds: float = 780,
+        max_retries: int = 5
+    ):
+        """
+        Args:
+            bedrock_client: BedrockClient that runs the prompts
+            s3_client: S3Client to read the dataset and write results
+            job_store: JobStore the progress is reported to
+            prefix: S3 prefix for checkpoints and result chunks
+            chunk_rows: Rows per checkpointed chunk
+            time_budget_seconds: Run time after which the job checkpoints and
+                continues in a new execution (keep under the Lambda timeout)
+            max_retries: Retries per row when Bedrock throttles or admission times out
+        """
+        self.bedrock_client = bedrock_client
+        self.s3_client = s3_client
+        self.job_store = job_store
+        self.prefix = prefix.rstrip("/")
+        self.chunk_rows = chunk_rows
+        self.time_budget_seconds = time_budget_seconds
+        self.max_retries = max_retries
+
+    def run(
+        self,
+        job_id: str,
+        csv_key: str,
+        template: str,
+        model_id: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2048,
+        top_p: float = 0.9,
+        system: Optional[str] = None,
+        include_columns: Optional[List[str]] = None,
+        concurrency: int = 8
+    ) -> Dict[str, Any]:
+        """
+        Run (or resume) an evaluation job
+
+        Args:
+            job_id: Job ID, also the S3 folder for checkpoints
+            csv_key: S3 key of the dataset CSV
+            template: Prompt template with {column} placeholders
+            model_id: Bedrock model ID
+            temperature, max_tokens, top_p: Sampling parameters
+            system: Optional system prompt
+            include_columns: Dataset columns copied to the results (default: all)
+            concurrency: Rows in flight at once
+
+        Returns:
+            Summary with the results key, counts and throughput
+        """
+        started = time.monotonic()
+        prompt_template = PromptTemplate(template)
+        checkpoint = self._load_checkpoint(job_id) or {
+            "rows_done": 0,
+            "chunks": [],
+            "tokens_used": 0,
+            "errors": 0,
+            "elapsed_seconds": 0.0,
+            "columns": None
+        }
+
+        body = self.s3_client.open_object_stream(csv_key)
+        with io.TextIOWrapper(body, encoding="utf-8-sig", newline="") as text:
+            reader = csv.reader(text)
+            header = [name.strip() for name in next(reader, None) or []]
+            if not header:
+                raise ValueError("CSV file is empty")
+            prompt_template.check_columns(header)
+            columns = include_columns if include_columns is not None else header
+            missing = [column for column in columns if column not in header]
+            if missing:
+                raise ValueError(f"Columns not found in CSV: {', '.join(missing)}")
+            checkpoint["columns"] = columns
+
+            # Skip what earlier executions already finished
+            rows = itertools.islice(reader, checkpoint["rows_done"], None)
+            chunks = iter(lambda: [dict(zip(header, row)) for row in itertools.islice(rows, self.chunk_rows)], [])
+            finished = asyncio.run(self._run_chunks(
+                job_id, chunks, checkpoint, prompt_template, concurrency, started,
+                model_id=model_id,
+                system=system,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p
+            ))
+            if not finished:
+                raise JobContinuation()
+
+        results_key = self._assemble(job_id, checkpoint)
+        return {
+            "csv_key": csv_key,
+            "results_key": results_key,
+            **self._progress(checkpoint)
+        }
+
+    async def _run_chunks(
+        self,
+        job_id: str,
+        chunks: Iterator[List[Dict[str, str]]],
+        checkpoint: Dict[str, Any],
+        prompt_template: PromptTemplate,
+        concurrency: int,
+        started: float,
+        **params
+    ) -> bool:
+        """
+        Run every chunk in one event loop with at most `concurrency` rows in flight
+
+        The next chunk's rows start as soon as the current chunk's free up
+        slots, so concurrency never drops at a chunk boundary; each chunk is
+        saved and checkpointed in order once all of its rows are done.
+
+        Returns:
+            True when every row is done, False when the time budget ran out
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        last_saved = time.monotonic()
+
+        async def run_row(record: Dict[str, str]) -> Dict[str, Any]:
+            try:
+                return await self._run_row(prompt_template.render(record), params)
+            finally:
+                semaphore.release()
+
+        async def start(records: List[Dict[str, str]]) -> List[asyncio.Task]:
+            tasks = []
+            for record in records:
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(run_row(record)))
+            return tasks
+
+        async def finish(records: List[Dict[str, str]], tasks: List[asyncio.Task]):
+            nonlocal last_saved
+            results = await asyncio.gather(*tasks)
+            await asyncio.to_thread(self._save_chunk, job_id, checkpoint, records, results)
+            checkpoint["elapsed_seconds"] += time.monotonic() - last_saved
+            last_saved = time.monotonic()
+            await asyncio.to_thread(self._save_checkpoint, job_id, checkpoint)
+            await asyncio.to_thread(self._report_progress, job_id, checkpoint)
+
+        in_flight = None
+        while True:
+            if in_flight is not None and time.monotonic() - started > self.time_budget_seconds:
+                await finish(*in_flight)
+                return False
+            records = await asyncio.to_thread(next, chunks, None)
+            if records is None:
+                if in_flight is not None:
+                    await finish(*in_flight)
+                return True
+            launched = (records, await start(records))
+            if in_flight is not None:
+                await finish(*in_flight)
+            in_flight = launched
+
+    async def _run_row(self, prompt: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await self.bedrock_client.invoke_model_async(prompt=prompt, **params)
+                return {
+                    "response_text": result["response_text"],
+                    "tokens_used": result.get("tokens_used"),
+                    "cache_read_tokens": result.get("cache_read_tokens"),
+                    "latency_ms": int((time.monotonic() - start) * 1000),
+                    "error": None
+                }
+            except (ThrottlingError, AdmissionTimeoutError) as e:
+                error = e
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(30, 2 ** attempt))
+            except Exception as e:
+                error = e
+                break
+        return {
+            "response_text": None,
+            "tokens_used": None,
+            "cache_read_tokens": None,
+            "latency_ms": int((time.monotonic() - start) * 1000),
+            "error": str(error)
+        }
+
+    # -- S3 state -----------------------------------------------------------
+
+    def _key(self, job_id: str, name: str) -> str:
+        return f"{self.prefix}/{job_id}/{name}"
+
+    def _load_checkpoint(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = self.s3_client.get_object_bytes(self._key(job_id, "checkpoint.json"))
+        return json.loads(data) if data else None
+
+    def _save_checkpoint(self, job_id: str, checkpoint: Dict[str, Any]):
+        self.s3_client.put_object_bytes(
+            self._key(job_id, "checkpoint.json"),
+            json.dumps(checkpoint).encode("utf-8"),
+            content_type="application/json"
+        )
+
+    def _save_chunk(
+        self,
+        job_id: str,
+        checkpoint: Dict[str, Any],
+        records: List[Dict[str, str]],
+        results: List[Dict[str, Any]]
+    ):
+        """Write one chunk of result rows (no header) and count it in the checkpoint"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        columns = checkpoint["columns"]
+        first_row = checkpoint["rows_done"]
+        for offset, (record, result) in enumerate(zip(records, results)):
+            writer.writerow(
+                [first_row + offset]
+                + [record.get(column, "") for column in columns]
+                + [result[column] if result[column] is not None else "" for column in RESULT_COLUMNS]
+            )
+            checkpoint["tokens_used"] += result["tokens_used"] or 0
+            checkpoint["errors"] += result["error"] is not None
+
+        chunk_key = self._key(job_id, f"chunks/{len(checkpoint['chunks']):06d}.csv")
+        self.s3_client.put_object_bytes(chunk_key, buffer.getvalue().encode("utf-8"), content_type="text/csv")
+        checkpoint["chunks"].append(chunk_key)
+        checkpoint["rows_done"] += len(records)
+
+    def _assemble(self, job_id: str, checkpoint: Dict[str, Any]) -> str:
+        """Stream the header and every chunk into the final results CSV"""
+        header = io.StringIO()
+        csv.writer(header).writerow(["row"] + checkpoint["columns"] + RESULT_COLUMNS)
+
+        def parts() -> Iterator[bytes]:
+            yield header.getvalue().encode("utf-8")
+            for chunk_key in checkpoint["chunks"]:
+                yield self.s3_client.get_object_bytes(chunk_key) or b""
+
+        upload = self.s3_client.upload_stream(ChunkReader(parts()), f"evaluation_{job_id}.csv")
+        self.s3_client.delete_keys(checkpoint["chunks"])
+        return upload["key"]
+
+    def _progress(self, checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+        elapsed = checkpoint["elapsed_seconds"]
+        return {
+            "rows_done": checkpoint["rows_done"],
+            "errors": checkpoint["errors"],
+            "tokens_used": checkpoint["tokens_used"],
+            "elapsed_seconds": round(elapsed, 1),
+            "rows_per_second": round(checkpoint["rows_done"] / elapsed, 2) if elapsed else None,
+            "tokens_per_second": round(checkpoint["tokens_used"] / elapsed, 1) if elapsed else None
+        }
+
+    def _report_progress(self, job_id: str, checkpoint: Dict[str, Any]):
+        try:
+            self.job_store.update(job_id, progress=self._progress(checkpoint))
+        except Exception:
+            # Progress is informational; never fail the run over it
+            logger.warning("Could not report progress of evaluation %s", job_id, exc_info=True)
@@ -0,0 +1,454 @@
+"""
+Prompt history
+
+Every prompt invocation (request, parameters, response, token counts and
+timings) is appended to an SQLite database indexed for the queries behind
+/api/history: newest-first pages with a keyset cursor, model/time/status
+filters backed by B-tree indexes and full-text search over prompts and
+responses through an FTS5 index. Pages cost the same however deep they
+start and never scan the whole table.
+
+Writes are queued and committed in batches by a background thread, so
+recording never blocks a request. With the S3 backend the same records
+are also shipped as JSONL segments under a prefix; every instance (e.g.
+each Lambda execution environment) ingests the segments written by the
+others into its local index in a background sync that queries wait on for
+at most a few seconds. Segments of past days are compacted into a few
+large objects, so a fresh instance reads one object per day instead of
+every segment ever written.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from .config import Settings
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RECORDS_DROPPED = REGISTRY.counter(
+    "history_records_dropped_total",
+    "History records dropped before reaching S3 (too many unshipped while S3 failed)"
+)
+
+_COLUMNS = (
+    "uid", "created_at", "model_id", "prompt", "response_text", "tokens_used",
+    "response_time_ms", "cached", "error", "record"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    response_text TEXT,
+    tokens_used INTEGER,
+    response_time_ms INTEGER,
+    cached INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_model ON history (model_id, id);
+CREATE INDEX IF NOT EXISTS history_created ON history (created_at);
+CREATE TABLE IF NOT EXISTS history_segments (key TEXT PRIMARY KEY);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    prompt, response_text, content='history', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, prompt, response_text)
+    VALUES (new.id, new.prompt, new.response_text);
+END;
+"""
+
+
+def _fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching all terms (prefix match on the last)"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _utc_naive(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC ISO strings"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# Max size of one compacted object
+_COMPACT_BYTES = 16 * 1024 * 1024
+
+
+class HistoryStore:
+    """Append-only prompt history in SQLite, optionally replicated through S3"""
+
+    def __init__(
+        self,
+        path: str,
+        s3_client=None,
+        s3_prefix: str = "history",
+        flush_records: int = 20,
+        flush_seconds: float = 5,
+        sync_interval_seconds: float = 30,
+        max_unshipped: int = 10000,
+        sync_wait_seconds: float = 2,
+        compact_interval_seconds: float = 3600,
+        ship_immediately: bool = False
+    ):
+        """
+        Args:
+            path: SQLite database file
+            s3_client: S3Client to replicate records through (None = local only)
+            s3_prefix: Prefix of the JSONL segments
+            flush_records: Records per S3 segment
+            flush_seconds: Max age of unshipped records before a segment is written
+            sync_interval_seconds: Min time between ingesting other instances' segments
+            max_unshipped: Records kept for S3 while shipping fails; the
+                oldest are dropped past this (they stay in the local index)
+            sync_wait_seconds: Max time a query waits for a running sync
+            compact_interval_seconds: Min time between compaction passes (0 = never)
+            ship_immediately: Write a segment on every flush instead of
+                batching (Lambda freezes the writer thread between requests)
+        """
+        self.s3_client = s3_client
+        self.s3_prefix = s3_prefix.rstrip("/")
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self.sync_interval_seconds = sync_interval_seconds
+        self.max_unshipped = max_unshipped
+        self.sync_wait_seconds = sync_wait_seconds
+        self.compact_interval_seconds = compact_interval_seconds
+        self.ship_immediately = ship_immediately
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE scans
+            self.full_text = False
+        self._conn.commit()
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._unshipped: List[Dict[str, Any]] = []
+        self._unshipped_since = 0.0
+        self._last_sync = 0.0
+        self._last_compact = 0.0
+        self._sync_guard = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def append(self, record: Dict[str, Any]) -> str:
+        """
+        Queue a record for writing
+
+        Args:
+            record: Invocation data; model_id and prompt are required
+
+        Returns:
+            The record's id
+        """
+        record = {
+            "id": uuid.uuid4().hex,
+            "timestamp": datetime.utcnow().isoformat(),
+            **record
+        }
+        self._queue.put(record)
+        return record["id"]
+
+    def flush(self):
+        """Wait until every queued record is committed (and shipped, with ship_immediately)"""
+        self._queue.join()
+
+    def query(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        q: Optional[str] = None,
+        model_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        errors: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of history, newest first
+
+        Args:
+            cursor: next_cursor from the previous page
+            limit: Max records to return
+            q: Full-text search over prompts and responses
+            model_id: Only this model
+            since: Only records at or after this time (UTC)
+            until: Only records before this time (UTC)
+            errors: True for failed invocations only, False for successful only
+
+        Returns:
+            Dict with "items" and "next_cursor" (None on the last page)
+        """
+        self._request_sync()
+
+        where, params = [], []
+        table = "history h"
+        order = "h.id"
+        if q and q.strip():
+            if self.full_text:
+                # Walking the FTS index in rowid order lets LIMIT stop early
+                # instead of sorting every match
+                table = "history_fts JOIN history h ON h.id = history_fts.rowid"
+                order = "history_fts.rowid"
+                where.append("history_fts MATCH ?")
+                params.append(_fts_query(q))
+            else:
+                where.append("(h.prompt LIKE ? OR h.response_text LIKE ?)")
+                params.extend([f"%{q.strip()}%"] * 2)
+        if cursor:
+            where.append(f"{order} < ?")
+            params.append(int(cursor))
+        if model_id:
+            where.append("h.model_id = ?")
+            params.append(model_id)
+        if since:
+            where.append("h.created_at >= ?")
+            params.append(_utc_naive(since).isoformat())
+        if until:
+            where.append("h.created_at < ?")
+            params.append(_utc_naive(until).isoformat())
+        if errors is not None:
+            where.append("h.error IS NOT NULL" if errors else "h.error IS NULL")
+
+        sql = f"SELECT h.id, h.record FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        items = [json.loads(record) for _, record in rows[:limit]]
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        self._request_sync()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM history WHERE uid = ?", (record_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    # -- writing ----------------------------------------------------------
+
+    def _write_loop(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_seconds)]
+            except queue.Empty:
+                batch = []
+            # Drain whatever else is queued into the same transaction
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._insert(batch)
+                    if self.s3_client is not None:
+                        if not self._unshipped:
+                            self._unshipped_since = time.monotonic()
+                        self._unshipped.extend(batch)
+                        self._drop_overflow()
+                self._ship()
+            except Exception:
+                # Losing history must never take the API down
+                logger.exception("Writing prompt history failed")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _insert(self, records: List[Dict[str, Any]]):
+        rows = [
+            (
+                record["id"],
+                record["timestamp"],
+                record["model_id"],
+                record["prompt"],
+                record.get("response_text"),
+                record.get("tokens_used"),
+                record.get("response_time_ms"),
+                int(bool(record.get("cached"))),
+                record.get("error"),
+                json.dumps(record, ensure_ascii=False)
+            )
+            for record in records
+        ]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO history ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                rows
+            )
+            self._conn.commit()
+
+    def _drop_overflow(self):
+        """Drop the oldest unshipped records past max_unshipped"""
+        overflow = len(self._unshipped) - self.max_unshipped
+        if overflow > 0:
+            del self._unshipped[:overflow]
+            RECORDS_DROPPED.inc(overflow)
+            logger.warning("Dropped %d history records not shipped to S3", overflow)
+
+    def _ship(self):
+        """Write unshipped records to S3 as one JSONL segment when due"""
+        if not self._unshipped:
+            return
+        due = self.ship_immediately or len(self._unshipped) >= self.flush_records or \
+            time.monotonic() - self._unshipped_since >= self.flush_seconds
+        if not due:
+            return
+        key = f"{self.s3_prefix}/segments/{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.jsonl"
+        body = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in self._unshipped)
+        self.s3_client.put_object_bytes(key, body.encode("utf-8"), content_type="application/x-ndjson")
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO history_segments (key) VALUES (?)", (key,))
+            self._conn.commit()
+        self._unshipped = []
+
+    # -- replication ------------------------------------------------------
+
+    def _request_sync(self):
+        """Start a background sync when due and wait a bounded time for it"""
+        if self.s3_client is None:
+            return
+        with self._sync_guard:
+            running = self._sync_thread is not None and self._sync_thread.is_alive()
+            if not running and time.monotonic() - self._last_sync >= self.sync_interval_seconds:
+                self._last_sync = time.monotonic()
+                self._sync_thread = threading.Thread(target=self._sync, name="history-sync", daemon=True)
+                self._sync_thread.start()
+            thread = self._sync_thread
+        if thread is not None:
+            # A cold instance may take longer; queries answer from what is
+            # ingested so far and the rest shows up on the next one
+            thread.join(self.sync_wait_seconds)
+
+    def _sync(self):
+        try:
+            self._sync_from_s3()
+            if self.compact_interval_seconds and \
+                    time.monotonic() - self._last_compact >= self.compact_interval_seconds:
+                self._last_compact = time.monotonic()
+                self._compact()
+        except Exception:
+            logger.exception("Syncing prompt history from S3 failed")
+
+    def _sync_from_s3(self):
+        """Ingest compacted objects and segments written by other instances"""
+        with self._lock:
+            seen = {row[0] for row in self._conn.execute("SELECT key FROM history_segments")}
+        # Segment names start with their creation time; re-list a window
+        # before the newest one seen to catch slow writers
+        segments = f"{self.s3_prefix}/segments/"
+        start_after = None
+        newest = max((key for key in seen if key.startswith(segments)), default=None)
+        if newest:
+            window = datetime.strptime(newest[len(segments):][:15], "%Y%m%dT%H%M%S") - timedelta(seconds=300)
+            start_after = f"{segments}{window.strftime('%Y%m%dT%H%M%S')}"
+        # There is one compacted object per day or so, cheap to list in full
+        for prefix, after in ((f"{self.s3_prefix}/compacted/", None), (segments, start_after)):
+            for key in self.s3_client.list_keys(prefix, start_after=after):
+                if key not in seen:
+                    self._ingest(key, self.s3_client.get_object_bytes(key))
+
+    def _ingest(self, key: str, data: Optional[bytes]):
+        if data:
+            records = [json.loads(line) for line in data.decode("utf-8").splitlines() if line]
+            self._insert(records)
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO history_segments (key) VALUES (?)", (key,))
+            self._conn.commit()
+
+    def _compact(self):
+        """Merge the segments of past UTC days into objects of up to _COMPACT_BYTES"""
+        segments = f"{self.s3_prefix}/segments/"
+        # Leave an hour past midnight for segments still being written
+        cutoff = (datetime.utcnow() - timedelta(hours=1)).strftime("%Y%m%d")
+        days: Dict[str, List[str]] = {}
+        for key in self.s3_client.list_keys(segments):
+            day = key[len(segments):][:8]
+            if day >= cutoff:
+                break
+            days.setdefault(day, []).append(key)
+
+        for day, keys in days.items():
+            if len(keys) < 2:
+                continue
+            chunk, size = [], 0
+            for index, key in enumerate(keys):
+                data = self.s3_client.get_object_bytes(key)
+                if data:
+                    chunk.append((key, data))
+                    size += len(data)
+                if size >= _COMPACT_BYTES or index == len(keys) - 1:
+                    self._write_compacted(day, chunk)
+                    chunk, size = [], 0
+
+    def _write_compacted(self, day: str, chunk: List[Any]):
+        if not chunk:
+            return
+        # A unique name per object: two instances compacting the same day
+        # at once write the same records twice (deduplicated on ingest)
+        # instead of one overwriting the other after its segments are gone
+        key = f"{self.s3_prefix}/compacted/{day}-{uuid.uuid4().hex[:8]}.jsonl"
+        body = b"".join(data if data.endswith(b"\n") else data + b"\n" for _, data in chunk)
+        self.s3_client.put_object_bytes(key, body, content_type="application/x-ndjson")
+        self._ingest(key, body)
+        # Only segments that are safely inside the compacted object are deleted
+        self.s3_client.delete_keys([segment for segment, _ in chunk])
+        logger.info("Compacted %d history segments into %s", len(chunk), key)
+
+
+def build_history_store(settings: Settings, s3_client=None) -> Optional[HistoryStore]:
+    """Build the history store selected by HISTORY_BACKEND (None if disabled)"""
+    backend = settings.history_backend.lower()
+    if not settings.history_enabled or backend in ("", "none"):
+        return None
+    if backend not in ("sqlite", "s3"):
+        raise ValueError(f"Unknown history backend: {backend}")
+    return HistoryStore(
+        settings.history_sqlite_path,
+        s3_client=s3_client if backend == "s3" else None,
+        s3_prefix=settings.history_s3_prefix,
+        flush_records=settings.history_flush_records,
+        flush_seconds=settings.history_flush_seconds,
+        sync_interval_seconds=settings.history_sync_interval_seconds,
+        max_unshipped=settings.history_max_unshipped,
+        sync_wait_seconds=settings.history_sync_wait_seconds,
+        compact_interval_seconds=settings.history_compact_interval_seconds,
+        # Lambda freezes the writer thread as soon as the response returns
+        ship_immediately=backend == "s3" and bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+    )
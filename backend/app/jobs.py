@@ -0,0 +1,382 @@
+"""
+Background jobs
+
+Long-running work (e.g. CSV processing) is submitted as a job and runs
+outside the request. Job state lives in a pluggable JobStore and results
+are written to S3 as JSON, so clients poll /api/jobs/{id} instead of
+holding a connection open past the API Gateway timeout.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from .config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Marks a Lambda event as a job to run rather than an API request
+JOB_EVENT_SOURCE = "llm-prompt-tester.jobs"
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobContinuation(Exception):
+    """
+    Raised by a handler that saved its progress and wants to continue in a
+    fresh execution (e.g. before the Lambda timeout); the job goes back to
+    pending and is dispatched again
+    """
+
+
+class JobStore:
+    """Interface for job state storage"""
+
+    # Whether other execution environments (Lambda instances) see the same jobs
+    shared = False
+    # Serializes read-modify-write updates made in this process (the
+    # heartbeat and a handler's progress reports)
+    _update_lock = threading.Lock()
+
+    def save(self, job: Dict[str, Any]):
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def create(self, kind: str, params: Dict[str, Any], job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Create and store a new pending job"""
+        now = datetime.utcnow().isoformat()
+        job = {
+            "job_id": job_id or uuid.uuid4().hex,
+            "kind": kind,
+            "status": PENDING,
+            "params": params,
+            "created_at": now,
+            "updated_at": now,
+            "result_key": None,
+            "error": None,
+            "progress": None
+        }
+        self.save(job)
+        return job
+
+    def claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Move a pending job to running
+
+        Returns:
+            The running job, or None if it was not pending (another
+            execution already claimed it)
+        """
+        with self._update_lock:
+            job = self.get(job_id)
+            if job is None or job["status"] != PENDING:
+                return None
+            job.update(status=RUNNING, updated_at=datetime.utcnow().isoformat())
+            self.save(job)
+            return job
+
+    def update(self, job_id: str, **fields) -> Dict[str, Any]:
+        """Update fields of an existing job"""
+        with self._update_lock:
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(f"Job not found: {job_id}")
+            job.update(fields, updated_at=datetime.utcnow().isoformat())
+            self.save(job)
+            return job
+
+
+class MemoryJobStore(JobStore):
+    """Job store kept in process memory (local development and testing)"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job: Dict[str, Any]):
+        with self._lock:
+            self._jobs[job["job_id"]] = json.loads(json.dumps(job))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+
+class SQLiteJobStore(JobStore):
+    """Job store in a local SQLite file"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def save(self, job: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data) VALUES (?, ?)",
+                (job["job_id"], json.dumps(job))
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.update(status=RUNNING, updated_at=datetime.utcnow().isoformat())
+        # Conditional on the stored status, so other processes sharing the file can't both win
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET data = ? WHERE job_id = ? AND json_extract(data, '$.status') = ?",
+                (json.dumps(job), job_id, PENDING)
+            )
+            self._conn.commit()
+        return job if cursor.rowcount == 1 else None
+
+
+class S3JobStore(JobStore):
+    """Job store as JSON objects in S3, shared by all Lambda instances"""
+
+    shared = True
+
+    def __init__(self, s3_client, prefix: str):
+        self.s3_client = s3_client
+        self.prefix = prefix.rstrip("/")
+
+    def save(self, job: Dict[str, Any]):
+        self.s3_client.put_object_bytes(
+            f"{self.prefix}/{job['job_id']}/status.json",
+            json.dumps(job).encode("utf-8"),
+            content_type="application/json"
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = self.s3_client.get_object_bytes(f"{self.prefix}/{job_id}/status.json")
+        return json.loads(data) if data else None
+
+    def claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        key = f"{self.prefix}/{job_id}/status.json"
+        current = self.s3_client.get_object_with_etag(key)
+        if current is None:
+            return None
+        job = json.loads(current[0])
+        if job["status"] != PENDING:
+            return None
+        job.update(status=RUNNING, updated_at=datetime.utcnow().isoformat())
+        # Only one of several executions started for the same job wins the write
+        written = self.s3_client.put_object_if_match(
+            key, json.dumps(job).encode("utf-8"), current[1], content_type="application/json"
+        )
+        return job if written else None
+
+
+def build_job_store(settings: Settings, s3_client=None) -> JobStore:
+    """Build the job store selected by JOB_STORE"""
+    backend = settings.job_store.lower()
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore(settings.job_sqlite_path)
+    if backend == "s3":
+        return S3JobStore(s3_client, settings.jobs_s3_prefix)
+    raise ValueError(f"Unknown job store: {backend}")
+
+
+class JobRunner:
+    """
+    Submits and runs jobs
+
+    Jobs are dispatched either to a local thread pool or, inside Lambda, to
+    an asynchronous (InvocationType='Event') invocation of this same
+    function, which then runs the job in its own execution environment.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        s3_client,
+        lambda_client=None,
+        dispatch: str = "thread",
+        workers: int = 4,
+        results_prefix: str = "jobs",
+        stale_after_seconds: float = 960
+    ):
+        """
+        Args:
+            store: Where job state is kept
+            s3_client: S3Client used to write job results
+            lambda_client: LambdaClient used for "lambda" dispatch
+            dispatch: "thread" or "lambda"
+            workers: Thread pool size for "thread" dispatch
+            results_prefix: S3 prefix for job results
+            stale_after_seconds: A running job whose state was not updated
+                for this long is considered dead (its execution crashed or
+                timed out) and can be resumed; running jobs heartbeat well
+                within it
+
+        Raises:
+            ValueError: For "lambda" dispatch with a store the invoked
+                function can't see (memory, SQLite)
+        """
+        if dispatch == "lambda" and not store.shared:
+            raise ValueError(
+                f"Lambda job dispatch needs a shared job store (JOB_STORE=s3), "
+                f"not {type(store).__name__}"
+            )
+        self.store = store
+        self.s3_client = s3_client
+        self.lambda_client = lambda_client
+        self.dispatch = dispatch
+        self.results_prefix = results_prefix.rstrip("/")
+        self.stale_after_seconds = stale_after_seconds
+        self.handlers: Dict[str, Callable[..., Any]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jobs")
+
+    def register(self, kind: str, handler: Callable[..., Any]):
+        """
+        Register the function that runs jobs of a kind
+
+        The handler receives the job params as keyword arguments, plus
+        `job_id`, and returns a JSON-serializable result.
+        """
+        self.handlers[kind] = handler
+
+    def submit(self, kind: str, params: Dict[str, Any], job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create a job and dispatch it for execution
+
+        Args:
+            kind: Registered job kind
+            params: Handler keyword arguments
+            job_id: Optional caller-chosen ID
+
+        Returns:
+            The pending job
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = self.store.create(kind, params, job_id=job_id)
+        self._dispatch_or_fail(job["job_id"])
+        return job
+
+    def resume(self, job_id: str) -> Dict[str, Any]:
+        """
+        Dispatch a failed or stale running job again
+
+        Handlers that checkpoint their progress pick up where they stopped.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            raise KeyError(f"Job not found: {job_id}")
+        if job["status"] == RUNNING and not self._is_stale(job):
+            raise ValueError("Job is still running")
+        if job["status"] not in (FAILED, RUNNING):
+            raise ValueError(f"Only failed or stale jobs can be resumed (job is {job['status']})")
+        job = self.store.update(job_id, status=PENDING, error=None)
+        self._dispatch_or_fail(job_id)
+        return job
+
+    def _is_stale(self, job: Dict[str, Any]) -> bool:
+        """Whether a running job stopped heartbeating (its execution died)"""
+        updated_at = datetime.fromisoformat(job["updated_at"])
+        return datetime.utcnow() - updated_at > timedelta(seconds=self.stale_after_seconds)
+
+    def _dispatch_or_fail(self, job_id: str):
+        """Dispatch a pending job, marking it failed if that fails (nothing would ever run it)"""
+        try:
+            self._dispatch(job_id)
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, error=f"Could not dispatch job: {e}")
+            raise
+
+    def _dispatch(self, job_id: str):
+        if self.dispatch == "lambda":
+            self.lambda_client.invoke_event(
+                function_name=os.environ["AWS_LAMBDA_FUNCTION_NAME"],
+                payload={"source": JOB_EVENT_SOURCE, "job_id": job_id}
+            )
+        else:
+            self._executor.submit(self.run, job_id)
+
+    def run(self, job_id: str) -> Dict[str, Any]:
+        """
+        Run a stored job to completion and record the outcome
+
+        Lambda delivers asynchronous invocations at least once, so a job is
+        only run by the execution that moves it from pending to running;
+        duplicates return its current state without running it again.
+        """
+        job = self.store.claim(job_id)
+        if job is None:
+            logger.info("Job %s is not pending, skipping this execution", job_id)
+            return self.store.get(job_id) or {"job_id": job_id, "status": None}
+        try:
+            with self._heartbeat(job_id):
+                result = self.handlers[job["kind"]](job_id=job_id, **job["params"])
+            result_key = f"{self.results_prefix}/{job_id}/result.json"
+            self.s3_client.put_object_bytes(
+                result_key,
+                json.dumps(result, default=str).encode("utf-8"),
+                content_type="application/json"
+            )
+            return self.store.update(job_id, status=SUCCEEDED, result_key=result_key)
+        except JobContinuation:
+            job = self.store.update(job_id, status=PENDING)
+            self._dispatch_or_fail(job_id)
+            return job
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            return self.store.update(job_id, status=FAILED, error=str(e))
+
+    @contextmanager
+    def _heartbeat(self, job_id: str):
+        """Refresh updated_at while the handler runs so the job never looks stale"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.stale_after_seconds / 4):
+                try:
+                    self.store.update(job_id)
+                except Exception:
+                    logger.warning("Heartbeat of job %s failed", job_id, exc_info=True)
+
+        thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def get_result(self, job_id: str) -> Any:
+        """Load the stored result of a succeeded job"""
+        job = self.store.get(job_id)
+        if not job or not job.get("result_key"):
+            return None
+        data = self.s3_client.get_object_bytes(job["result_key"])
+        return json.loads(data) if data else None
@@ -1,14 +1,15 @@
 import json
-import boto3
+from .aws import create_client
+from .config import get_settings
+from .metrics import timed
 
 class LambdaClient:
     """Client for invoking AWS Lambda functions"""
     
     def __init__(self):
-        # Hardcoded configuration for simplicity
         # In Lambda, boto3 automatically uses the execution role
-        self.lambda_client = boto3.client('lambda', region_name="us-east-1")
-        self.function_name = "sumun-preprocess-columns"
+        self.lambda_client = create_client('lambda')
+        self.function_name = get_settings().lambda_function_name
     
     def invoke_processing(self, csv_key: str, target: str, columns: list) -> dict:
         """
@@ -38,7 +39,10 @@ class LambdaClient:
             )
             
             # Parse response
-            response_payload = json.loads(response['Payload'].read())
+            with timed('lambda', 'Invoke', 'download'):
+                raw_payload = response['Payload'].read()
+            with timed('lambda', 'Invoke', 'parse'):
+                response_payload = json.loads(raw_payload)
             
             # Check for Lambda errors
             if 'FunctionError' in response:
@@ -52,3 +56,22 @@ class LambdaClient:
             
         except Exception as e:
             raise Exception(f"Failed to invoke Lambda: {str(e)}")
+    
+    def invoke_event(self, function_name: str, payload: dict):
+        """
+        Invoke a Lambda function asynchronously (fire and forget)
+        
+        Args:
+            function_name: Name or ARN of the function
+            payload: JSON-serializable event
+        """
+        try:
+            response = self.lambda_client.invoke(
+                FunctionName=function_name,
+                InvocationType='Event',  # Asynchronous invocation
+                Payload=json.dumps(payload)
+            )
+            if response.get('StatusCode') != 202:
+                raise Exception(f"unexpected status {response.get('StatusCode')}")
+        except Exception as e:
+            raise Exception(f"Failed to invoke Lambda asynchronously: {str(e)}")
@@ -3,6 +3,19 @@ Lambda handler for FastAPI application using Mangum
 """
 from mangum import Mangum
 from app.main import app
+from app.jobs import JOB_EVENT_SOURCE
 
 # Mangum adapter for AWS Lambda
-handler = Mangum(app, lifespan="off")
+asgi_handler = Mangum(app, lifespan="off")
+
+
+def handler(event, context):
+    """
+    Entry point: API Gateway requests go to FastAPI, job events (sent
+    asynchronously by JobRunner) run the job in this invocation
+    """
+    if isinstance(event, dict) and event.get("source") == JOB_EVENT_SOURCE:
+        from app.clients import get_job_runner
+        job = get_job_runner().run(event["job_id"])
+        return {"job_id": job["job_id"], "status": job["status"]}
+    return asgi_handler(event, context)
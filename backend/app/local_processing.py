@@ -0,0 +1,209 @@
+import csv
+import io
+import itertools
+import os
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+
+class ColumnStats:
+    """Running aggregates for one CSV column, updated a chunk at a time"""
+
+    def __init__(self, max_distinct: int):
+        self.max_distinct = max_distinct
+        self.count = 0
+        self.missing = 0
+        self.values: Counter = Counter()
+        self.distinct_truncated = False
+        self.numeric_count = 0
+        self.numeric_sum = 0.0
+        self.numeric_min: Optional[float] = None
+        self.numeric_max: Optional[float] = None
+        self.all_numeric = True
+
+    def update(self, values: tuple):
+        """Fold a chunk of raw column values into the aggregates"""
+        present = [v for v in values if v != ""]
+        self.missing += len(values) - len(present)
+        self.count += len(present)
+
+        if not self.distinct_truncated:
+            # Counter.update counts in C; stop tracking once cardinality explodes
+            self.values.update(present)
+            if len(self.values) > self.max_distinct:
+                self.distinct_truncated = True
+                self.values = Counter(dict(self.values.most_common(self.max_distinct)))
+
+        if self.all_numeric and present:
+            try:
+                numbers = list(map(float, present))
+            except ValueError:
+                self.all_numeric = False
+                return
+            self.numeric_count += len(numbers)
+            self.numeric_sum += sum(numbers)
+            low, high = min(numbers), max(numbers)
+            self.numeric_min = low if self.numeric_min is None else min(self.numeric_min, low)
+            self.numeric_max = high if self.numeric_max is None else max(self.numeric_max, high)
+
+    def result(self, top_n: int) -> Dict[str, Any]:
+        numeric = None
+        if self.all_numeric and self.numeric_count:
+            numeric = {
+                "min": self.numeric_min,
+                "max": self.numeric_max,
+                "mean": self.numeric_sum / self.numeric_count
+            }
+        return {
+            "count": self.count,
+            "missing": self.missing,
+            "distinct": len(self.values),
+            "distinct_truncated": self.distinct_truncated,
+            "top_values": [
+                {"value": value, "count": count}
+                for value, count in self.values.most_common(top_n)
+            ],
+            "numeric": numeric
+        }
+
+
+class LocalProcessingClient:
+    """
+    In-process CSV preprocessing with the same interface as LambdaClient
+
+    Streams the CSV (from S3 or a local path), keeps only the requested
+    columns and folds them into per-column aggregates in fixed-size chunks,
+    so memory depends on the chunk size and column cardinality, not on the
+    file size.
+    """
+
+    def __init__(self, s3_client=None, chunk_rows: int = 50000,
+                 max_distinct: int = 100000, top_n: int = 20, indexer=None):
+        """
+        Args:
+            s3_client: S3Client used to read keys that are not local paths
+            chunk_rows: Rows aggregated per chunk
+            max_distinct: Distinct values tracked per column
+            top_n: Most frequent values reported per column
+            indexer: Optional ColumnarIndexer; ingested files are answered
+                from their index or columnar copy instead of the CSV
+        """
+        self.s3_client = s3_client
+        self.chunk_rows = chunk_rows
+        self.max_distinct = max_distinct
+        self.top_n = top_n
+        self.indexer = indexer
+
+    def invoke_processing(self, csv_key: str, target: str, columns: list) -> dict:
+        """
+        Process a CSV file locally
+
+        Args:
+            csv_key: S3 key of the CSV file, or a local file path
+            target: Target type ('alumno' or 'professor')
+            columns: List of column names to process
+
+        Returns:
+            dict: Row count and per-column aggregates
+        """
+        try:
+            if self.indexer is not None and not os.path.isfile(csv_key):
+                index = self.indexer.get_index(csv_key)
+                if index is not None:
+                    result = self.process_index(index, target, columns)
+                    if result is not None:
+                        return result
+            with self._open(csv_key) as text:
+                return self.process_stream(text, target, columns, csv_key)
+        except Exception as e:
+            raise Exception(f"Failed to process CSV locally: {str(e)}")
+
+    def process_index(self, index: dict, target: str, columns: List[str]) -> Optional[dict]:
+        """
+        Aggregate the requested columns of an ingested CSV
+
+        The index already holds the aggregates when it was built with the
+        same limits; otherwise only the requested columns are read from the
+        columnar copy.
+
+        Returns:
+            The result, or None if the CSV itself has to be read
+        """
+        entries = {column["name"]: column for column in index["columns"]}
+        missing = [column for column in columns if column not in entries]
+        if missing:
+            raise ValueError(f"Columns not found in CSV: {', '.join(missing)}")
+
+        if index["max_distinct"] == self.max_distinct and index["top_n"] >= self.top_n:
+            aggregates = {}
+            for column in columns:
+                entry = entries[column]
+                aggregates[column] = {
+                    "count": entry["count"],
+                    "missing": entry["missing"],
+                    "distinct": entry["distinct"],
+                    "distinct_truncated": entry["distinct_truncated"],
+                    "top_values": entry["top_values"][:self.top_n],
+                    "numeric": entry["numeric"]
+                }
+        elif index.get("columnar_key"):
+            stats = {column: ColumnStats(self.max_distinct) for column in columns}
+            for batch in self.indexer.iter_columns(index, list(dict.fromkeys(columns)), self.chunk_rows):
+                for column in columns:
+                    stats[column].update(batch[column])
+            aggregates = {column: stats[column].result(self.top_n) for column in columns}
+        else:
+            return None
+
+        return {
+            "csv_key": index["csv_key"],
+            "target": target,
+            "row_count": index["row_count"],
+            "columns": aggregates
+        }
+
+    def process_stream(self, text: TextIO, target: str, columns: List[str], csv_key: str = "") -> dict:
+        """Aggregate the requested columns of a CSV text stream"""
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("CSV file is empty")
+
+        positions = {name.strip(): index for index, name in enumerate(header)}
+        missing = [column for column in columns if column not in positions]
+        if missing:
+            raise ValueError(f"Columns not found in CSV: {', '.join(missing)}")
+        indexes = [positions[column] for column in columns]
+        width = max(indexes) + 1
+
+        stats = {column: ColumnStats(self.max_distinct) for column in columns}
+        row_count = 0
+        for chunk in self._chunks(reader):
+            # Pad short rows so every projected index exists
+            rows = [row if len(row) >= width else row + [""] * (width - len(row)) for row in chunk]
+            row_count += len(rows)
+            for column, index in zip(columns, indexes):
+                stats[column].update(tuple(row[index] for row in rows))
+
+        return {
+            "csv_key": csv_key,
+            "target": target,
+            "row_count": row_count,
+            "columns": {column: stats[column].result(self.top_n) for column in columns}
+        }
+
+    def _chunks(self, reader: Iterator[list]) -> Iterator[List[list]]:
+        while True:
+            chunk = list(itertools.islice(reader, self.chunk_rows))
+            if not chunk:
+                return
+            yield chunk
+
+    def _open(self, csv_key: str) -> TextIO:
+        """Open the CSV as text, from the local filesystem or S3"""
+        if os.path.isfile(csv_key):
+            return open(csv_key, encoding="utf-8-sig", newline="")
+        if self.s3_client is None:
+            raise ValueError(f"File not found: {csv_key}")
+        body = self.s3_client.open_object_stream(csv_key)
+        return io.TextIOWrapper(body, encoding="utf-8-sig", newline="")
@@ -1,17 +1,34 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import ValidationError
+import json
+import logging
 import time
+import uuid
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from .config import get_settings
 from .models import (
     PromptRequest, PromptResponse, ModelInfo, ErrorResponse, 
-    FileUploadResponse, S3FileInfo, ProcessRequest, ProcessResponse
+    FileUploadResponse, S3FileInfo, S3FileListResponse, ProcessRequest, ProcessResponse,
+    BatchPromptRequest, PresignedUploadRequest, PresignedUploadResponse,
+    MultipartUploadRequest, MultipartUploadResponse, MultipartCompleteRequest,
+    MultipartResumeRequest, UploadCheckRequest, UploadCheckResponse, JobResponse, HistoryEntry, HistoryPage, EvaluationRequest, IngestRequest,
+    TokenEstimateResponse
 )
-from .bedrock_client import BedrockClient
-from .s3_client import S3Client
-from .lambda_client import LambdaClient
+from .metrics import MetricsMiddleware, REGISTRY, current_timings, run_in_threadpool
+from .providers import flatten_prompt
+from .rate_limiter import ThrottlingError, AdmissionTimeoutError
+from .tokens import estimate_input_tokens, model_family
+from .clients import (
+    get_bedrock_client, get_s3_client, get_response_cache, get_job_runner,
+    get_processing_client, get_model_catalog, get_history_store, get_batch_inference_runner,
+    get_columnar_indexer
+)
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 settings = get_settings()
@@ -28,16 +45,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Initialize Bedrock client
-bedrock_client = BedrockClient()
-
-# Initialize S3 client
-s3_client = S3Client()
-
-# Initialize Lambda client
-lambda_client = LambdaClient()
+# Latency histograms and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
 
 # API Routes
 @app.get("/api/health")
@@ -50,76 +62,450 @@ async def health_check():
     }
 
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(
+        REGISTRY.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/api/models", response_model=List[ModelInfo])
-async def get_models():
-    """Get list of available Bedrock models"""
+async def get_models(
+    include_unsupported: bool = Query(False, description="Also list models no adapter can call")
+):
+    """
+    Get list of available Bedrock models
+    
+    Served from the cached model catalog; a stale catalog is refreshed in
+    the background.
+    """
     try:
-        models = bedrock_client.get_available_models()
-        return models
+        return get_model_catalog().list_models(include_unsupported=include_unsupported)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _input_tokens(params: dict) -> int:
+    """Estimated input tokens of PromptRequest.invocation_params() (memoized per text)"""
+    return estimate_input_tokens(params["model_id"], params["prompt"], params["system"], params["messages"])
+
+
+def _estimate_tokens(request: PromptRequest) -> TokenEstimateResponse:
+    """Estimate a request's input tokens and check them against the model's limits"""
+    catalog = get_model_catalog()
+    limit = catalog.max_output_tokens(request.model_id) or settings.bedrock_default_max_tokens
+    context = catalog.context_window(request.model_id)
+    input_tokens = _input_tokens(request.invocation_params())
+    
+    available = limit
+    if context is not None:
+        # The estimate is approximate: only reject what is over by more than the tolerance
+        discounted = int(input_tokens * (1 - settings.token_estimate_tolerance))
+        available = max(0, min(limit, context - discounted))
+    return TokenEstimateResponse(
+        model_id=request.model_id,
+        tokenizer=model_family(request.model_id),
+        input_tokens=input_tokens,
+        max_tokens=request.max_tokens,
+        total_tokens=input_tokens + request.max_tokens,
+        max_output_tokens=limit,
+        context_tokens=context,
+        available_output_tokens=available,
+        fits=request.max_tokens <= available
+    )
+
+
+def _check_token_budget(request: PromptRequest):
+    """
+    Reject max_tokens above the model's output limit, and prompts that
+    don't leave room for max_tokens in the model's context window
+    """
+    estimate = _estimate_tokens(request)
+    if request.max_tokens > estimate.max_output_tokens:
+        raise HTTPException(
+            status_code=422,
+            detail=f"max_tokens {request.max_tokens} exceeds the limit of "
+                   f"{request.model_id} ({estimate.max_output_tokens})"
+        )
+    if not estimate.fits:
+        detail = f"Prompt (~{estimate.input_tokens} tokens) plus max_tokens {request.max_tokens} " \
+                 f"exceeds the context window of {request.model_id} ({estimate.context_tokens})"
+        if estimate.available_output_tokens:
+            detail += f"; max_tokens can be at most {estimate.available_output_tokens}"
+        raise HTTPException(status_code=422, detail=detail)
+
+
+async def _record_history(
+    request: PromptRequest,
+    source: str,
+    response: Optional[PromptResponse] = None,
+    error: Optional[str] = None
+):
+    """Append an invocation to the prompt history (no-op if disabled)"""
+    store = get_history_store()
+    if store is None:
+        return
+    params = request.invocation_params()
+    record = {
+        "model_id": request.model_id,
+        "prompt": flatten_prompt(params["prompt"], params["system"], params["messages"]),
+        "request": request.model_dump(exclude_none=True),
+        "source": source,
+        "error": error,
+        "timings": current_timings()
+    }
+    if response is not None:
+        record.update(response.model_dump())
+    store.append(record)
+    if store.ship_immediately:
+        # In Lambda the writer thread freezes once the response returns,
+        # so the record has to reach S3 first
+        await run_in_threadpool(store.flush)
+
+
+async def run_prompt(request: PromptRequest, source: str = "prompt") -> PromptResponse:
+    """Invoke a Bedrock model, build the API response and record it in the history"""
+    start_time = time.time()
+    params = request.invocation_params()
+    
+    # Invoke Bedrock model (off the event loop)
+    try:
+        result = await get_bedrock_client().invoke_model_async(**params)
+    except Exception as e:
+        await _record_history(request, source, error=str(e))
+        raise
+    
+    # Calculate response time
+    response_time_ms = int((time.time() - start_time) * 1000)
+    
+    # Build response
+    response = PromptResponse(
+        response_text=result["response_text"],
+        model_id=result["model_id"],
+        tokens_used=result.get("tokens_used"),
+        estimated_input_tokens=_input_tokens(params),
+        cache_read_tokens=result.get("cache_read_tokens"),
+        cache_write_tokens=result.get("cache_write_tokens"),
+        response_time_ms=response_time_ms,
+        timestamp=datetime.utcnow().isoformat(),
+        cached=result.get("cached", False),
+        deduplicated=result.get("deduplicated", False),
+        semantic_similarity=result.get("semantic_similarity")
+    )
+    await _record_history(request, source, response=response)
+    return response
+
+
+def _too_many_requests(e: Exception) -> HTTPException:
+    """Map Bedrock throttling / admission timeouts to HTTP 429"""
+    retry_after = getattr(e, "retry_after", 1)
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, round(retry_after)))}
+    )
+
+
 @app.post("/api/prompt", response_model=PromptResponse)
 async def invoke_prompt(request: PromptRequest):
     """
     Invoke a Bedrock model with the provided prompt
     """
+    _check_token_budget(request)
     try:
-        start_time = time.time()
-        
-        # Invoke Bedrock model
-        result = bedrock_client.invoke_model(
-            prompt=request.prompt,
-            model_id=request.model_id,
-            temperature=request.temperature,
-            max_tokens=request.max_tokens,
-            top_p=request.top_p
+        return await run_prompt(request)
+    except (ThrottlingError, AdmissionTimeoutError) as e:
+        raise _too_many_requests(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing prompt: {str(e)}"
         )
-        
-        # Calculate response time
-        response_time_ms = int((time.time() - start_time) * 1000)
-        
-        # Build response
-        response = PromptResponse(
-            response_text=result["response_text"],
-            model_id=result["model_id"],
-            tokens_used=result.get("tokens_used"),
-            response_time_ms=response_time_ms,
-            timestamp=datetime.utcnow().isoformat()
+
+
+@app.post("/api/prompt/estimate", response_model=TokenEstimateResponse)
+async def estimate_prompt(request: PromptRequest):
+    """
+    Estimate a prompt's tokens without calling Bedrock
+    
+    Uses the local tokenizer approximation of the model's family and reports
+    whether max_tokens fits the model's output limit and context window,
+    i.e. whether /api/prompt would accept the request.
+    """
+    try:
+        return _estimate_tokens(request)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error estimating tokens: {str(e)}"
+        )
+
+
+def _expand_batch(request: BatchPromptRequest, max_requests: int) -> List[PromptRequest]:
+    """Expand a batch, checking its size before building any request"""
+    size = request.size()
+    if size > max_requests:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch expands to {size} requests (max {max_requests})"
+        )
+    try:
+        return request.expand()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+
+@app.post("/api/prompt/batch")
+async def invoke_prompt_batch(request: BatchPromptRequest):
+    """
+    Run a batch of prompts concurrently
+    
+    Accepts explicit requests and/or a parameter grid. Results are streamed
+    as newline-delimited JSON (one BatchPromptResult per line) in completion
+    order; use `index` to match them to the expanded request list.
+    """
+    requests = _expand_batch(request, settings.batch_max_requests)
+    for item in requests:
+        _check_token_budget(item)
+    
+    from .batch import BatchRunner
+    runner = BatchRunner(
+        lambda item: run_prompt(item, source="batch"),
+        settings.batch_per_model_concurrency
+    )
+    
+    async def result_stream():
+        async for result in runner.run(requests):
+            yield result.model_dump_json() + "\n"
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/batch-inference", response_model=JobResponse, status_code=202)
+async def create_batch_inference(request: BatchPromptRequest):
+    """
+    Run a large prompt set as Bedrock batch inference jobs
+    
+    Cheaper and not limited by the on-demand quotas, but asynchronous:
+    Bedrock may take hours. Poll /api/jobs/{job_id}, then read the results
+    from /api/batch-inference/{job_id}/results.
+    """
+    if not settings.bedrock_batch_role_arn:
+        raise HTTPException(
+            status_code=400,
+            detail="Batch inference is not configured (set BEDROCK_BATCH_ROLE_ARN)"
+        )
+    requests = _expand_batch(request, settings.bedrock_batch_max_requests)
+    for item in requests:
+        _check_token_budget(item)
+    
+    batch_runner = get_batch_inference_runner()
+    params = [item.invocation_params() for item in requests]
+    try:
+        batch_runner.check_requests(params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        job_id = uuid.uuid4().hex
+        await run_in_threadpool(batch_runner.store_requests, job_id, params)
+        job = await run_in_threadpool(
+            get_job_runner().submit, "batch_inference", {}, job_id=job_id
         )
-        
-        return response
-        
     except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error submitting batch inference: {str(e)}"
+        )
+    return JobResponse(**{k: v for k, v in job.items() if k in JobResponse.model_fields})
+
+
+@app.get("/api/batch-inference/{job_id}/results")
+async def get_batch_inference_results(job_id: str):
+    """
+    Stream the results of a finished batch inference job
+    
+    Newline-delimited JSON, one line per request: `index` (position in the
+    expanded request list), `model_id`, and a PromptResponse-shaped
+    `response` or an `error`.
+    """
+    job = await run_in_threadpool(get_job_runner().get, job_id)
+    if job is None or job["kind"] != "batch_inference":
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return StreamingResponse(
+        get_batch_inference_runner().iter_results(job_id),
+        media_type="application/x-ndjson"
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/prompt/stream")
+async def invoke_prompt_stream(request: PromptRequest):
+    """
+    Invoke a Bedrock model and stream the completion as Server-Sent Events
+    
+    Emits a `chunk` event per text delta and a final `done` event whose data
+    is the same PromptResponse returned by /api/prompt.
+    """
+    _check_token_budget(request)
+    start_time = time.time()
+    params = request.invocation_params()
+    events = get_bedrock_client().invoke_model_stream_async(**params)
+    
+    # Wait for the first event so invocation errors still map to an HTTP error
+    try:
+        first_event = await events.__anext__()
+    except Exception as e:
+        await _record_history(request, "stream", error=str(e))
+        if isinstance(e, (ThrottlingError, AdmissionTimeoutError)):
+            raise _too_many_requests(e)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing prompt: {str(e)}"
         )
+    
+    async def event_stream():
+        event = first_event
+        try:
+            while True:
+                if event["type"] == "chunk":
+                    yield _sse("chunk", {"text": event["text"]})
+                else:
+                    response = PromptResponse(
+                        response_text=event["response_text"],
+                        model_id=event["model_id"],
+                        tokens_used=event.get("tokens_used"),
+                        estimated_input_tokens=_input_tokens(params),
+                        cache_read_tokens=event.get("cache_read_tokens"),
+                        cache_write_tokens=event.get("cache_write_tokens"),
+                        response_time_ms=int((time.time() - start_time) * 1000),
+                        timestamp=datetime.utcnow().isoformat(),
+                        cached=event.get("cached", False),
+                        semantic_similarity=event.get("semantic_similarity")
+                    )
+                    await _record_history(request, "stream", response=response)
+                    yield _sse("done", response.model_dump())
+                event = await events.__anext__()
+        except StopAsyncIteration:
+            pass
+        except Exception as e:
+            await _record_history(request, "stream", error=str(e))
+            yield _sse("error", {"detail": f"Error processing prompt: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/history", response_model=HistoryPage)
+async def list_history(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200, description="Max records to return"),
+    q: Optional[str] = Query(None, description="Full-text search over prompts and responses"),
+    model_id: Optional[str] = Query(None, description="Only this model"),
+    since: Optional[datetime] = Query(None, description="Only records at or after this time (UTC)"),
+    until: Optional[datetime] = Query(None, description="Only records before this time (UTC)"),
+    errors: Optional[bool] = Query(None, description="true: failed invocations only, false: successful only")
+):
+    """
+    List past prompt invocations, newest first
+    """
+    store = get_history_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Prompt history is disabled")
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return await run_in_threadpool(
+            store.query,
+            cursor=cursor,
+            limit=limit,
+            q=q,
+            model_id=model_id,
+            since=since,
+            until=until,
+            errors=errors
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reading history: {str(e)}"
+        )
+
+
+@app.get("/api/history/{record_id}", response_model=HistoryEntry)
+async def get_history_entry(record_id: str):
+    """
+    Get one past prompt invocation
+    """
+    store = get_history_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Prompt history is disabled")
+    try:
+        record = await run_in_threadpool(store.get, record_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reading history: {str(e)}"
+        )
+    if record is None:
+        raise HTTPException(status_code=404, detail="History record not found")
+    return record
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Response cache hit/miss counters"""
+    response_cache = get_response_cache()
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
 
 
 @app.post("/api/upload", response_model=FileUploadResponse)
 async def upload_csv(file: UploadFile = File(...)):
     """
     Upload a CSV file to S3
+    
+    Files are stored under a key derived from the SHA-256 of their content;
+    a file that was already uploaded is not sent to S3 again.
     """
     try:
         # Validate file type
-        if not file.filename.endswith('.csv'):
-            raise HTTPException(
-                status_code=400,
-                detail="Only CSV files are allowed"
-            )
+        _check_csv_filename(file.filename)
         
-        # Read file content
-        content = await file.read()
+        s3_client = get_s3_client()
+        sha256 = await run_in_threadpool(s3_client.content_hash, file.file)
+        existing = await run_in_threadpool(s3_client.find_by_hash, sha256)
+        if existing is not None:
+            return FileUploadResponse(
+                success=True,
+                message="File already uploaded; nothing was transferred",
+                sha256=sha256,
+                deduplicated=True,
+                **existing
+            )
         
-        # Upload to S3
-        result = s3_client.upload_file(
-            file_content=content,
-            filename=file.filename,
-            content_type="text/csv"
+        # Stream the (spooled) upload to S3 in parts, off the event loop
+        result = await run_in_threadpool(
+            s3_client.upload_stream,
+            file.file,
+            file.filename,
+            "text/csv",
+            s3_client.content_key(sha256, file.filename),
+            sha256
         )
+        job_id = await _submit_ingest(result["key"])
         
         return FileUploadResponse(
             success=True,
@@ -128,7 +514,9 @@ async def upload_csv(file: UploadFile = File(...)):
             url=result["url"],
             filename=result["filename"],
             uploaded_at=result["uploaded_at"],
-            message="File uploaded successfully to S3"
+            message="File uploaded successfully to S3",
+            sha256=sha256,
+            job_id=job_id
         )
         
     except HTTPException:
@@ -140,14 +528,252 @@ async def upload_csv(file: UploadFile = File(...)):
         )
 
 
-@app.get("/api/files", response_model=List[S3FileInfo])
-async def list_uploaded_files():
+async def _submit_ingest(key: str) -> Optional[str]:
     """
-    List all uploaded CSV files from S3
+    Start the ingest job of a new upload; the upload succeeds either way
+    
+    A staged upload is verified against its declared SHA-256 and moved to
+    its content-addressed key by that job, or by a verify-only job when
+    ingest is disabled.
+    
+    Returns:
+        The job ID, or None if no job was started
     """
+    if settings.ingest_enabled:
+        kind, params = "ingest", {"csv_key": key}
+    elif get_s3_client().is_staging_key(key):
+        kind, params = "verify_upload", {"key": key}
+    else:
+        return None
     try:
-        files = s3_client.list_files()
-        return files
+        job = await run_in_threadpool(get_job_runner().submit, kind, params)
+        return job["job_id"]
+    except Exception:
+        # A job that was created is marked failed by the runner
+        logger.exception("Could not start the ingest job for %s", key)
+        return None
+
+
+def _check_csv_filename(filename: str):
+    if not filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only CSV files are allowed"
+        )
+
+
+def _check_upload_key(s3_client, key: str):
+    if not key.startswith(f"{s3_client.upload_folder}/"):
+        raise HTTPException(
+            status_code=400,
+            detail="Key is outside the upload folder"
+        )
+
+
+@app.post("/api/upload/check", response_model=UploadCheckResponse)
+async def check_upload(request: UploadCheckRequest):
+    """
+    Look up a file by the SHA-256 of its content before uploading it
+    
+    If it exists, use the returned key and skip the upload.
+    """
+    try:
+        existing = await run_in_threadpool(get_s3_client().find_by_hash, request.sha256)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error checking upload: {str(e)}"
+        )
+    if existing is None:
+        return UploadCheckResponse(exists=False)
+    return UploadCheckResponse(exists=True, file=FileUploadResponse(
+        success=True,
+        message="File already uploaded",
+        sha256=request.sha256.lower(),
+        deduplicated=True,
+        **existing
+    ))
+
+
+@app.post("/api/upload/presigned", response_model=PresignedUploadResponse)
+async def create_presigned_upload(request: PresignedUploadRequest):
+    """
+    Get a presigned POST form to upload a CSV (up to 5 GB) directly to S3,
+    bypassing the API Gateway/Lambda payload limits; call /api/files/ingest
+    once the upload is done to build its column index
+    
+    With `sha256`, a file that was already uploaded comes back with
+    `exists: true` and no form. Otherwise the form writes to a staging key;
+    the ingest call checks the content against the hash and moves it to its
+    content-addressed key.
+    """
+    _check_csv_filename(request.filename)
+    s3_client = get_s3_client()
+    try:
+        if request.sha256:
+            existing = await run_in_threadpool(s3_client.find_by_hash, request.sha256)
+            if existing is not None:
+                return PresignedUploadResponse(key=existing["key"], exists=True)
+        expiration = 3600
+        result = s3_client.generate_presigned_post(
+            filename=request.filename,
+            content_type=request.content_type,
+            expiration=expiration,
+            sha256=request.sha256
+        )
+        return PresignedUploadResponse(**result, expires_in=expiration)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error creating presigned upload: {str(e)}"
+        )
+
+
+@app.post("/api/upload/multipart", response_model=MultipartUploadResponse)
+async def create_multipart_upload(request: MultipartUploadRequest):
+    """
+    Start a direct-to-S3 multipart upload for large CSVs
+    
+    Split the file into `part_size` chunks, PUT each one to its URL, then
+    call /api/upload/multipart/complete with the returned ETags.
+    
+    With `sha256`, a file that was already uploaded comes back with
+    `exists: true` and no URLs, and an interrupted upload of the same
+    content is resumed: `uploaded_parts` lists the parts S3 already has and
+    only the missing ones get URLs. Such uploads go to a staging key and
+    move to their content-addressed key once the ingest job has checked the
+    content against the hash.
+    """
+    _check_csv_filename(request.filename)
+    s3_client = get_s3_client()
+    try:
+        if request.sha256:
+            existing = await run_in_threadpool(s3_client.find_by_hash, request.sha256)
+            if existing is not None:
+                return MultipartUploadResponse(
+                    key=existing["key"], part_size=s3_client.part_size, urls=[], exists=True
+                )
+        result = await run_in_threadpool(
+            s3_client.create_multipart_upload,
+            request.filename,
+            request.part_count,
+            request.content_type,
+            sha256=request.sha256
+        )
+        return MultipartUploadResponse(**result)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error starting multipart upload: {str(e)}"
+        )
+
+
+@app.post("/api/upload/multipart/resume", response_model=MultipartUploadResponse)
+async def resume_multipart_upload(request: MultipartResumeRequest):
+    """
+    Resume an interrupted direct-to-S3 multipart upload
+    
+    Returns the parts S3 already has and fresh URLs for the missing ones.
+    """
+    s3_client = get_s3_client()
+    _check_upload_key(s3_client, request.key)
+    try:
+        result = await run_in_threadpool(
+            s3_client.resume_multipart_upload,
+            request.key,
+            request.upload_id,
+            request.part_count
+        )
+        return MultipartUploadResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error resuming multipart upload: {str(e)}"
+        )
+
+
+@app.post("/api/upload/multipart/complete", response_model=FileUploadResponse)
+async def complete_multipart_upload(request: MultipartCompleteRequest):
+    """
+    Complete a direct-to-S3 multipart upload
+    
+    An upload that declared a SHA-256 comes back with `status: verifying`
+    and the content-addressed key it moves to once its content is checked;
+    that key exists when the job in `job_id` succeeds (poll /api/jobs/{job_id}).
+    A mismatching upload is discarded and the job fails.
+    """
+    s3_client = get_s3_client()
+    _check_upload_key(s3_client, request.key)
+    if not request.parts:
+        raise HTTPException(status_code=400, detail="parts must not be empty")
+    try:
+        result = await run_in_threadpool(
+            s3_client.complete_multipart_upload,
+            request.key,
+            request.upload_id,
+            [part.model_dump() for part in request.parts]
+        )
+        staging_key = result.pop("staging_key", None)
+        job_id = await _submit_ingest(staging_key or result["key"])
+        if staging_key:
+            message = "File uploaded to S3; it moves to its content-addressed key once its SHA-256 is verified"
+            status = "verifying"
+        else:
+            message = "File uploaded successfully to S3"
+            status = "available"
+        return FileUploadResponse(success=True, message=message, status=status, job_id=job_id, **result)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error completing multipart upload: {str(e)}"
+        )
+
+
+@app.post("/api/upload/multipart/abort")
+async def abort_multipart_upload(request: MultipartCompleteRequest):
+    """
+    Abort a direct-to-S3 multipart upload and discard its parts
+    """
+    s3_client = get_s3_client()
+    _check_upload_key(s3_client, request.key)
+    await run_in_threadpool(s3_client.abort_multipart_upload, request.key, request.upload_id)
+    return {"success": True}
+
+
+@app.get("/api/files", response_model=S3FileListResponse)
+async def list_uploaded_files(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    q: Optional[str] = Query(default=None, description="Filename substring"),
+    modified_after: Optional[datetime] = None,
+    modified_before: Optional[datetime] = None,
+    include_index: bool = Query(default=False, description="Attach each file's column index")
+):
+    """
+    List uploaded CSV files from S3, one page at a time
+    
+    With include_index=true each file carries its column index (schema,
+    row count, per-column distinct counts and min/max), or null if it has
+    not been ingested.
+    """
+    try:
+        page = await run_in_threadpool(
+            get_s3_client().list_files,
+            cursor=cursor,
+            limit=limit,
+            name_contains=q,
+            modified_after=modified_after,
+            modified_before=modified_before
+        )
+        if include_index:
+            indexes = await run_in_threadpool(get_columnar_indexer().get_indexes, page["files"])
+            page = {
+                **page,
+                "files": [{**file, "index": indexes.get(file["key"])} for file in page["files"]]
+            }
+        return page
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -155,10 +781,59 @@ async def list_uploaded_files():
         )
 
 
+@app.get("/api/files/index")
+async def get_file_index(key: str = Query(..., description="S3 key of the CSV")):
+    """
+    Get the column index of an uploaded CSV: schema, row count and
+    per-column count, missing, distinct, min/max and top values
+    """
+    try:
+        index = await run_in_threadpool(get_columnar_indexer().get_index, key)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reading file index: {str(e)}"
+        )
+    if index is None:
+        raise HTTPException(status_code=404, detail="File not found or not ingested")
+    return index
+
+
+@app.post("/api/files/ingest", response_model=JobResponse, status_code=202)
+async def ingest_file(request: IngestRequest):
+    """
+    Build (or rebuild) the column index and columnar copy of an uploaded CSV
+    
+    Uploads through /api/upload and /api/upload/multipart are ingested
+    automatically; files uploaded with a presigned POST need this call.
+    """
+    s3_client = get_s3_client()
+    _check_upload_key(s3_client, request.key)
+    _check_csv_filename(request.key)
+    try:
+        job = await run_in_threadpool(get_job_runner().submit, "ingest", {"csv_key": request.key})
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error submitting ingest: {str(e)}"
+        )
+    return JobResponse(**{k: v for k, v in job.items() if k in JobResponse.model_fields})
+
+
 @app.post("/api/process", response_model=ProcessResponse)
-async def process_csv(request: ProcessRequest):
+async def process_csv(
+    request: ProcessRequest,
+    response: Response,
+    mode: str = Query(default="sync", pattern="^(sync|async)$")
+):
     """
-    Process CSV file using AWS Lambda
+    Process CSV file using AWS Lambda (or locally, see PROCESSING_BACKEND)
+    
+    With mode=async the processing runs as a background job: the call
+    returns 202 with a job_id right away; poll /api/jobs/{job_id}.
+    
+    Results are cached per CSV version (ETag), target and column set; a
+    subset of already processed columns is answered from the cache too.
     """
     try:
         body = request.body
@@ -180,8 +855,27 @@ async def process_csv(request: ProcessRequest):
                 detail="columns must be a list"
             )
         
-        # Invoke Lambda function
-        result = lambda_client.invoke_processing(
+        if mode == "async":
+            job = await run_in_threadpool(
+                get_job_runner().submit,
+                "process",
+                {
+                    "csv_key": body['csv_key'],
+                    "target": body['target'],
+                    "columns": body['columns']
+                }
+            )
+            response.status_code = 202
+            return ProcessResponse(
+                success=True,
+                data=None,
+                job_id=job["job_id"],
+                message="Processing job submitted"
+            )
+        
+        # Invoke Lambda function (or the local engine), off the event loop
+        result = await run_in_threadpool(
+            get_processing_client().invoke_processing,
             csv_key=body['csv_key'],
             target=body['target'],
             columns=body['columns']
@@ -202,6 +896,93 @@ async def process_csv(request: ProcessRequest):
         )
 
 
+@app.post("/api/evaluations", response_model=JobResponse, status_code=202)
+async def create_evaluation(request: EvaluationRequest):
+    """
+    Run a prompt template over every row of an uploaded CSV
+    
+    Runs as a background job; poll /api/jobs/{job_id} for progress (rows
+    done, rows/s, tokens/s). The result lists the key of the results CSV.
+    """
+    _check_token_budget(request)
+    params = request.model_dump()
+    if params["concurrency"] is None:
+        params["concurrency"] = settings.evaluation_concurrency
+    try:
+        job = await run_in_threadpool(get_job_runner().submit, "evaluate", params)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error submitting evaluation: {str(e)}"
+        )
+    return JobResponse(**{k: v for k, v in job.items() if k in JobResponse.model_fields})
+
+
+@app.post("/api/evaluations/{job_id}/resume", response_model=JobResponse, status_code=202)
+async def resume_evaluation(job_id: str):
+    """
+    Resume a failed evaluation from its last checkpoint
+    
+    A running evaluation can be resumed too once it stopped heartbeating
+    (its execution crashed or timed out without recording a failure).
+    """
+    try:
+        job = await run_in_threadpool(get_job_runner().resume, job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error resuming evaluation: {str(e)}"
+        )
+    return JobResponse(**{k: v for k, v in job.items() if k in JobResponse.model_fields})
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    Get the status of a background job and a link to its result
+    """
+    try:
+        job = await run_in_threadpool(get_job_runner().get, job_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reading job: {str(e)}"
+        )
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    result_url = None
+    if job.get("result_key"):
+        result_url = get_s3_client().generate_presigned_url(job["result_key"])
+    return JobResponse(result_url=result_url, **{
+        k: v for k, v in job.items() if k in JobResponse.model_fields
+    })
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Get the result of a succeeded background job
+    """
+    job_runner = get_job_runner()
+    job = await run_in_threadpool(job_runner.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    try:
+        return await run_in_threadpool(job_runner.get_result, job_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reading job result: {str(e)}"
+        )
+
+
 @app.get("/")
 async def root():
     """Root endpoint - API info"""
@@ -212,7 +993,10 @@ async def root():
         "endpoints": {
             "health": "/api/health",
             "models": "/api/models",
-            "prompt": "/api/prompt"
+            "prompt": "/api/prompt",
+            "prompt_stream": "/api/prompt/stream",
+            "prompt_batch": "/api/prompt/batch",
+            "history": "/api/history"
         }
     }
 
@@ -0,0 +1,380 @@
+"""
+Lightweight metrics and per-request timing
+
+Counters and fixed-bucket histograms rendered in the Prometheus text
+format at /api/metrics, botocore event hooks that time every AWS call
+(SDK overhead, time to first byte, retries, throttles), and an ASGI
+middleware that adds a Server-Timing header with the phases recorded
+while serving each request.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool as _starlette_run_in_threadpool
+from starlette.datastructures import MutableHeaders
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+THROTTLE_CODES = {
+    "ThrottlingException", "Throttling", "TooManyRequestsException",
+    "SlowDown", "RequestLimitExceeded", "ServiceQuotaExceededException"
+}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class LabelValues:
+    """
+    Bounded set of values allowed for a request-derived label
+
+    Values are admitted explicitly (e.g. a model ID once Bedrock accepted
+    it), up to `max_values`; anything else is reported as `other`, so a
+    client sending arbitrary IDs can't create new series.
+    """
+
+    def __init__(self, max_values: int, other: str = "other"):
+        self.max_values = max_values
+        self.other = other
+        self._values: set = set()
+        self._lock = threading.Lock()
+
+    def admit(self, value: str):
+        if value in self._values:
+            return
+        with self._lock:
+            if len(self._values) < self.max_values:
+                self._values.add(value)
+
+    def __call__(self, value: str) -> str:
+        return value if value in self._values else self.other
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._gauge_callbacks: List[Tuple[str, str, Callable[[], Dict[tuple, float]], Tuple[str, ...]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name: str, help_text: str,
+                       callback: Callable[[], Dict[tuple, float]],
+                       labelnames: Tuple[str, ...] = ()):
+        """Register a gauge whose values are read at render time"""
+        self._gauge_callbacks.append((name, help_text, callback, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help_text, callback, labelnames in self._gauge_callbacks:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                values = callback()
+            except Exception:
+                values = {}
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labelnames, key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Model IDs that may appear as a metric label
+MODEL_LABELS = LabelValues(max_values=64)
+
+AWS_PHASE_SECONDS = REGISTRY.histogram(
+    "aws_call_phase_seconds",
+    "Time spent in each phase of AWS API calls",
+    ("service", "operation", "phase")
+)
+AWS_RETRIES = REGISTRY.counter(
+    "aws_call_retries_total", "Retried AWS API call attempts", ("service", "operation")
+)
+AWS_THROTTLES = REGISTRY.counter(
+    "aws_call_throttles_total", "Throttled AWS API call attempts", ("service", "operation")
+)
+AWS_ERRORS = REGISTRY.counter(
+    "aws_call_errors_total", "Failed AWS API calls", ("service", "operation", "code")
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "API request latency",
+    ("method", "route", "status")
+)
+
+
+class RequestTimings:
+    """Phase durations recorded while serving one request"""
+
+    def __init__(self):
+        self._phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """Phase durations in milliseconds"""
+        with self._lock:
+            return {name: round(seconds * 1000, 1) for name, seconds in self._phases.items()}
+
+    def header(self, total_seconds: float) -> str:
+        with self._lock:
+            items = list(self._phases.items())
+        items.append(("total", total_seconds))
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in items)
+
+
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def record_phase(service: str, operation: str, phase: str, seconds: float):
+    """Record a phase duration in the histograms and the current request"""
+    AWS_PHASE_SECONDS.observe(seconds, service=service, operation=operation, phase=phase)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(f"{service}-{phase}", seconds)
+
+
+def current_timings() -> Dict[str, float]:
+    """Phases recorded so far for the current request, in milliseconds"""
+    timings = _request_timings.get()
+    return timings.as_dict() if timings is not None else {}
+
+
+@contextmanager
+def timed(service: str, operation: str, phase: str):
+    """Time the enclosed block as one phase"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(service, operation, phase, time.perf_counter() - start)
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """
+    Starlette's run_in_threadpool, keeping the caller's contextvars
+
+    anyio worker threads start with an empty context, so phases recorded
+    there would otherwise be missing from the request's Server-Timing.
+    """
+    context = contextvars.copy_context()
+    return await _starlette_run_in_threadpool(context.run, func, *args, **kwargs)
+
+
+# -- botocore instrumentation -------------------------------------------------
+
+_attempt = threading.local()
+
+
+def _service_and_operation(event_name: str) -> Tuple[str, str]:
+    parts = event_name.split(".")
+    return parts[1], parts[2] if len(parts) > 2 else ""
+
+
+def _on_before_call(event_name, context=None, **kwargs):
+    if context is not None:
+        context["metrics_start"] = time.perf_counter()
+    _attempt.first_send = None
+
+
+def _on_before_send(event_name, **kwargs):
+    now = time.perf_counter()
+    _attempt.send_start = now
+    if getattr(_attempt, "first_send", None) is None:
+        _attempt.first_send = now
+
+
+def _on_response_received(event_name, context=None, **kwargs):
+    send_start = getattr(_attempt, "send_start", None)
+    if send_start is None:
+        return
+    service, operation = _service_and_operation(event_name)
+    # Includes connection setup when the pool had no idle connection
+    record_phase(service, operation, "ttfb", time.perf_counter() - send_start)
+    _attempt.send_start = None
+
+
+def _on_needs_retry(event_name, response=None, caught_exception=None, attempts=1, **kwargs):
+    code = None
+    if response is not None:
+        code = response[1].get("Error", {}).get("Code")
+    elif caught_exception is not None:
+        code = caught_exception.__class__.__name__
+    if code in THROTTLE_CODES:
+        service, operation = _service_and_operation(event_name)
+        AWS_THROTTLES.inc(service=service, operation=operation)
+
+
+def _on_after_call(event_name, http_response=None, parsed=None, context=None, **kwargs):
+    service, operation = _service_and_operation(event_name)
+    start = (context or {}).get("metrics_start")
+    first_send = getattr(_attempt, "first_send", None)
+    if start is not None and first_send is not None:
+        # Parameter validation, serialization and signing before the first attempt
+        record_phase(service, operation, "sdk", first_send - start)
+    if start is not None:
+        record_phase(service, operation, "call", time.perf_counter() - start)
+    if parsed:
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        if retries:
+            AWS_RETRIES.inc(retries, service=service, operation=operation)
+        if http_response is not None and http_response.status_code >= 300:
+            AWS_ERRORS.inc(
+                service=service, operation=operation,
+                code=parsed.get("Error", {}).get("Code", http_response.status_code)
+            )
+
+
+def _on_after_call_error(event_name, exception=None, **kwargs):
+    service, operation = _service_and_operation(event_name)
+    AWS_ERRORS.inc(service=service, operation=operation, code=exception.__class__.__name__)
+
+
+def instrument_client(client):
+    """Attach the timing/retry/throttle hooks to a boto3 client"""
+    events = client.meta.events
+    events.register("before-call.*", _on_before_call)
+    events.register("before-send.*", _on_before_send)
+    events.register("response-received.*", _on_response_received)
+    events.register("needs-retry.*", _on_needs_retry)
+    events.register("after-call.*", _on_after_call)
+    events.register("after-call-error.*", _on_after_call_error)
+    return client
+
+
+# -- ASGI middleware ----------------------------------------------------------
+
+class MetricsMiddleware:
+    """Times every HTTP request and adds a Server-Timing response header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.header(time.perf_counter() - start))
+                headers.append("Timing-Allow-Origin", "*")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            endpoint = scope.get("endpoint")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(endpoint, "__name__", "unmatched"),
+                status=status[0]
+            )
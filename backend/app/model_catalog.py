@@ -0,0 +1,286 @@
+"""
+Bedrock model catalog
+
+Lists the text models available in the account from the Bedrock control
+plane (ListFoundationModels plus system-defined inference profiles) and
+annotates them with capabilities: streaming support, max output tokens,
+context window and whether an adapter can call them.
+
+The catalog is served from memory. When it is older than its TTL the
+stale copy is still returned while a background thread refreshes it, so
+/api/models never waits on AWS. An optional JSON file keeps the last
+catalog across cold starts; until the first refresh succeeds the built-in
+fallback models are served.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .models import ModelInfo
+from .providers import REGION_PREFIXES, ProviderRegistry
+
+logger = logging.getLogger(__name__)
+
+# Max output tokens per model ID prefix (longest match wins). The
+# control-plane APIs don't report limits, so they come from the provider
+# documentation; override or extend with BEDROCK_MODEL_MAX_TOKENS.
+MAX_OUTPUT_TOKENS = {
+    "anthropic.claude-3-5-sonnet-20241022": 8192,
+    "anthropic.claude-3-5-haiku": 8192,
+    "anthropic.claude-3-7-sonnet": 64000,
+    "anthropic.claude-sonnet-4": 64000,
+    "anthropic.claude-opus-4": 32000,
+    "anthropic.claude-3": 4096,
+    "anthropic.claude": 4096,
+    "meta.llama": 2048,
+    "amazon.titan-text-premier": 3072,
+    "amazon.titan-text-express": 8192,
+    "amazon.titan-text-lite": 4096,
+    "amazon.nova": 5000,
+    "mistral.mistral-large": 8192,
+    "mistral.": 8192,
+    "cohere.command-r": 4096,
+}
+
+# Context window (input + output tokens) per model ID prefix, from the same
+# documentation; override or extend with BEDROCK_MODEL_CONTEXT_TOKENS.
+CONTEXT_WINDOWS = {
+    "anthropic.claude-instant": 100000,
+    "anthropic.claude-v2": 100000,
+    "anthropic.claude": 200000,
+    "meta.llama2": 4096,
+    "meta.llama3-8b": 8192,
+    "meta.llama3-70b": 8192,
+    "meta.llama3": 128000,
+    "meta.llama4": 128000,
+    "amazon.titan-text-premier": 32000,
+    "amazon.titan-text-express": 8192,
+    "amazon.titan-text-lite": 4096,
+    "amazon.nova-micro": 128000,
+    "amazon.nova": 300000,
+    "mistral.mistral-large-2407": 128000,
+    "mistral.": 32000,
+    "cohere.command-r": 128000,
+}
+
+
+def _base_model_id(model_id: str) -> str:
+    """Model ID without the cross-region inference profile prefix"""
+    for region in REGION_PREFIXES:
+        if model_id.startswith(region):
+            return model_id[len(region):]
+    return model_id
+
+
+def _prefix_lookup(table: List[tuple], model_id: str) -> Optional[int]:
+    """Value of the longest matching prefix in a (prefix, value) list sorted longest first"""
+    base_id = _base_model_id(model_id)
+    for prefix, value in table:
+        if base_id.startswith(prefix):
+            return value
+    return None
+
+
+class ModelCatalog:
+    """Cached catalog of Bedrock text models"""
+
+    # Max wait before retrying a failed refresh
+    RETRY_SECONDS = 60
+
+    def __init__(
+        self,
+        client_factory,
+        providers: ProviderRegistry,
+        fallback: List[ModelInfo],
+        ttl_seconds: float = 3600,
+        cache_path: str = "",
+        max_tokens_overrides: Optional[Dict[str, int]] = None,
+        context_overrides: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            client_factory: Callable returning a Bedrock control-plane client
+            providers: Registry used to flag models no adapter can call
+            fallback: Models served until the first refresh succeeds
+            ttl_seconds: Age after which the catalog is refreshed
+            cache_path: Optional JSON file persisting the catalog
+            max_tokens_overrides: Model ID prefix -> max output tokens
+            context_overrides: Model ID prefix -> context window tokens
+        """
+        self.client_factory = client_factory
+        self.providers = providers
+        self.ttl_seconds = ttl_seconds
+        self.cache_path = cache_path
+        limits = {**MAX_OUTPUT_TOKENS, **(max_tokens_overrides or {})}
+        self._limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+        windows = {**CONTEXT_WINDOWS, **(context_overrides or {})}
+        self._windows = sorted(windows.items(), key=lambda item: len(item[0]), reverse=True)
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._failed_at = 0.0
+        self._models: Dict[str, ModelInfo] = {}
+        self._fetched_at = 0.0
+        self._set_models([self._annotate(model) for model in fallback], fetched_at=0.0)
+        self._load_disk_cache()
+
+    def list_models(self, include_unsupported: bool = False) -> List[ModelInfo]:
+        """Current catalog; triggers a background refresh when stale"""
+        self._refresh_if_stale()
+        models = list(self._models.values())
+        if not include_unsupported:
+            models = [model for model in models if model.supported]
+        return models
+
+    def get(self, model_id: str) -> Optional[ModelInfo]:
+        """Catalog entry for a model, or None if unknown"""
+        self._refresh_if_stale()
+        return self._models.get(model_id)
+
+    def max_output_tokens(self, model_id: str) -> Optional[int]:
+        """Max output tokens for a model, from the catalog or the limits table"""
+        model = self._models.get(model_id)
+        if model is not None and model.max_output_tokens is not None:
+            return model.max_output_tokens
+        return self._max_tokens_for(model_id)
+
+    def context_window(self, model_id: str) -> Optional[int]:
+        """Context window for a model, from the catalog or the windows table"""
+        model = self._models.get(model_id)
+        if model is not None and model.context_tokens is not None:
+            return model.context_tokens
+        return _prefix_lookup(self._windows, model_id)
+
+    def refresh(self):
+        """Fetch the catalog from Bedrock (blocking)"""
+        client = self.client_factory()
+        models: Dict[str, ModelInfo] = {}
+
+        foundation = {}
+        for summary in client.list_foundation_models(byOutputModality="TEXT")["modelSummaries"]:
+            if summary.get("modelLifecycle", {}).get("status", "ACTIVE") != "ACTIVE":
+                continue
+            foundation[summary["modelId"]] = summary
+            # Models that only run through an inference profile are listed via the profile
+            if "ON_DEMAND" in summary.get("inferenceTypesSupported", []):
+                models[summary["modelId"]] = self._from_summary(summary["modelId"], summary)
+
+        for profile in self._list_inference_profiles(client):
+            if profile.get("status", "ACTIVE") != "ACTIVE":
+                continue
+            base_id = _base_model_id(profile["inferenceProfileId"])
+            summary = foundation.get(base_id)
+            if summary is None:
+                continue
+            models[profile["inferenceProfileId"]] = self._from_summary(
+                profile["inferenceProfileId"],
+                summary,
+                name=profile.get("inferenceProfileName"),
+                description=profile.get("description")
+            )
+
+        self._set_models(list(models.values()), fetched_at=time.time())
+        self._save_disk_cache()
+
+    def _list_inference_profiles(self, client) -> List[dict]:
+        """System-defined inference profiles; empty if the API is unavailable"""
+        from botocore.exceptions import ClientError
+        if not hasattr(client, "list_inference_profiles"):
+            return []
+        profiles = []
+        try:
+            paginator = client.get_paginator("list_inference_profiles")
+            for page in paginator.paginate(typeEquals="SYSTEM_DEFINED"):
+                profiles.extend(page.get("inferenceProfileSummaries", []))
+        except ClientError as e:
+            # e.g. the role lacks bedrock:ListInferenceProfiles
+            logger.warning("Could not list inference profiles: %s", e)
+        return profiles
+
+    def _from_summary(self, model_id: str, summary: dict, name: str = None,
+                      description: str = None) -> ModelInfo:
+        return self._annotate(ModelInfo(
+            model_id=model_id,
+            provider=summary.get("providerName", ""),
+            name=name or summary.get("modelName", model_id),
+            description=description or f"{summary.get('providerName', '')} {summary.get('modelName', '')}".strip(),
+            streaming=summary.get("responseStreamingSupported", False),
+            input_modalities=summary.get("inputModalities", []),
+            inference_profile=model_id != summary["modelId"]
+        ))
+
+    def _annotate(self, model: ModelInfo) -> ModelInfo:
+        """Fill in the token limits and whether an adapter supports it"""
+        try:
+            self.providers.resolve(model.model_id)
+            supported = True
+        except ValueError:
+            supported = False
+        updates = {"supported": supported}
+        if model.max_output_tokens is None:
+            updates["max_output_tokens"] = self._max_tokens_for(model.model_id)
+        if model.context_tokens is None:
+            updates["context_tokens"] = _prefix_lookup(self._windows, model.model_id)
+        return model.model_copy(update=updates)
+
+    def _max_tokens_for(self, model_id: str) -> Optional[int]:
+        return _prefix_lookup(self._limits, model_id)
+
+    def _set_models(self, models: List[ModelInfo], fetched_at: float):
+        ordered = sorted(models, key=lambda model: (model.provider, model.name))
+        self._models = {model.model_id: model for model in ordered}
+        self._fetched_at = fetched_at
+
+    def _refresh_if_stale(self):
+        now = time.time()
+        if now - self._fetched_at < self.ttl_seconds:
+            return
+        # After a failure, back off instead of retrying on every request
+        if now - self._failed_at < min(self.ttl_seconds, self.RETRY_SECONDS):
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="model-catalog", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # Keep serving the stale catalog; retry after a backoff
+            logger.warning("Model catalog refresh failed: %s", e)
+            self._failed_at = time.time()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _load_disk_cache(self):
+        if not self.cache_path or not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+            models = [self._annotate(ModelInfo(**model)) for model in data["models"]]
+        except Exception as e:
+            logger.warning("Ignoring unreadable model catalog cache: %s", e)
+            return
+        self._set_models(models, fetched_at=data.get("fetched_at", 0.0))
+
+    def _save_disk_cache(self):
+        if not self.cache_path:
+            return
+        data = {
+            "fetched_at": self._fetched_at,
+            "models": [model.model_dump() for model in self._models.values()]
+        }
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Could not write model catalog cache: %s", e)
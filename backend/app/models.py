@@ -1,8 +1,29 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Dict, Any, List
+import itertools
+import math
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Annotated, Optional, Dict, Any, List, Literal, Union
 from datetime import datetime
 
 
+class ContentBlock(BaseModel):
+    """Text block of a system prompt or message"""
+    text: str = Field(..., min_length=1)
+    cache: bool = Field(
+        default=False,
+        description="Mark the prompt prefix ending at this block as cacheable (Anthropic models)"
+    )
+
+
+class Message(BaseModel):
+    """One conversation turn"""
+    role: Literal["user", "assistant"]
+    content: Union[str, List[ContentBlock]]
+
+
+# Anthropic accepts at most this many cache checkpoints per request
+MAX_CACHE_CHECKPOINTS = 4
+
+
 class PromptRequest(BaseModel):
     """Request model for prompt invocation"""
     model_config = ConfigDict(
@@ -18,11 +39,45 @@ class PromptRequest(BaseModel):
         }
     )
     
-    prompt: str = Field(..., min_length=1, description="The prompt text")
+    prompt: Optional[str] = Field(default=None, min_length=1, description="The prompt text")
     model_id: str = Field(..., description="Bedrock model ID")
+    system: Optional[Union[str, List[ContentBlock]]] = Field(
+        default=None, description="System prompt"
+    )
+    messages: Optional[List[Message]] = Field(
+        default=None, min_length=1, description="Conversation, instead of a single prompt"
+    )
     temperature: float = Field(default=0.7, ge=0.0, le=1.0, description="Sampling temperature")
-    max_tokens: int = Field(default=2048, ge=1, le=4096, description="Maximum tokens to generate")
+    max_tokens: int = Field(
+        default=2048, ge=1, description="Maximum tokens to generate (checked against the model's limit)"
+    )
     top_p: float = Field(default=0.9, ge=0.0, le=1.0, description="Top-p sampling")
+    
+    @model_validator(mode="after")
+    def check_prompt(self) -> "PromptRequest":
+        if (self.prompt is None) == (self.messages is None):
+            raise ValueError("Provide either 'prompt' or 'messages'")
+        
+        blocks = list(self.system) if isinstance(self.system, list) else []
+        for message in self.messages or []:
+            if isinstance(message.content, list):
+                blocks.extend(message.content)
+        if sum(block.cache for block in blocks) > MAX_CACHE_CHECKPOINTS:
+            raise ValueError(f"At most {MAX_CACHE_CHECKPOINTS} blocks can be marked 'cache'")
+        return self
+    
+    def invocation_params(self) -> Dict[str, Any]:
+        """Keyword arguments for the BedrockClient invoke methods"""
+        structured = self.model_dump(include={"system", "messages"})
+        return {
+            "prompt": self.prompt,
+            "model_id": self.model_id,
+            "system": structured["system"],
+            "messages": structured["messages"],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": self.top_p
+        }
 
 
 class PromptResponse(BaseModel):
@@ -34,8 +89,12 @@ class PromptResponse(BaseModel):
                 "response_text": "Inteligência artificial é...",
                 "model_id": "anthropic.claude-3-sonnet-20240229-v1:0",
                 "tokens_used": 150,
+                "estimated_input_tokens": 24,
                 "response_time_ms": 1234,
-                "timestamp": "2024-11-03T10:30:00"
+                "timestamp": "2024-11-03T10:30:00",
+                "cached": False,
+                "cache_read_tokens": 1800,
+                "cache_write_tokens": 0
             }
         }
     )
@@ -43,8 +102,120 @@ class PromptResponse(BaseModel):
     response_text: str
     model_id: str
     tokens_used: Optional[int] = None
+    estimated_input_tokens: Optional[int] = Field(
+        default=None, description="Input tokens estimated locally before the call"
+    )
+    cache_read_tokens: Optional[int] = Field(
+        default=None, description="Input tokens read from the prompt cache"
+    )
+    cache_write_tokens: Optional[int] = Field(
+        default=None, description="Input tokens written to the prompt cache"
+    )
     response_time_ms: int
     timestamp: str
+    cached: bool = False
+    deduplicated: bool = Field(
+        default=False, description="Shared an identical request's in-flight invocation"
+    )
+    semantic_similarity: Optional[float] = Field(
+        default=None, description="Similarity of the earlier prompt whose response was reused (semantic cache hits)"
+    )
+
+
+class TokenEstimateResponse(BaseModel):
+    """Local token estimate of a prompt against the model's limits"""
+    model_config = ConfigDict(protected_namespaces=())
+    
+    model_id: str
+    tokenizer: str = Field(..., description="Tokenizer family used for the estimate")
+    input_tokens: int = Field(..., description="Estimated input tokens")
+    max_tokens: int
+    total_tokens: int = Field(..., description="input_tokens + max_tokens")
+    max_output_tokens: Optional[int] = None
+    context_tokens: Optional[int] = Field(default=None, description="Model's context window (None if unknown)")
+    available_output_tokens: Optional[int] = Field(
+        default=None, description="Largest max_tokens that fits the context window and output limit"
+    )
+    fits: bool = Field(..., description="Whether the request passes the pre-flight check of /api/prompt")
+
+
+class ParameterGrid(BaseModel):
+    """Cartesian product of prompts, models and sampling parameters"""
+    model_config = ConfigDict(protected_namespaces=())
+    
+    # Items carry the PromptRequest constraints, so a bad value is a 422
+    # here instead of a failure while expanding
+    prompts: List[Annotated[str, Field(min_length=1)]] = Field(..., min_length=1, description="Prompts to run")
+    model_ids: List[str] = Field(..., min_length=1, description="Bedrock model IDs")
+    temperatures: List[Annotated[float, Field(ge=0.0, le=1.0)]] = Field(default=[0.7], min_length=1)
+    max_tokens: List[Annotated[int, Field(ge=1)]] = Field(default=[2048], min_length=1)
+    top_p: List[Annotated[float, Field(ge=0.0, le=1.0)]] = Field(default=[0.9], min_length=1)
+    
+    def size(self) -> int:
+        """Number of combinations, without building them"""
+        return math.prod(
+            len(values) for values in (self.prompts, self.model_ids, self.temperatures, self.max_tokens, self.top_p)
+        )
+    
+    def expand(self) -> List[PromptRequest]:
+        """Build one PromptRequest per combination"""
+        return [
+            PromptRequest(
+                prompt=prompt,
+                model_id=model_id,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p
+            )
+            for prompt, model_id, temperature, max_tokens, top_p in itertools.product(
+                self.prompts, self.model_ids, self.temperatures, self.max_tokens, self.top_p
+            )
+        ]
+
+
+class BatchPromptRequest(BaseModel):
+    """Request model for batch prompt execution"""
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "grid": {
+                    "prompts": ["Explique o que é inteligência artificial"],
+                    "model_ids": ["us.anthropic.claude-3-5-sonnet-20241022-v2:0"],
+                    "temperatures": [0.0, 0.7],
+                    "max_tokens": [512],
+                    "top_p": [0.9]
+                }
+            }
+        }
+    )
+    
+    requests: List[PromptRequest] = Field(default=[], description="Explicit prompt requests")
+    grid: Optional[ParameterGrid] = Field(default=None, description="Parameter grid to expand")
+    
+    @model_validator(mode="after")
+    def check_not_empty(self) -> "BatchPromptRequest":
+        if not self.requests and self.grid is None:
+            raise ValueError("Provide 'requests' and/or 'grid'")
+        return self
+    
+    def size(self) -> int:
+        """Number of requests the batch expands to"""
+        return len(self.requests) + (self.grid.size() if self.grid is not None else 0)
+    
+    def expand(self) -> List[PromptRequest]:
+        """All requests in the batch, explicit ones first"""
+        expanded = list(self.requests)
+        if self.grid is not None:
+            expanded.extend(self.grid.expand())
+        return expanded
+
+
+class BatchPromptResult(BaseModel):
+    """One finished item of a batch, streamed as a line of NDJSON"""
+    index: int
+    request: PromptRequest
+    response: Optional[PromptResponse] = None
+    error: Optional[str] = None
 
 
 class ModelInfo(BaseModel):
@@ -57,7 +228,12 @@ class ModelInfo(BaseModel):
                 "provider": "Anthropic",
                 "name": "Claude 3 Sonnet",
                 "description": "Balanced model for most tasks",
-                "supported": True
+                "supported": True,
+                "streaming": True,
+                "max_output_tokens": 4096,
+                "context_tokens": 200000,
+                "input_modalities": ["TEXT", "IMAGE"],
+                "inference_profile": False
             }
         }
     )
@@ -67,6 +243,11 @@ class ModelInfo(BaseModel):
     name: str
     description: str
     supported: bool = True
+    streaming: bool = True
+    max_output_tokens: Optional[int] = None
+    context_tokens: Optional[int] = None
+    input_modalities: List[str] = ["TEXT"]
+    inference_profile: bool = False
 
 
 class ErrorResponse(BaseModel):
@@ -85,27 +266,159 @@ class FileUploadResponse(BaseModel):
     filename: str
     uploaded_at: str
     message: str
+    sha256: Optional[str] = None
+    deduplicated: bool = Field(
+        default=False, description="The content was already uploaded; nothing was transferred"
+    )
+    status: str = Field(
+        default="available",
+        description="available, or verifying while a direct upload is checked against its SHA-256 (key doesn't exist yet)"
+    )
+    job_id: Optional[str] = Field(
+        default=None, description="Ingest/verification job of the upload; poll /api/jobs/{job_id}"
+    )
     
     class Config:
         json_schema_extra = {
             "example": {
                 "success": True,
                 "bucket": "my-bucket",
-                "key": "uploads/20241105_120000_data.csv",
-                "url": "https://my-bucket.s3.us-east-1.amazonaws.com/uploads/20241105_120000_data.csv",
+                "key": "uploads/3f2a9c0d41b7e865_data.csv",
+                "url": "https://my-bucket.s3.us-east-1.amazonaws.com/uploads/3f2a9c0d41b7e865_data.csv",
                 "filename": "data.csv",
                 "uploaded_at": "20241105_120000",
-                "message": "File uploaded successfully"
+                "message": "File uploaded successfully",
+                "sha256": "3f2a9c0d41b7e8650c2d3b4a5f6e7d8c9b0a1f2e3d4c5b6a7980f1e2d3c4b5a6",
+                "deduplicated": False
             }
         }
 
 
+SHA256_PATTERN = "^[0-9a-fA-F]{64}$"
+
+
+class UploadCheckRequest(BaseModel):
+    """Request model for looking up a file by content hash before uploading it"""
+    sha256: str = Field(..., pattern=SHA256_PATTERN, description="Hex SHA-256 of the file")
+
+
+class UploadCheckResponse(BaseModel):
+    """Whether a file with this content is already uploaded, and where"""
+    exists: bool
+    file: Optional[FileUploadResponse] = None
+
+
+class PresignedUploadRequest(BaseModel):
+    """Request model for a direct-to-S3 presigned POST upload"""
+    filename: str = Field(..., description="Original filename (.csv)")
+    content_type: str = Field(default="text/csv")
+    sha256: Optional[str] = Field(
+        default=None,
+        pattern=SHA256_PATTERN,
+        description="Hex SHA-256 of the file: skips known files; the upload is verified before it gets its content-addressed key"
+    )
+
+
+class PresignedUploadResponse(BaseModel):
+    """
+    Presigned POST form: send `fields` plus the file to `url`
+    
+    When `exists` is true the content is already uploaded as `key`: there
+    is nothing to send.
+    """
+    key: str
+    url: Optional[str] = None
+    fields: Dict[str, str] = {}
+    expires_in: Optional[int] = None
+    exists: bool = False
+
+
+class MultipartUploadRequest(BaseModel):
+    """Request model for starting a direct-to-S3 multipart upload"""
+    filename: str = Field(..., description="Original filename (.csv)")
+    part_count: int = Field(..., ge=1, le=10000, description="Number of parts to presign")
+    content_type: str = Field(default="text/csv")
+    sha256: Optional[str] = Field(
+        default=None,
+        pattern=SHA256_PATTERN,
+        description="Hex SHA-256 of the file: skips known files and resumes interrupted uploads"
+    )
+
+
+class MultipartPartUrl(BaseModel):
+    """Presigned URL for one part"""
+    part_number: int
+    url: str
+
+
+class UploadedPart(BaseModel):
+    """Part number and the ETag S3 returned for it"""
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+
+class CommittedPart(UploadedPart):
+    """Part S3 already has, from an earlier attempt"""
+    size: int
+
+
+class MultipartUploadResponse(BaseModel):
+    """
+    Started (or resumed) multipart upload with a presigned URL per missing part
+    
+    When `exists` is true the content is already uploaded as `key`: there
+    is nothing to send.
+    """
+    key: str
+    upload_id: Optional[str] = None
+    part_size: int
+    urls: List[MultipartPartUrl]
+    uploaded_parts: List[CommittedPart] = Field(
+        default=[], description="Parts already uploaded; send their ETags when completing"
+    )
+    exists: bool = False
+
+
+class MultipartResumeRequest(BaseModel):
+    """Request model for resuming an interrupted multipart upload"""
+    key: str
+    upload_id: str
+    part_count: int = Field(..., ge=1, le=10000, description="Number of parts of the whole file")
+
+
+class MultipartCompleteRequest(BaseModel):
+    """Request model for completing or aborting a multipart upload"""
+    key: str
+    upload_id: str
+    parts: List[UploadedPart] = Field(default=[])
+
+
 class S3FileInfo(BaseModel):
     """S3 file information"""
     key: str
     size: int
     last_modified: str
     filename: str
+    etag: Optional[str] = None
+    index: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Column index (schema, row count, per-column stats) with include_index=true"
+    )
+
+
+class S3FileListResponse(BaseModel):
+    """One page of uploaded files"""
+    files: List[S3FileInfo]
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Pass as `cursor` to get the next page. Filtered pages may hold fewer than "
+                    "`limit` files (even none) and still have more after them"
+    )
+
+
+class IngestRequest(BaseModel):
+    """Request model for (re)building a CSV's column index and columnar copy"""
+    key: str = Field(..., description="S3 key of an uploaded CSV")
 
 
 class ProcessRequest(BaseModel):
@@ -128,6 +441,7 @@ class ProcessResponse(BaseModel):
     success: bool
     data: Any  # Pode ser string ou dict
     message: str
+    job_id: Optional[str] = None  # Set when submitted with mode=async
     
     class Config:
         json_schema_extra = {
@@ -138,3 +452,102 @@ class ProcessResponse(BaseModel):
             }
         }
 
+
+
+class JobResponse(BaseModel):
+    """Background job status"""
+    job_id: str
+    kind: str
+    status: str  # pending, running, succeeded or failed
+    created_at: str
+    updated_at: str
+    result_key: Optional[str] = None
+    result_url: Optional[str] = None
+    error: Optional[str] = None
+    progress: Optional[Dict[str, Any]] = None
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "3f2b0c1e9a8d4b7c8e6f5a4b3c2d1e0f",
+                "kind": "process",
+                "status": "succeeded",
+                "created_at": "2024-11-05T12:00:00",
+                "updated_at": "2024-11-05T12:01:30",
+                "result_key": "jobs/3f2b0c1e9a8d4b7c8e6f5a4b3c2d1e0f/result.json",
+                "result_url": "https://...",
+                "error": None,
+                "progress": None
+            }
+        }
+
+
+class EvaluationRequest(BaseModel):
+    """Request model for a dataset evaluation job"""
+    model_config = ConfigDict(
+        protected_namespaces=(),
+        json_schema_extra={
+            "example": {
+                "csv_key": "uploads/20241105_120000_perguntas.csv",
+                "template": "Responda em uma frase: {pergunta}",
+                "model_id": "us.anthropic.claude-3-5-haiku-20241022-v1:0",
+                "temperature": 0.0,
+                "max_tokens": 256
+            }
+        }
+    )
+    
+    csv_key: str = Field(..., description="S3 key of the dataset CSV")
+    template: str = Field(..., min_length=1, description="Prompt with {column} placeholders")
+    model_id: str = Field(..., description="Bedrock model ID")
+    temperature: float = Field(default=0.7, ge=0.0, le=1.0)
+    max_tokens: int = Field(default=2048, ge=1)
+    top_p: float = Field(default=0.9, ge=0.0, le=1.0)
+    system: Optional[str] = Field(default=None, description="Optional system prompt")
+    include_columns: Optional[List[str]] = Field(
+        default=None, description="Dataset columns copied to the results (default: all)"
+    )
+    concurrency: Optional[int] = Field(
+        default=None, ge=1, le=64, description="Rows in flight at once (default: EVALUATION_CONCURRENCY)"
+    )
+    
+    def invocation_params(self) -> Dict[str, Any]:
+        """BedrockClient keyword arguments, with the unrendered template as the prompt"""
+        return {
+            "prompt": self.template,
+            "model_id": self.model_id,
+            "system": self.system,
+            "messages": None,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": self.top_p
+        }
+
+
+class HistoryEntry(BaseModel):
+    """One recorded prompt invocation"""
+    model_config = ConfigDict(protected_namespaces=())
+    
+    id: str
+    timestamp: str
+    model_id: str
+    prompt: str
+    request: Dict[str, Any]
+    source: str = "prompt"
+    response_text: Optional[str] = None
+    tokens_used: Optional[int] = None
+    estimated_input_tokens: Optional[int] = None
+    cache_read_tokens: Optional[int] = None
+    cache_write_tokens: Optional[int] = None
+    response_time_ms: Optional[int] = None
+    cached: bool = False
+    deduplicated: bool = False
+    semantic_similarity: Optional[float] = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = {}
+
+
+class HistoryPage(BaseModel):
+    """One page of prompt history, newest first"""
+    items: List[HistoryEntry]
+    next_cursor: Optional[str] = None
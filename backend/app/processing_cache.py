@@ -0,0 +1,244 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import TTLCache, S3CacheTier
+from .config import Settings
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = REGISTRY.counter(
+    "processing_cache_lookups_total", "Processing result cache lookups by result", ("result",)
+)
+PERSISTENT_ERRORS = REGISTRY.counter(
+    "processing_cache_persistent_errors_total",
+    "Failed reads and writes of the shared processing cache tier",
+    ("operation",)
+)
+
+
+def project_result(result: Any, cached_columns: List[str], columns: List[str]) -> Optional[Any]:
+    """
+    Cut a processing result down to a subset of its columns
+
+    Understands the local backend's {"columns": {name: ...}} results and
+    results keyed by column name only.
+
+    Returns:
+        The projected result, or None if its shape has no per-column parts
+    """
+    if not isinstance(result, dict):
+        return None
+    per_column = result.get("columns")
+    if isinstance(per_column, dict) and all(column in per_column for column in columns):
+        return {**result, "columns": {column: per_column[column] for column in columns}}
+    if set(result) == set(cached_columns):
+        return {column: result[column] for column in columns}
+    return None
+
+
+class ProcessingCache:
+    """
+    Result cache in front of a processing client (LambdaClient or
+    LocalProcessingClient), with the same invoke_processing interface
+
+    Entries are keyed on the CSV's ETag, the target and the sorted column
+    set, so a changed object is never answered from the old results. A
+    request for columns that an earlier request already covered is
+    answered from that superset's result. Each object version keeps a list
+    of its cached column sets, in memory and (with an S3 tier) in a
+    manifest next to the entries.
+    """
+
+    def __init__(
+        self,
+        processing_client,
+        s3_client,
+        memory: TTLCache,
+        persistent: Optional[S3CacheTier] = None,
+        max_column_sets: int = 32
+    ):
+        """
+        Args:
+            processing_client: Client that computes results on a miss
+            s3_client: S3Client used to read the CSVs' ETags
+            memory: In-memory LRU tier
+            persistent: Optional S3 tier, shared by every instance
+            max_column_sets: Column sets remembered per object version
+        """
+        self.processing_client = processing_client
+        self.s3_client = s3_client
+        self.memory = memory
+        self.persistent = persistent
+        self.max_column_sets = max_column_sets
+        self.hits = 0
+        self.superset_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def invoke_processing(self, csv_key: str, target: str, columns: list) -> dict:
+        """
+        Process a CSV file, reusing an earlier result when possible
+
+        Args:
+            csv_key: S3 key of the CSV file
+            target: Target type ('alumno' or 'professor')
+            columns: List of column names to process
+
+        Returns:
+            dict: Processing result
+        """
+        head = None if os.path.isfile(csv_key) else self.s3_client.head_object(csv_key)
+        if head is None:
+            # Local files and missing keys go straight to the client
+            return self.processing_client.invoke_processing(csv_key=csv_key, target=target, columns=columns)
+
+        version = self._version_key(csv_key, head["etag"], target)
+        wanted = sorted(set(columns))
+        result = self._lookup(version, wanted, list(columns))
+        if result is not None:
+            return result
+
+        with self._lock:
+            self.misses += 1
+        LOOKUPS.inc(result="miss")
+        result = self.processing_client.invoke_processing(csv_key=csv_key, target=target, columns=columns)
+        self._store(version, wanted, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        return {
+            "hits": self.hits,
+            "superset_hits": self.superset_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "entries": len(self.memory)
+        }
+
+    # -- lookups ------------------------------------------------------------
+
+    @staticmethod
+    def _version_key(csv_key: str, etag: str, target: str) -> str:
+        digest = hashlib.sha256(json.dumps([csv_key, etag, target]).encode("utf-8")).hexdigest()
+        return digest[:32]
+
+    @staticmethod
+    def _entry_key(version: str, column_set: List[str]) -> str:
+        digest = hashlib.sha256(json.dumps(column_set, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return f"{version}/{digest[:32]}"
+
+    def _lookup(self, version: str, wanted: List[str], columns: List[str]) -> Optional[dict]:
+        column_sets = self.memory.get(f"{version}/sets") or []
+        result = self._find(version, column_sets, wanted, columns)
+        if result is None and self.persistent is not None:
+            # Other instances may have cached more column sets
+            entry = self._read_persistent(f"{version}/sets")
+            shared = entry[0] if entry is not None else []
+            if shared:
+                self.memory.set(f"{version}/sets", shared, ttl_seconds=entry[1] - time.time())
+            result = self._find(version, [c for c in shared if c not in column_sets], wanted, columns)
+        return result
+
+    def _find(self, version: str, column_sets: List[List[str]], wanted: List[str], columns: List[str]) -> Optional[dict]:
+        """Answer from the exact column set, else from the smallest cached superset"""
+        candidates = sorted(
+            (column_set for column_set in column_sets if set(wanted) <= set(column_set)),
+            key=len
+        )
+        for column_set in candidates:
+            entry_key = self._entry_key(version, column_set)
+            persistent = False
+            cached = self.memory.get(entry_key)
+            if cached is None and self.persistent is not None:
+                entry = self._read_persistent(entry_key)
+                if entry is not None:
+                    cached, expires_at = entry
+                    persistent = True
+                    # Promoted with what is left of its TTL, not a fresh one
+                    self.memory.set(entry_key, cached, ttl_seconds=expires_at - time.time())
+            if cached is None:
+                continue
+
+            if column_set == columns:
+                result = cached
+            else:
+                result = project_result(cached, column_set, columns)
+                if result is None:
+                    if column_set != wanted:
+                        continue
+                    # Same columns in another order, and no way to reorder them
+                    result = cached
+            with self._lock:
+                self.hits += 1
+                self.superset_hits += column_set != wanted
+                self.persistent_hits += persistent
+            LOOKUPS.inc(result="hit" if column_set == wanted else "superset_hit")
+            return result
+        return None
+
+    def _store(self, version: str, wanted: List[str], result: dict):
+        entry_key = self._entry_key(version, wanted)
+        self.memory.set(entry_key, result)
+
+        column_sets = self.memory.get(f"{version}/sets") or []
+        if self.persistent is not None:
+            # Merge with what other instances cached since
+            entry = self._read_persistent(f"{version}/sets")
+            shared = entry[0] if entry is not None else []
+            column_sets = shared + [column_set for column_set in column_sets if column_set not in shared]
+        column_sets = [column_set for column_set in column_sets if column_set != wanted]
+        if project_result(result, wanted, wanted) is not None:
+            # This result can answer every subset of its columns
+            column_sets = [column_set for column_set in column_sets if not set(column_set) <= set(wanted)]
+        column_sets = (column_sets + [wanted])[-self.max_column_sets:]
+        self.memory.set(f"{version}/sets", column_sets)
+
+        if self.persistent is not None:
+            try:
+                self.persistent.set(entry_key, result)
+                self.persistent.set(f"{version}/sets", column_sets)
+            except Exception:
+                # The result is still good; only sharing it failed
+                PERSISTENT_ERRORS.inc(operation="set")
+                logger.warning("Writing the shared processing cache failed", exc_info=True)
+
+    def _read_persistent(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, expires_at) from the persistent tier, or None"""
+        try:
+            return self.persistent.get_entry(key)
+        except Exception:
+            # A broken persistent tier degrades to a miss
+            PERSISTENT_ERRORS.inc(operation="get")
+            logger.warning("Reading the shared processing cache failed", exc_info=True)
+            return None
+
+
+def build_processing_cache(settings: Settings, processing_client, s3_client) -> Optional[ProcessingCache]:
+    """
+    Wrap a processing client in the result cache described by the settings
+
+    Returns:
+        ProcessingCache, or None if caching is disabled
+    """
+    if not settings.processing_cache_enabled:
+        return None
+
+    ttl = settings.processing_cache_ttl_seconds
+    memory = TTLCache(settings.processing_cache_max_entries, ttl)
+
+    backend = settings.processing_cache_backend.lower()
+    if backend == "s3":
+        persistent = S3CacheTier(s3_client, settings.processing_cache_s3_prefix, ttl)
+    elif backend:
+        raise ValueError(f"Unknown processing cache backend: {backend}")
+    else:
+        persistent = None
+
+    return ProcessingCache(processing_client, s3_client, memory, persistent)
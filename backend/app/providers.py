@@ -0,0 +1,519 @@
+"""
+Bedrock provider adapters
+
+Each model family speaks its own request/response format. An adapter owns
+everything provider-specific: building the request, calling the runtime
+API, parsing the response, decoding streamed chunks and token accounting.
+BedrockClient resolves the adapter once per model ID through a
+ProviderRegistry and never looks at the model ID again.
+
+Adding a model of a known family is a config change: map its ID (or an ID
+prefix) to an adapter name in BEDROCK_MODEL_PROVIDERS, or send unknown
+models to the Converse API with BEDROCK_DEFAULT_PROVIDER=converse.
+"""
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .metrics import timed
+
+# System prompt / message content: plain text or [{"text": ..., "cache": bool}]
+Content = Union[str, List[Dict[str, Any]]]
+Messages = Optional[List[Dict[str, Any]]]
+
+# Cross-region inference profile IDs prefix the model ID with a geography
+REGION_PREFIXES = ("us.", "eu.", "apac.", "us-gov.", "global.")
+
+
+def _content_text(content: Content) -> str:
+    if isinstance(content, str):
+        return content
+    return "\n\n".join(block["text"] for block in content)
+
+
+def flatten_prompt(
+    prompt: Optional[str],
+    system: Optional[Content] = None,
+    messages: Messages = None
+) -> str:
+    """
+    Render a system prompt and conversation as a single prompt string
+
+    Used for providers without a messages API and for token estimates.
+    """
+    parts = []
+    if system:
+        parts.append(_content_text(system))
+    if messages:
+        parts.extend(
+            f"{message['role'].capitalize()}: {_content_text(message['content'])}"
+            for message in messages
+        )
+    if prompt:
+        parts.append(prompt)
+    return "\n\n".join(parts)
+
+
+def _usage(tokens_used=None, cache_read_tokens=None, cache_write_tokens=None, output_tokens=None) -> Dict[str, Any]:
+    """
+    Token counts of a response
+
+    tokens_used is what the model family reports (output tokens, or input
+    plus output for Titan); output_tokens is always the generated part,
+    which admission control settles against max_tokens.
+    """
+    return {
+        "tokens_used": tokens_used,
+        "output_tokens": output_tokens if output_tokens is not None else tokens_used,
+        "cache_read_tokens": cache_read_tokens,
+        "cache_write_tokens": cache_write_tokens
+    }
+
+
+class ProviderAdapter:
+    """
+    Base adapter for models called through InvokeModel
+
+    Subclasses implement build_request, parse_response, parse_stream_chunk
+    and stream_usage. `usage` dicts passed to the streaming methods collect
+    token counts seen while decoding chunks.
+    """
+
+    name = ""
+    operation = "InvokeModel"
+
+    def build_request(
+        self,
+        prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        top_p: float,
+        system: Optional[Content] = None,
+        messages: Messages = None
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def invoke(self, client, model_id: str, body: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Call the model and return (decoded response body, HTTP headers)
+        """
+        response = client.invoke_model(modelId=model_id, body=json.dumps(body))
+
+        # Read the rest of the response body
+        with timed("bedrock-runtime", self.operation, "download"):
+            raw_body = response["body"].read()
+        with timed("bedrock-runtime", self.operation, "parse"):
+            decoded = json.loads(raw_body)
+        return decoded, response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+
+    def parse_response(self, body: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Extract the completion and token counts
+
+        Returns:
+            Dict with response_text, tokens_used, output_tokens,
+            cache_read_tokens and cache_write_tokens
+        """
+        raise NotImplementedError
+
+    def invoke_stream(self, client, model_id: str, body: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Call the model with streaming and yield the decoded chunks"""
+        response = client.invoke_model_with_response_stream(
+            modelId=model_id,
+            body=json.dumps(body)
+        )
+        for event in response["body"]:
+            if "chunk" in event:
+                yield json.loads(event["chunk"]["bytes"])
+
+    def parse_stream_chunk(self, chunk: Dict[str, Any], usage: Dict[str, Any]) -> str:
+        """Return the text delta of a chunk, recording token counts in `usage`"""
+        raise NotImplementedError
+
+    def stream_usage(self, usage: Dict[str, Any]) -> Dict[str, Any]:
+        """Token counts of a finished stream, in parse_response's format"""
+        raise NotImplementedError
+
+    def _header_tokens(self, headers: Dict[str, str]) -> Optional[int]:
+        """Output token count from the invocation metrics headers"""
+        value = headers.get("x-amzn-bedrock-output-token-count")
+        return int(value) if value is not None else None
+
+    def _record_invocation_metrics(self, chunk: Dict[str, Any], usage: Dict[str, Any]):
+        """Token counts Bedrock appends to the last chunk of a stream"""
+        metrics = chunk.get("amazon-bedrock-invocationMetrics")
+        if metrics:
+            usage["input_tokens"] = metrics.get("inputTokenCount")
+            usage["output_tokens"] = metrics.get("outputTokenCount")
+
+
+class AnthropicAdapter(ProviderAdapter):
+    """Anthropic Claude (Messages API)"""
+
+    name = "anthropic"
+
+    def build_request(self, prompt, temperature, max_tokens, top_p, system=None, messages=None):
+        """
+        Content blocks flagged with "cache" get a cache_control marker, so
+        Bedrock caches the prompt prefix up to and including that block and
+        later requests sharing it read it from the cache.
+        """
+        if messages is None:
+            messages = [{"role": "user", "content": prompt}]
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "messages": [
+                {
+                    "role": message["role"],
+                    "content": self._content(message["content"])
+                }
+                for message in messages
+            ]
+        }
+        if system:
+            body["system"] = self._content(system)
+        return body
+
+    def _content(self, content: Content) -> Union[str, List[Dict[str, Any]]]:
+        """Convert text or content blocks to Anthropic's content format"""
+        if isinstance(content, str):
+            return content
+        blocks = []
+        for block in content:
+            anthropic_block = {"type": "text", "text": block["text"]}
+            if block.get("cache"):
+                anthropic_block["cache_control"] = {"type": "ephemeral"}
+            blocks.append(anthropic_block)
+        return blocks
+
+    def parse_response(self, body, headers):
+        usage = body.get("usage", {})
+        return {
+            "response_text": body["content"][0]["text"],
+            **_usage(
+                usage.get("output_tokens"),
+                usage.get("cache_read_input_tokens"),
+                usage.get("cache_creation_input_tokens")
+            )
+        }
+
+    def parse_stream_chunk(self, chunk, usage):
+        if chunk.get("type") == "message_start":
+            start_usage = chunk["message"].get("usage", {})
+            usage["input_tokens"] = start_usage.get("input_tokens", 0)
+            for key in ("cache_read_input_tokens", "cache_creation_input_tokens"):
+                if start_usage.get(key) is not None:
+                    usage[key] = start_usage[key]
+        elif chunk.get("type") == "message_delta":
+            usage["output_tokens"] = chunk.get("usage", {}).get("output_tokens")
+        elif chunk.get("type") == "content_block_delta":
+            return chunk["delta"].get("text", "")
+        return ""
+
+    def stream_usage(self, usage):
+        return _usage(
+            usage.get("output_tokens"),
+            usage.get("cache_read_input_tokens"),
+            usage.get("cache_creation_input_tokens")
+        )
+
+
+class LlamaAdapter(ProviderAdapter):
+    """Meta Llama (text completion)"""
+
+    name = "llama"
+
+    def build_request(self, prompt, temperature, max_tokens, top_p, system=None, messages=None):
+        return {
+            "prompt": flatten_prompt(prompt, system, messages),
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_gen_len": max_tokens
+        }
+
+    def parse_response(self, body, headers):
+        return {
+            "response_text": body["generation"],
+            **_usage(body.get("generation_token_count"))
+        }
+
+    def parse_stream_chunk(self, chunk, usage):
+        if chunk.get("generation_token_count") is not None:
+            usage["generation_token_count"] = chunk["generation_token_count"]
+        return chunk.get("generation", "")
+
+    def stream_usage(self, usage):
+        return _usage(usage.get("generation_token_count"))
+
+
+class TitanAdapter(ProviderAdapter):
+    """Amazon Titan Text"""
+
+    name = "titan"
+
+    def build_request(self, prompt, temperature, max_tokens, top_p, system=None, messages=None):
+        return {
+            "inputText": flatten_prompt(prompt, system, messages),
+            "textGenerationConfig": {
+                "temperature": temperature,
+                "topP": top_p,
+                "maxTokenCount": max_tokens
+            }
+        }
+
+    def parse_response(self, body, headers):
+        result = body["results"][0]
+        return {
+            "response_text": result["outputText"],
+            **_usage(
+                body.get("inputTextTokenCount", 0) + result.get("tokenCount", 0),
+                output_tokens=result.get("tokenCount", 0)
+            )
+        }
+
+    def parse_stream_chunk(self, chunk, usage):
+        if "inputTextTokenCount" in chunk:
+            usage["input_tokens"] = chunk["inputTextTokenCount"]
+        if "totalOutputTextTokenCount" in chunk:
+            usage["output_tokens"] = chunk["totalOutputTextTokenCount"]
+        return chunk.get("outputText", "")
+
+    def stream_usage(self, usage):
+        return _usage(
+            usage.get("input_tokens", 0) + usage.get("output_tokens", 0),
+            output_tokens=usage.get("output_tokens", 0)
+        )
+
+
+class MistralAdapter(ProviderAdapter):
+    """Mistral (text completion with the [INST] chat template)"""
+
+    name = "mistral"
+
+    def build_request(self, prompt, temperature, max_tokens, top_p, system=None, messages=None):
+        return {
+            "prompt": self._format_prompt(prompt, system, messages),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p
+        }
+
+    def _format_prompt(self, prompt: Optional[str], system: Optional[Content], messages: Messages) -> str:
+        if messages is None:
+            messages = [{"role": "user", "content": prompt}]
+        text = "<s>"
+        for index, message in enumerate(messages):
+            content = _content_text(message["content"])
+            if message["role"] == "user":
+                # Mistral has no system role: prepend it to the first instruction
+                if index == 0 and system:
+                    content = f"{_content_text(system)}\n\n{content}"
+                text += f"[INST] {content} [/INST]"
+            else:
+                text += f"{content}</s>"
+        return text
+
+    def parse_response(self, body, headers):
+        return {
+            "response_text": body["outputs"][0]["text"],
+            **_usage(self._header_tokens(headers))
+        }
+
+    def parse_stream_chunk(self, chunk, usage):
+        self._record_invocation_metrics(chunk, usage)
+        outputs = chunk.get("outputs") or [{}]
+        return outputs[0].get("text", "")
+
+    def stream_usage(self, usage):
+        return _usage(usage.get("output_tokens"))
+
+
+class CohereAdapter(ProviderAdapter):
+    """Cohere Command R / R+ (chat)"""
+
+    name = "cohere"
+
+    def build_request(self, prompt, temperature, max_tokens, top_p, system=None, messages=None):
+        if messages is None:
+            messages = [{"role": "user", "content": prompt}]
+        history = [
+            {
+                "role": "USER" if message["role"] == "user" else "CHATBOT",
+                "message": _content_text(message["content"])
+            }
+            for message in messages[:-1]
+        ]
+        body = {
+            "message": _content_text(messages[-1]["content"]),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "p": top_p
+        }
+        if history:
+            body["chat_history"] = history
+        if system:
+            body["preamble"] = _content_text(system)
+        return body
+
+    def parse_response(self, body, headers):
+        return {
+            "response_text": body["text"],
+            **_usage(self._header_tokens(headers))
+        }
+
+    def parse_stream_chunk(self, chunk, usage):
+        self._record_invocation_metrics(chunk, usage)
+        if chunk.get("event_type") == "text-generation":
+            return chunk.get("text", "")
+        return ""
+
+    def stream_usage(self, usage):
+        return _usage(usage.get("output_tokens"))
+
+
+class ConverseAdapter(ProviderAdapter):
+    """
+    Any model through the Converse API
+
+    Converse has one request/response shape for every model that supports
+    it, so it is also the fallback for families without an adapter.
+    """
+
+    name = "converse"
+    operation = "Converse"
+
+    def build_request(self, prompt, temperature, max_tokens, top_p, system=None, messages=None):
+        if messages is None:
+            messages = [{"role": "user", "content": prompt}]
+        request = {
+            "messages": [
+                {"role": message["role"], "content": self._content(message["content"])}
+                for message in messages
+            ],
+            "inferenceConfig": {
+                "maxTokens": max_tokens,
+                "temperature": temperature,
+                "topP": top_p
+            }
+        }
+        if system:
+            request["system"] = self._content(system)
+        return request
+
+    def _content(self, content: Content) -> List[Dict[str, Any]]:
+        """Converse content blocks, with a cache point after flagged blocks"""
+        if isinstance(content, str):
+            return [{"text": content}]
+        blocks = []
+        for block in content:
+            blocks.append({"text": block["text"]})
+            if block.get("cache"):
+                blocks.append({"cachePoint": {"type": "default"}})
+        return blocks
+
+    def invoke(self, client, model_id, body):
+        response = client.converse(modelId=model_id, **body)
+        return response, {}
+
+    def parse_response(self, body, headers):
+        text = "".join(
+            block.get("text", "") for block in body["output"]["message"]["content"]
+        )
+        usage = body.get("usage", {})
+        return {
+            "response_text": text,
+            **_usage(
+                usage.get("outputTokens"),
+                usage.get("cacheReadInputTokens"),
+                usage.get("cacheWriteInputTokens")
+            )
+        }
+
+    def invoke_stream(self, client, model_id, body):
+        response = client.converse_stream(modelId=model_id, **body)
+        yield from response["stream"]
+
+    def parse_stream_chunk(self, chunk, usage):
+        if "metadata" in chunk:
+            usage.update(chunk["metadata"].get("usage", {}))
+        elif "contentBlockDelta" in chunk:
+            return chunk["contentBlockDelta"]["delta"].get("text", "")
+        return ""
+
+    def stream_usage(self, usage):
+        return _usage(
+            usage.get("outputTokens"),
+            usage.get("cacheReadInputTokens"),
+            usage.get("cacheWriteInputTokens")
+        )
+
+
+ADAPTERS: Dict[str, ProviderAdapter] = {
+    adapter.name: adapter
+    for adapter in (
+        AnthropicAdapter(), LlamaAdapter(), TitanAdapter(),
+        MistralAdapter(), CohereAdapter(), ConverseAdapter()
+    )
+}
+
+# Built-in model ID prefixes (without the region prefix) per adapter
+DEFAULT_PREFIXES = {
+    "anthropic.": "anthropic",
+    "meta.llama": "llama",
+    "amazon.titan-text": "titan",
+    "amazon.titan-tg1": "titan",
+    "mistral.": "mistral",
+    "cohere.command-r": "cohere",
+    "amazon.nova": "converse",
+}
+
+
+class ProviderRegistry:
+    """
+    Resolves model IDs to adapters
+
+    Exact-ID overrides win, then the longest matching prefix, then the
+    default adapter. Results are memoized, so after the first call a model
+    ID costs one dict lookup; the memo is bounded, since model IDs come
+    from requests.
+    """
+
+    MEMO_SIZE = 256
+
+    def __init__(self, overrides: Optional[Dict[str, str]] = None, default: str = ""):
+        """
+        Args:
+            overrides: Model ID or ID prefix -> adapter name
+            default: Adapter for unmatched models ("" to reject them)
+        """
+        prefixes = {**DEFAULT_PREFIXES, **(overrides or {})}
+        for name in list(prefixes.values()) + ([default] if default else []):
+            if name not in ADAPTERS:
+                raise ValueError(f"Unknown provider adapter: {name}")
+        # Longest prefix first
+        self._prefixes = sorted(prefixes.items(), key=lambda item: len(item[0]), reverse=True)
+        self._default = ADAPTERS[default] if default else None
+        self._resolved: Dict[str, ProviderAdapter] = {}
+
+    def resolve(self, model_id: str) -> ProviderAdapter:
+        adapter = self._resolved.get(model_id)
+        if adapter is None:
+            adapter = self._match(model_id)
+            if len(self._resolved) < self.MEMO_SIZE:
+                self._resolved[model_id] = adapter
+        return adapter
+
+    def _match(self, model_id: str) -> ProviderAdapter:
+        base_id = model_id
+        for region in REGION_PREFIXES:
+            if model_id.startswith(region):
+                base_id = model_id[len(region):]
+                break
+        for prefix, name in self._prefixes:
+            if model_id.startswith(prefix) or base_id.startswith(prefix):
+                return ADAPTERS[name]
+        if self._default is not None:
+            return self._default
+        raise ValueError(f"Unsupported model: {model_id}")
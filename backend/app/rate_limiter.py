@@ -0,0 +1,242 @@
+"""
+Client-side admission control for Bedrock, per model
+
+Each model gets token buckets for requests/min and tokens/min (sized a bit
+under the account quota) and an AIMD concurrency limit that halves when
+Bedrock throttles and creeps back up on success. Requests that can't be
+admitted wait in a FIFO queue until a deadline instead of failing at once.
+"""
+import asyncio
+import collections
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+from .config import Settings
+from .metrics import MODEL_LABELS, REGISTRY
+from .tokens import count_tokens
+
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "bedrock_admission_wait_seconds",
+    "Time requests waited for Bedrock admission",
+    ("model_id",)
+)
+
+
+class ThrottlingError(Exception):
+    """Bedrock rejected the request for exceeding a quota"""
+
+
+class AdmissionTimeoutError(Exception):
+    """A request could not be admitted before its deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelAdmission:
+    """
+    Admission state for one model
+
+    Thread-safe and not tied to an event loop, so API requests and jobs
+    running their own loops in worker threads share the same quotas.
+    """
+
+    # Poll interval while waiting for a concurrency slot
+    SLOT_POLL_SECONDS = 0.02
+
+    def __init__(self, model_id: str, rpm: float, tpm: float,
+                 initial_concurrency: float, max_concurrency: float):
+        self.model_id = model_id
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = float(initial_concurrency)
+        self.max_concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self._mutex = threading.Lock()
+        self._queue = collections.deque()  # FIFO: only the head of the line is admitted
+
+    @property
+    def idle(self) -> bool:
+        """No request admitted or waiting"""
+        return self.in_flight == 0 and not self._queue
+
+    def _try_admit(self, tokens: int) -> float:
+        if self.in_flight >= max(1, math.floor(self.limit)):
+            return self.SLOT_POLL_SECONDS
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+        if wait == 0:
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+        return wait
+
+    async def acquire(self, tokens: int, timeout: float):
+        """
+        Wait until the request fits the model's quotas and concurrency
+
+        Raises:
+            AdmissionTimeoutError: if not admitted within `timeout` seconds
+        """
+        start = self.last_used = time.monotonic()
+        deadline = start + timeout
+        ticket = object()
+        with self._mutex:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._mutex:
+                    if self._queue[0] is ticket:
+                        wait = self._try_admit(tokens)
+                        if wait == 0:
+                            self._queue.popleft()
+                            ticket = None
+                    else:
+                        wait = self.SLOT_POLL_SECONDS
+                if wait == 0:
+                    ADMISSION_WAIT_SECONDS.observe(
+                        time.monotonic() - start, model_id=MODEL_LABELS(self.model_id)
+                    )
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdmissionTimeoutError(
+                        f"Rate limit for {self.model_id} reached, try again later",
+                        retry_after=max(wait, self.SLOT_POLL_SECONDS)
+                    )
+                await asyncio.sleep(min(wait, remaining))
+        finally:
+            if ticket is not None:
+                # Timed out or cancelled while queued
+                with self._mutex:
+                    self._queue.remove(ticket)
+
+    def release(self, throttled: bool = False, unused_tokens: int = 0, unused_request: bool = False):
+        """
+        Finish an admitted request and adapt the concurrency limit
+
+        Args:
+            throttled: Bedrock throttled the request (multiplicative decrease)
+            unused_tokens: Reserved tokens that were not consumed
+            unused_request: The request never reached Bedrock (e.g. cache hit)
+        """
+        with self._mutex:
+            self.in_flight -= 1
+            if unused_tokens > 0:
+                self.tokens.refund(unused_tokens)
+            if unused_request:
+                self.requests.refund(1)
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                # +1 slot per `limit` successful requests
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+
+class RateLimiter:
+    """
+    Per-model admission control built from Settings
+
+    Model IDs come from requests, so at most MAX_MODELS admissions are
+    kept; past that the least recently used idle one is dropped (a model
+    seen again starts over from its configured quotas).
+    """
+
+    MAX_MODELS = 256
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.queue_timeout = settings.bedrock_queue_timeout_seconds
+        self._models: Dict[str, ModelAdmission] = {}
+        self._lock = threading.Lock()
+        REGISTRY.gauge_callback(
+            "bedrock_concurrency_limit",
+            "Current AIMD concurrency limit per model",
+            lambda: self._per_label("limit"),
+            ("model_id",)
+        )
+        REGISTRY.gauge_callback(
+            "bedrock_in_flight",
+            "Admitted Bedrock requests in flight per model",
+            lambda: self._per_label("in_flight"),
+            ("model_id",)
+        )
+
+    def _per_label(self, attribute: str) -> Dict[tuple, float]:
+        """Gauge values per model label (models reported as "other" are summed)"""
+        values: Dict[tuple, float] = {}
+        for admission in list(self._models.values()):
+            key = (MODEL_LABELS(admission.model_id),)
+            values[key] = values.get(key, 0) + getattr(admission, attribute)
+        return values
+
+    def for_model(self, model_id: str) -> ModelAdmission:
+        admission = self._models.get(model_id)
+        if admission is not None:
+            return admission
+        with self._lock:
+            admission = self._models.get(model_id)
+            if admission is not None:
+                return admission
+            if len(self._models) >= self.MAX_MODELS:
+                self._evict_idle()
+            quota = self.settings.bedrock_model_quotas.get(model_id, {})
+            headroom = self.settings.bedrock_quota_headroom
+            admission = self._models[model_id] = ModelAdmission(
+                model_id,
+                rpm=quota.get("rpm", self.settings.bedrock_default_rpm) * headroom,
+                tpm=quota.get("tpm", self.settings.bedrock_default_tpm) * headroom,
+                initial_concurrency=self.settings.bedrock_initial_concurrency,
+                max_concurrency=self.settings.bedrock_max_concurrency
+            )
+        return admission
+
+    def _evict_idle(self):
+        """Drop the least recently used admission with nothing in flight"""
+        idle = [admission for admission in self._models.values() if admission.idle]
+        if idle:
+            del self._models[min(idle, key=lambda admission: admission.last_used).model_id]
+
+    async def acquire(self, model_id: str, tokens: int, timeout: Optional[float] = None) -> ModelAdmission:
+        """Admit a request for `model_id` reserving `tokens` tokens/min"""
+        admission = self.for_model(model_id)
+        await admission.acquire(tokens, self.queue_timeout if timeout is None else timeout)
+        return admission
+
+
+def estimate_request_tokens(prompt: str, max_tokens: int, model_id: str = "") -> int:
+    """Tokens to reserve: the local input estimate plus the output budget"""
+    return count_tokens(model_id, prompt) + 1 + max_tokens
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .cache import TTLCache, SQLiteCacheTier, S3CacheTier
+from .config import Settings
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = REGISTRY.counter(
+    "response_cache_lookups_total", "Response cache lookups by result", ("result",)
+)
+PERSISTENT_ERRORS = REGISTRY.counter(
+    "response_cache_persistent_errors_total",
+    "Failed reads and writes of the persistent response cache tier",
+    ("operation",)
+)
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for Bedrock responses
+
+    Entries are keyed on a hash of the model ID and the exact request body
+    sent to Bedrock. Lookups go to the in-memory LRU first and fall back to
+    the optional persistent tier, promoting hits into memory.
+    """
+
+    def __init__(self, memory: TTLCache, persistent=None, deterministic_only: bool = True):
+        """
+        Args:
+            memory: In-memory LRU tier
+            persistent: Optional SQLiteCacheTier or S3CacheTier
+            deterministic_only: Only cache requests sent with temperature 0
+        """
+        self.memory = memory
+        self.persistent = persistent
+        self.deterministic_only = deterministic_only
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_id: str, body: Dict[str, Any]) -> str:
+        """Hash a normalized request body into a cache key"""
+        normalized = json.dumps(
+            {"model_id": model_id, "body": body},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """Sampled (temperature > 0) responses are not reused by default"""
+        return not self.deterministic_only or temperature == 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        result = "hit"
+        if value is None and self.persistent is not None:
+            try:
+                entry = self.persistent.get_entry(key)
+            except Exception:
+                # A broken persistent tier degrades to a miss
+                PERSISTENT_ERRORS.inc(operation="get")
+                logger.warning("Reading the persistent response cache failed", exc_info=True)
+                entry = None
+            if entry is not None:
+                value, expires_at = entry
+                # Promoted with what is left of its TTL, not a fresh one
+                self.memory.set(key, value, ttl_seconds=expires_at - time.time())
+                result = "persistent_hit"
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                result = "miss"
+            else:
+                self.hits += 1
+                self.persistent_hits += result == "persistent_hit"
+        LOOKUPS.inc(result=result)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value)
+            except Exception:
+                # The response is still served and cached in memory
+                PERSISTENT_ERRORS.inc(operation="set")
+                logger.warning("Writing the persistent response cache failed", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent_hits": self.persistent_hits,
+            "entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "persistent_backend": self.persistent.__class__.__name__ if self.persistent else None
+        }
+
+
+def build_response_cache(settings: Settings, s3_client=None) -> Optional[ResponseCache]:
+    """
+    Build the response cache described by the settings
+
+    Args:
+        settings: Application settings
+        s3_client: S3Client used when the persistent backend is "s3"
+
+    Returns:
+        ResponseCache, or None if caching is disabled
+    """
+    if not settings.response_cache_enabled:
+        return None
+
+    ttl = settings.response_cache_ttl_seconds
+    memory = TTLCache(settings.response_cache_max_entries, ttl)
+
+    backend = settings.response_cache_backend.lower()
+    if backend == "sqlite":
+        persistent = SQLiteCacheTier(settings.response_cache_sqlite_path, ttl)
+    elif backend == "s3":
+        persistent = S3CacheTier(s3_client, settings.response_cache_s3_prefix, ttl)
+    elif backend:
+        raise ValueError(f"Unknown response cache backend: {backend}")
+    else:
+        persistent = None
+
+    return ResponseCache(
+        memory,
+        persistent,
+        deterministic_only=settings.response_cache_deterministic_only
+    )
@@ -1,24 +1,153 @@
-import boto3
-from typing import BinaryIO
-from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, Optional, List, Dict
+from datetime import datetime, timezone
+import base64
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from botocore.exceptions import ClientError
+from .aws import create_client
+from .cache import TTLCache
+from .config import get_settings
+
+# S3 rejects multipart parts smaller than this (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Hex digits of the SHA-256 that prefix content-addressed keys
+CONTENT_HASH_LENGTH = 16
+
+# Subfolder of the upload folder where direct uploads wait for their hash check
+STAGING_FOLDER = ".staging"
+
+
+def sha256_fileobj(fileobj: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """Hex SHA-256 of a seekable file-like object, read from the start; rewinds it"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class ChunkReader:
+    """Binary file-like object over an iterable of byte strings, for upload_stream"""
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+    
+    def read(self, size: int = -1) -> bytes:
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            length += len(chunk)
+        data = b"".join(parts)
+        if size < 0:
+            self._buffer = b""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
 
 
 class S3Client:
     """AWS S3 client wrapper"""
     
     def __init__(self):
-        # Hardcoded configuration for simplicity
         # In Lambda, boto3 automatically uses the execution role
-        self.client = boto3.client("s3", region_name="us-east-1")
-        self.bucket_name = "sant-sumun-dev"
-        self.upload_folder = "test/data"
+        self.client = create_client("s3")
+        
+        settings = get_settings()
+        self.bucket_name = settings.s3_bucket_name
+        self.upload_folder = settings.s3_upload_folder.strip("/")
+        self.part_size = max(settings.s3_multipart_part_size_mb * 1024 * 1024, MIN_PART_SIZE)
+        self.upload_concurrency = settings.s3_upload_concurrency
+        
+        # Short-lived cache of listing pages, cleared on every upload
+        self._list_cache = TTLCache(256, settings.s3_list_cache_ttl_seconds)
+        self.list_max_pages = max(1, settings.s3_list_max_pages)
+    
+    def _new_key(self, filename: str, s3_key: Optional[str] = None) -> tuple:
+        """Generate a unique object key (and its timestamp) for an upload"""
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        # The random part keeps same-second uploads of one name apart
+        return s3_key or f"{self.upload_folder}/{timestamp}_{uuid.uuid4().hex[:8]}_{filename}", timestamp
+    
+    def content_hash(self, fileobj: BinaryIO) -> str:
+        """Hex SHA-256 of a seekable upload (rewound afterwards)"""
+        return sha256_fileobj(fileobj)
+    
+    def content_key(self, sha256: str, filename: str) -> str:
+        """Content-addressed key of a file in the upload folder"""
+        return f"{self.upload_folder}/{sha256[:CONTENT_HASH_LENGTH].lower()}_{filename}"
+    
+    def staging_key(self, sha256: str, filename: str) -> str:
+        """Key a direct upload declaring `sha256` is written to until its content is verified"""
+        return f"{self.upload_folder}/{STAGING_FOLDER}/{sha256.lower()}_{filename}"
+    
+    def is_staging_key(self, s3_key: str) -> bool:
+        return s3_key.startswith(f"{self.upload_folder}/{STAGING_FOLDER}/")
+    
+    def promoted_key(self, staging_key: str) -> str:
+        """Content-addressed key a staged upload moves to once its declared SHA-256 is verified"""
+        declared, _, filename = staging_key.split("/")[-1].partition("_")
+        return self.content_key(declared, filename)
+    
+    def find_by_hash(self, sha256: str) -> Optional[dict]:
+        """
+        Find an uploaded file by the SHA-256 of its content
+        
+        Keys only carry a prefix of the hash, so every candidate's full
+        SHA-256 is compared with the one in its metadata.
+        
+        Args:
+            sha256: Hex SHA-256 of the file
+            
+        Returns:
+            Dict with upload information (bucket, key, url), or None if no
+            file with that content was uploaded
+        """
+        sha256 = sha256.lower()
+        prefix = f"{self.upload_folder}/{sha256[:CONTENT_HASH_LENGTH]}_"
+        try:
+            response = self.client.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix, MaxKeys=20)
+        except ClientError as e:
+            raise Exception(f"Error looking up file by hash: {str(e)}")
+        for obj in response.get("Contents", []):
+            # Skip the sidecars written next to the CSV
+            if not obj["Key"].lower().endswith(".csv"):
+                continue
+            head = self.head_object(obj["Key"])
+            if head is not None and head["metadata"].get("sha256") == sha256:
+                return self._upload_info(
+                    obj["Key"],
+                    obj["Key"][len(prefix):],
+                    obj["LastModified"].strftime("%Y%m%d_%H%M%S")
+                )
+        return None
+    
+    def _upload_info(self, s3_key: str, filename: str, timestamp: str) -> dict:
+        """Build the dict returned by the upload methods"""
+        # Note: this is a simple URL, for signed URLs use generate_presigned_url
+        url = f"{self.client.meta.endpoint_url}/{self.bucket_name}/{s3_key}"
+        return {
+            "bucket": self.bucket_name,
+            "key": s3_key,
+            "url": url,
+            "filename": filename,
+            "uploaded_at": timestamp
+        }
     
     def upload_file(
         self,
         file_content: bytes,
         filename: str,
-        content_type: str = "text/csv"
+        content_type: str = "text/csv",
+        s3_key: Optional[str] = None,
+        sha256: Optional[str] = None
     ) -> dict:
         """
         Upload a file to S3
@@ -27,6 +156,9 @@ class S3Client:
             file_content: File content as bytes
             filename: Original filename
             content_type: MIME type of the file
+            s3_key: Exact object key (default: a new key in the upload folder)
+            sha256: Hex SHA-256 of the content; S3 rejects the upload if the
+                bytes it receives don't match
             
         Returns:
             Dict with upload information (bucket, key, url)
@@ -36,31 +168,23 @@ class S3Client:
         
         try:
             # Generate unique filename with timestamp
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            s3_key = f"{self.upload_folder}/{timestamp}_{filename}"
+            s3_key, timestamp = self._new_key(filename, s3_key)
             
             # Upload to S3
+            params = {}
+            if sha256:
+                params["ChecksumSHA256"] = base64.b64encode(bytes.fromhex(sha256)).decode("ascii")
             self.client.put_object(
                 Bucket=self.bucket_name,
                 Key=s3_key,
                 Body=file_content,
                 ContentType=content_type,
-                Metadata={
-                    "original_filename": filename,
-                    "upload_timestamp": timestamp
-                }
+                Metadata=self._metadata(filename, timestamp, sha256),
+                **params
             )
             
-            # Generate URL (note: this is a simple URL, for signed URLs use generate_presigned_url)
-            url = f"https://{self.bucket_name}.s3.us-east-1.amazonaws.com/{s3_key}"
-            
-            return {
-                "bucket": self.bucket_name,
-                "key": s3_key,
-                "url": url,
-                "filename": filename,
-                "uploaded_at": timestamp
-            }
+            self._list_cache.clear()
+            return self._upload_info(s3_key, filename, timestamp)
             
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
@@ -69,23 +193,438 @@ class S3Client:
         except Exception as e:
             raise Exception(f"Error uploading file to S3: {str(e)}")
     
-    def generate_presigned_url(self, s3_key: str, expiration: int = 3600) -> str:
+    def upload_stream(
+        self,
+        fileobj: BinaryIO,
+        filename: str,
+        content_type: str = "text/csv",
+        s3_key: Optional[str] = None,
+        sha256: Optional[str] = None
+    ) -> dict:
+        """
+        Upload a file-like object to S3 in chunks
+        
+        Files smaller than one part go up in a single put_object. Larger
+        ones use a multipart upload with up to `upload_concurrency` parts in
+        flight, so memory stays at about part_size * upload_concurrency
+        regardless of file size. A failed multipart upload is aborted so no
+        orphaned parts are left behind.
+        
+        Args:
+            fileobj: Binary file-like object positioned at the start
+            filename: Original filename
+            content_type: MIME type of the file
+            s3_key: Exact object key (default: a new key in the upload folder)
+            sha256: Hex SHA-256 of the content, recorded in the metadata
+                (and checked by S3 for single-part uploads)
+            
+        Returns:
+            Dict with upload information (bucket, key, url)
+        """
+        if not self.bucket_name:
+            raise ValueError("S3 bucket name not configured")
+        
+        first_part = fileobj.read(self.part_size)
+        if len(first_part) < self.part_size:
+            return self.upload_file(first_part, filename, content_type, s3_key, sha256)
+        
+        s3_key, timestamp = self._new_key(filename, s3_key)
+        upload_id = None
+        try:
+            upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                ContentType=content_type,
+                Metadata=self._metadata(filename, timestamp, sha256)
+            )["UploadId"]
+            
+            parts = []
+            with ThreadPoolExecutor(max_workers=self.upload_concurrency) as pool:
+                pending = set()
+                part_number = 1
+                data = first_part
+                while data:
+                    # Bound memory: wait for a slot before reading the next part
+                    if len(pending) >= self.upload_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        parts.extend(future.result() for future in done)
+                    pending.add(pool.submit(
+                        self._upload_part, s3_key, upload_id, part_number, data
+                    ))
+                    part_number += 1
+                    data = fileobj.read(self.part_size)
+                parts.extend(future.result() for future in pending)
+            
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda p: p["PartNumber"])}
+            )
+            
+            self._list_cache.clear()
+            return self._upload_info(s3_key, filename, timestamp)
+            
+        except Exception as e:
+            if upload_id:
+                self.abort_multipart_upload(s3_key, upload_id)
+            if isinstance(e, ClientError):
+                error_code = e.response["Error"]["Code"]
+                error_message = e.response["Error"]["Message"]
+                raise Exception(f"S3 upload error ({error_code}): {error_message}")
+            raise Exception(f"Error uploading file to S3: {str(e)}")
+    
+    @staticmethod
+    def _metadata(filename: str, timestamp: str, sha256: Optional[str] = None) -> dict:
+        metadata = {
+            "original_filename": filename,
+            "upload_timestamp": timestamp
+        }
+        if sha256:
+            metadata["sha256"] = sha256.lower()
+        return metadata
+    
+    def _upload_part(self, s3_key: str, upload_id: str, part_number: int, data: bytes) -> dict:
+        """Upload one part of a multipart upload"""
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+    
+    def create_multipart_upload(
+        self,
+        filename: str,
+        part_count: int,
+        content_type: str = "text/csv",
+        expiration: int = 3600,
+        sha256: Optional[str] = None
+    ) -> dict:
+        """
+        Start a multipart upload that the client sends directly to S3
+        
+        The browser PUTs each part to its presigned URL and then calls
+        complete_multipart_upload with the returned ETags (the bucket's
+        CORS configuration must expose the ETag header).
+        
+        With the file's SHA-256 the upload goes to a staging key derived
+        from it, and only moves to its content-addressed key once
+        verify_staged_upload (or the ingest job) has checked the bytes
+        against the hash. If an upload of the same content was interrupted,
+        it is resumed instead, and only the parts S3 doesn't have yet get
+        URLs.
+        
+        Args:
+            filename: Original filename
+            part_count: Number of parts the client will send
+            content_type: MIME type of the file
+            expiration: Lifetime of the part URLs in seconds
+            sha256: Optional hex SHA-256 of the file
+            
+        Returns:
+            Dict with key, upload_id, part_size, the presigned URLs of the
+            missing parts and the parts already uploaded
+        """
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        s3_key = self.staging_key(sha256, filename) if sha256 else self._new_key(filename)[0]
+        
+        upload_id = self._find_multipart_upload(s3_key) if sha256 else None
+        if upload_id:
+            return self.resume_multipart_upload(s3_key, upload_id, part_count, expiration)
+        
+        try:
+            upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                ContentType=content_type,
+                Metadata=self._metadata(filename, timestamp, sha256)
+            )["UploadId"]
+        except ClientError as e:
+            raise Exception(f"Error starting multipart upload: {str(e)}")
+        
+        return {
+            "key": s3_key,
+            "upload_id": upload_id,
+            "part_size": self.part_size,
+            "urls": self._part_urls(s3_key, upload_id, range(1, part_count + 1), expiration),
+            "uploaded_parts": []
+        }
+    
+    def resume_multipart_upload(
+        self,
+        s3_key: str,
+        upload_id: str,
+        part_count: int,
+        expiration: int = 3600
+    ) -> dict:
+        """
+        Continue an interrupted client-side multipart upload
+        
+        Args:
+            s3_key: S3 object key of the upload
+            upload_id: Upload ID returned by create_multipart_upload
+            part_count: Number of parts of the whole file
+            expiration: Lifetime of the part URLs in seconds
+            
+        Returns:
+            Same dict as create_multipart_upload: fresh URLs for the parts
+            S3 doesn't have, and the parts it has (send those ETags to
+            complete_multipart_upload as they are)
+        """
+        uploaded = self.list_uploaded_parts(s3_key, upload_id)
+        done = {part["part_number"] for part in uploaded}
+        missing = [n for n in range(1, part_count + 1) if n not in done]
+        return {
+            "key": s3_key,
+            "upload_id": upload_id,
+            "part_size": self.part_size,
+            "urls": self._part_urls(s3_key, upload_id, missing, expiration),
+            "uploaded_parts": uploaded
+        }
+    
+    def list_uploaded_parts(self, s3_key: str, upload_id: str) -> List[Dict]:
+        """
+        List the parts S3 has committed for a multipart upload
+        
+        Returns:
+            List of {"part_number", "etag", "size"} dicts
+        """
+        parts = []
+        try:
+            paginator = self.client.get_paginator("list_parts")
+            for page in paginator.paginate(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id):
+                for part in page.get("Parts", []):
+                    parts.append({
+                        "part_number": part["PartNumber"],
+                        "etag": part["ETag"],
+                        "size": part["Size"]
+                    })
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchUpload":
+                raise ValueError("Upload not found (completed or aborted)")
+            raise Exception(f"Error listing uploaded parts: {str(e)}")
+        return parts
+    
+    def _find_multipart_upload(self, s3_key: str) -> Optional[str]:
+        """Upload ID of the latest unfinished multipart upload of a key"""
+        try:
+            response = self.client.list_multipart_uploads(Bucket=self.bucket_name, Prefix=s3_key)
+        except ClientError as e:
+            raise Exception(f"Error listing multipart uploads: {str(e)}")
+        uploads = [u for u in response.get("Uploads", []) if u["Key"] == s3_key]
+        if not uploads:
+            return None
+        return max(uploads, key=lambda u: u["Initiated"])["UploadId"]
+    
+    def _part_urls(self, s3_key: str, upload_id: str, part_numbers: Iterable[int], expiration: int) -> List[Dict]:
+        return [
+            {
+                "part_number": part_number,
+                "url": self.generate_presigned_url(
+                    s3_key,
+                    expiration,
+                    client_method="upload_part",
+                    params={"UploadId": upload_id, "PartNumber": part_number}
+                )
+            }
+            for part_number in part_numbers
+        ]
+    
+    def complete_multipart_upload(self, s3_key: str, upload_id: str, parts: List[Dict]) -> dict:
+        """
+        Complete a client-side multipart upload
+        
+        Args:
+            s3_key: S3 object key returned by create_multipart_upload
+            upload_id: Upload ID returned by create_multipart_upload
+            parts: List of {"part_number", "etag"} dicts
+            
+        Returns:
+            Dict with upload information (bucket, key, url); for a staged
+            upload the key and URL are those of the content-addressed key
+            it moves to once verified, and "staging_key" is where it is now
+        """
+        try:
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(
+                    ({"PartNumber": p["part_number"], "ETag": p["etag"]} for p in parts),
+                    key=lambda p: p["PartNumber"]
+                )}
+            )
+            head = self.client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            raise Exception(f"Error completing multipart upload: {str(e)}")
+        
+        self._list_cache.clear()
+        metadata = head.get("Metadata", {})
+        if not self.is_staging_key(s3_key):
+            return self._upload_info(
+                s3_key,
+                metadata.get("original_filename", s3_key.split("/")[-1]),
+                metadata.get("upload_timestamp", "")
+            )
+        return {
+            **self._upload_info(
+                self.promoted_key(s3_key),
+                metadata.get("original_filename", s3_key.split("/")[-1].partition("_")[2]),
+                metadata.get("upload_timestamp", "")
+            ),
+            "staging_key": s3_key
+        }
+    
+    def verify_staged_upload(self, staging_key: str) -> dict:
+        """
+        Hash a staged upload and move it to its content-addressed key
+        
+        Args:
+            staging_key: Key returned for an upload that declared a SHA-256
+            
+        Returns:
+            Dict with upload information (bucket, key, url) of the
+            content-addressed copy
+            
+        Raises:
+            ValueError: The content doesn't match the declared SHA-256 (the
+                staged object is deleted)
+        """
+        digest = hashlib.sha256()
+        body = self.open_object_stream(staging_key)
+        for chunk in iter(lambda: body.read(1024 * 1024), b""):
+            digest.update(chunk)
+        return self.promote_staged_upload(staging_key, digest.hexdigest())
+    
+    def promote_staged_upload(self, staging_key: str, sha256: str) -> dict:
+        """
+        Move a staged upload whose content was hashed to its content-addressed key
+        
+        Args:
+            staging_key: Key returned for an upload that declared a SHA-256
+            sha256: Hex SHA-256 computed from the staged bytes
+            
+        Returns:
+            Dict with upload information (bucket, key, url) of the
+            content-addressed copy
+            
+        Raises:
+            ValueError: The content doesn't match the declared SHA-256 (the
+                staged object is deleted)
+        """
+        head = self.head_object(staging_key)
+        if head is None:
+            raise ValueError(f"Staged upload not found: {staging_key}")
+        declared, _, filename = staging_key.split("/")[-1].partition("_")
+        sha256 = sha256.lower()
+        if sha256 != declared:
+            self.delete_keys([staging_key])
+            raise ValueError("Content doesn't match the SHA-256 declared for the upload; it was discarded")
+        
+        s3_key = self.promoted_key(staging_key)
+        timestamp = head["metadata"].get("upload_timestamp") or datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        existing = self.head_object(s3_key)
+        if existing is None or existing["metadata"].get("sha256") != sha256:
+            try:
+                # Managed copy: switches to a multipart copy past 5 GB
+                self.client.copy(
+                    {"Bucket": self.bucket_name, "Key": staging_key},
+                    self.bucket_name,
+                    s3_key,
+                    ExtraArgs={
+                        "ContentType": "text/csv",
+                        "Metadata": self._metadata(filename, timestamp, sha256),
+                        "MetadataDirective": "REPLACE"
+                    }
+                )
+            except ClientError as e:
+                raise Exception(f"Error moving verified upload: {str(e)}")
+        self.delete_keys([staging_key])
+        
+        self._list_cache.clear()
+        return self._upload_info(s3_key, filename, timestamp)
+    
+    def abort_multipart_upload(self, s3_key: str, upload_id: str):
+        """Abort a multipart upload and discard its parts (best effort)"""
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id
+            )
+        except ClientError:
+            pass
+    
+    def generate_presigned_post(
+        self,
+        filename: str,
+        content_type: str = "text/csv",
+        max_size: int = 5 * 1024 ** 3,
+        expiration: int = 3600,
+        sha256: Optional[str] = None
+    ) -> dict:
+        """
+        Generate a presigned POST so the browser uploads straight to S3
+        
+        Args:
+            filename: Original filename
+            content_type: MIME type the client must send
+            max_size: Largest accepted file in bytes (5 GB for a single POST)
+            expiration: Lifetime of the form in seconds
+            sha256: Optional hex SHA-256 of the file; the upload goes to its
+                staging key until verify_staged_upload checks it
+            
+        Returns:
+            Dict with key, url and the form fields to send with the file
+        """
+        s3_key, timestamp = self._new_key(filename, self.staging_key(sha256, filename) if sha256 else None)
+        fields = {
+            "Content-Type": content_type,
+            **{f"x-amz-meta-{k}": v for k, v in self._metadata(filename, timestamp, sha256).items()}
+        }
+        conditions = [{k: v} for k, v in fields.items()]
+        conditions.append(["content-length-range", 1, max_size])
+        try:
+            post = self.client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Fields=fields,
+                Conditions=conditions,
+                ExpiresIn=expiration
+            )
+        except ClientError as e:
+            raise Exception(f"Error generating presigned POST: {str(e)}")
+        return {"key": s3_key, "url": post["url"], "fields": post["fields"]}
+    
+    def generate_presigned_url(
+        self,
+        s3_key: str,
+        expiration: int = 3600,
+        client_method: str = "get_object",
+        params: Optional[dict] = None
+    ) -> str:
         """
         Generate a presigned URL for temporary access to a file
         
         Args:
             s3_key: S3 object key
             expiration: URL expiration time in seconds (default: 1 hour)
+            client_method: S3 operation to presign (e.g. "upload_part")
+            params: Extra operation parameters besides Bucket and Key
             
         Returns:
             Presigned URL string
         """
         try:
             url = self.client.generate_presigned_url(
-                "get_object",
+                client_method,
                 Params={
                     "Bucket": self.bucket_name,
-                    "Key": s3_key
+                    "Key": s3_key,
+                    **(params or {})
                 },
                 ExpiresIn=expiration
             )
@@ -93,38 +632,304 @@ class S3Client:
         except ClientError as e:
             raise Exception(f"Error generating presigned URL: {str(e)}")
     
-    def list_files(self, prefix: str = None) -> list:
+    def get_object_bytes(self, s3_key: str) -> Optional[bytes]:
+        """
+        Read a whole object from the bucket
+        
+        Args:
+            s3_key: S3 object key
+            
+        Returns:
+            Object content, or None if the key does not exist
+        """
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            return response["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise Exception(f"Error reading S3 object: {str(e)}")
+    
+    def head_object(self, s3_key: str) -> Optional[dict]:
+        """
+        Read an object's size and ETag without its content
+        
+        Args:
+            s3_key: S3 object key
+            
+        Returns:
+            Dict with size, etag, last_modified and the user metadata, or
+            None if the key does not exist
+        """
+        try:
+            response = self.client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404", "NotFound"):
+                return None
+            raise Exception(f"Error reading S3 object metadata: {str(e)}")
+        return {
+            "size": response["ContentLength"],
+            "etag": response["ETag"].strip('"'),
+            "last_modified": response["LastModified"].isoformat(),
+            "metadata": response.get("Metadata", {})
+        }
+    
+    def read_range(self, s3_key: str, start: int, end: int) -> bytes:
+        """
+        Read a byte range of an object with a ranged GET
+        
+        Args:
+            s3_key: S3 object key
+            start: First byte offset
+            end: Last byte offset (inclusive)
+            
+        Returns:
+            The bytes in the range
+        """
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Range=f"bytes={start}-{end}"
+            )
+            return response["Body"].read()
+        except ClientError as e:
+            raise Exception(f"Error reading S3 object range: {str(e)}")
+    
+    def open_object_stream(self, s3_key: str):
+        """
+        Open an object for streaming reads
+        
+        Args:
+            s3_key: S3 object key
+            
+        Returns:
+            File-like StreamingBody; the data is fetched as it is read
+        """
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            return response["Body"]
+        except ClientError as e:
+            raise Exception(f"Error reading S3 object: {str(e)}")
+    
+    def put_object_bytes(
+        self,
+        s3_key: str,
+        data: bytes,
+        content_type: str = "application/octet-stream"
+    ):
+        """
+        Write a small object to the bucket under an exact key
+        
+        Args:
+            s3_key: S3 object key
+            data: Object content
+            content_type: MIME type of the object
+        """
+        try:
+            self.client.put_object(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Body=data,
+                ContentType=content_type
+            )
+        except ClientError as e:
+            raise Exception(f"Error writing S3 object: {str(e)}")
+    
+    def get_object_with_etag(self, s3_key: str) -> Optional[tuple]:
+        """
+        Read a whole object and the ETag of the version read
+        
+        Args:
+            s3_key: S3 object key
+            
+        Returns:
+            (content, etag), or None if the key does not exist
+        """
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            return response["Body"].read(), response["ETag"].strip('"')
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise Exception(f"Error reading S3 object: {str(e)}")
+    
+    def put_object_if_match(
+        self,
+        s3_key: str,
+        data: bytes,
+        etag: str,
+        content_type: str = "application/octet-stream"
+    ) -> bool:
+        """
+        Overwrite an object only if it is still the version read
+        
+        Args:
+            s3_key: S3 object key
+            data: Object content
+            etag: ETag from get_object_with_etag
+            content_type: MIME type of the object
+            
+        Returns:
+            False if the object changed (or was deleted) since
+        """
+        try:
+            self.client.put_object(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Body=data,
+                ContentType=content_type,
+                IfMatch=f'"{etag}"'
+            )
+            return True
+        except ClientError as e:
+            # 409: a concurrent conditional write to the same key won
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict", "NoSuchKey"):
+                return False
+            raise Exception(f"Error writing S3 object: {str(e)}")
+    
+    def delete_keys(self, s3_keys: List[str]):
         """
-        List files in the S3 bucket
+        Delete objects from the bucket
+        
+        Args:
+            s3_keys: S3 object keys (missing keys are ignored)
+        """
+        try:
+            # DeleteObjects takes at most 1000 keys per call
+            for start in range(0, len(s3_keys), 1000):
+                batch = s3_keys[start:start + 1000]
+                self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+        except ClientError as e:
+            raise Exception(f"Error deleting S3 objects: {str(e)}")
+    
+    def list_keys(self, prefix: str, start_after: Optional[str] = None) -> Iterator[str]:
+        """
+        Iterate over every key under a prefix, uncached
+        
+        Args:
+            prefix: Key prefix
+            start_after: Only keys sorting after this one
+        """
+        try:
+            paginator = self.client.get_paginator("list_objects_v2")
+            params = {"Bucket": self.bucket_name, "Prefix": prefix}
+            if start_after:
+                params["StartAfter"] = start_after
+            for page in paginator.paginate(**params):
+                for obj in page.get("Contents", []):
+                    yield obj["Key"]
+        except ClientError as e:
+            raise Exception(f"Error listing S3 keys: {str(e)}")
+    
+    def list_files(
+        self,
+        prefix: str = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        name_contains: Optional[str] = None,
+        modified_after: Optional[datetime] = None,
+        modified_before: Optional[datetime] = None
+    ) -> dict:
+        """
+        List one page of CSV files in the S3 bucket
+        
+        Pages are read with StartAfter, so each call costs the same no matter
+        how deep into the prefix it starts. Results are cached for a few
+        seconds and the cache is dropped whenever this client uploads a file.
+        Other objects in the folder (the columnar copies and indexes written
+        next to each CSV, staged uploads waiting for their hash check) are
+        skipped.
+        
+        Filters are applied to the listed keys, so a page reads at most
+        `list_max_pages` LIST responses. When sparse matches run out of that
+        budget the page is returned short (possibly empty) with a
+        next_cursor to continue from, keeping latency flat in large folders.
         
         Args:
             prefix: Optional prefix to filter files
+            cursor: next_cursor from the previous page
+            limit: Max files to return
+            name_contains: Case-insensitive filename substring
+            modified_after: Only files modified at or after this time (UTC)
+            modified_before: Only files modified before this time (UTC)
             
         Returns:
-            List of file information dicts
+            Dict with "files" (list of file information dicts) and
+            "next_cursor" (None on the last page)
         """
+        cache_key = repr((prefix, cursor, limit, name_contains, modified_after, modified_before))
+        cached = self._list_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             list_params = {"Bucket": self.bucket_name}
             if prefix:
                 list_params["Prefix"] = prefix
             else:
                 list_params["Prefix"] = self.upload_folder
+            if cursor:
+                list_params["StartAfter"] = cursor
             
-            response = self.client.list_objects_v2(**list_params)
-            
-            if "Contents" not in response:
-                return []
+            needle = name_contains.lower() if name_contains else None
+            after = _as_utc(modified_after)
+            before = _as_utc(modified_before)
+            if not (needle or after or before):
+                # Unfiltered pages need about `limit` CSVs, each followed by
+                # at most two sidecar objects; don't fetch and parse 1000 keys
+                list_params["MaxKeys"] = min(1000, limit * 3)
             
             files = []
-            for obj in response["Contents"]:
-                files.append({
-                    "key": obj["Key"],
-                    "size": obj["Size"],
-                    "last_modified": obj["LastModified"].isoformat(),
-                    "filename": obj["Key"].split("/")[-1]
-                })
+            next_cursor = None
+            pages = 0
+            while True:
+                response = self.client.list_objects_v2(**list_params)
+                pages += 1
+                contents = response.get("Contents", [])
+                for index, obj in enumerate(contents):
+                    filename = obj["Key"].split("/")[-1]
+                    if not filename.lower().endswith(".csv") or self.is_staging_key(obj["Key"]):
+                        continue
+                    if needle and needle not in filename.lower():
+                        continue
+                    if after and obj["LastModified"] < after:
+                        continue
+                    if before and obj["LastModified"] >= before:
+                        continue
+                    files.append({
+                        "key": obj["Key"],
+                        "size": obj["Size"],
+                        "last_modified": obj["LastModified"].isoformat(),
+                        "filename": filename,
+                        "etag": obj["ETag"].strip('"')
+                    })
+                    if len(files) == limit:
+                        more = index < len(contents) - 1 or response.get("IsTruncated")
+                        next_cursor = obj["Key"] if more else None
+                        break
+                if len(files) == limit or not response.get("IsTruncated"):
+                    break
+                if pages >= self.list_max_pages and contents:
+                    # Out of budget: resume after the last key scanned
+                    next_cursor = contents[-1]["Key"]
+                    break
+                list_params.pop("StartAfter", None)
+                list_params["ContinuationToken"] = response["NextContinuationToken"]
             
-            return files
+            result = {"files": files, "next_cursor": next_cursor}
+            self._list_cache.set(cache_key, result)
+            return result
             
         except ClientError as e:
             raise Exception(f"Error listing S3 files: {str(e)}")
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Treat naive datetimes as UTC so they compare with S3 timestamps"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
@@ -0,0 +1,535 @@
+"""
+Semantic response cache
+
+The exact-match ResponseCache misses prompts that differ only in
+whitespace, casing or a few words. This cache embeds each prompt and
+answers a request with the response of the most similar earlier prompt
+sent to the same model with the same parameters and system prompt, when
+their cosine similarity reaches the model's threshold.
+
+- Embedders: TitanEmbedder (Bedrock Titan Text Embeddings), which also
+  matches rewordings, or HashingEmbedder (word and character n-grams
+  hashed into a fixed-size vector; local and free). N-gram overlap can't
+  tell prompts apart that differ in one meaningful word, so with the
+  hashing embedder a hit also needs the same text up to whitespace and
+  casing
+- VectorIndex: unit vectors in a preallocated NumPy matrix, searched with
+  one matrix product per batch of queries. It is bounded: when full,
+  expired rows and then the least recently used are overwritten
+- Snapshots: the index is written to a local file or S3 (one .npz) every
+  few inserts and loaded when the cache is built, so a cold start doesn't
+  begin empty
+
+Needs numpy.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .cache import TTLCache
+from .config import Settings
+from .metrics import REGISTRY
+from .providers import flatten_prompt
+
+try:
+    import numpy as np
+except ImportError:  # Optional: the semantic cache can't be enabled without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = REGISTRY.counter("semantic_cache_lookups_total", "Semantic cache lookups by result", ("result",))
+
+SNAPSHOT_VERSION = 2
+
+_WORDS = re.compile(r"\w+")
+
+
+def _unit(vectors):
+    """Scale rows to unit length (zero rows stay zero)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace, so prompts differing only in spacing are identical"""
+    return " ".join(text.split())
+
+
+class HashingEmbedder:
+    """
+    Local embedder: casefolded words, word bigrams and character trigrams
+    hashed into signed buckets of a fixed-size vector
+    """
+
+    # Templates that differ in one word ("great" / "terrible") score ~0.98,
+    # so only prompts with the same normalized text may match
+    exact_text = True
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.array(
+                [int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                 for feature, _ in features],
+                dtype=np.uint64
+            )
+            weights = np.array([weight for _, weight in features], dtype=np.float32)
+            signs = np.where(hashes >> np.uint64(63), 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes % np.uint64(self.dimensions)).astype(np.int64), signs * weights)
+        return _unit(vectors)
+
+    @staticmethod
+    def _features(text: str) -> List[Tuple[str, float]]:
+        words = _WORDS.findall(text.casefold())
+        features = [(f"w:{word}", 1.0) for word in words]
+        features += [(f"b:{first} {second}", 1.0) for first, second in zip(words, words[1:])]
+        for word in words:
+            padded = f" {word} "
+            features += [(f"c:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2)]
+        return features
+
+
+class TitanEmbedder:
+    """Embeddings from a Bedrock Titan Text Embeddings model"""
+
+    exact_text = False
+
+    def __init__(
+        self,
+        client_factory,
+        model_id: str = "amazon.titan-embed-text-v2:0",
+        dimensions: int = 512,
+        max_chars: int = 50000,
+        workers: int = 4
+    ):
+        """
+        Args:
+            client_factory: Callable returning a bedrock-runtime client
+            model_id: Titan embeddings model ID
+            dimensions: Output size (v2 models: 256, 512 or 1024)
+            max_chars: Longer texts are truncated (the model's input limit)
+            workers: Texts embedded in parallel (one InvokeModel call each)
+        """
+        self.client_factory = client_factory
+        self.model_id = model_id
+        self.dimensions = dimensions
+        self.max_chars = max_chars
+        self.workers = workers
+        self.name = f"{model_id}-{dimensions}"
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.client_factory()
+        return self._client
+
+    def embed(self, texts: List[str]):
+        if len(texts) == 1:
+            vectors = [self._embed_one(texts[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(texts))) as pool:
+                vectors = list(pool.map(self._embed_one, texts))
+        return _unit(np.array(vectors, dtype=np.float32))
+
+    def _embed_one(self, text: str) -> List[float]:
+        body = {"inputText": text[:self.max_chars]}
+        if "v2" in self.model_id:
+            body.update(dimensions=self.dimensions, normalize=True)
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps(body),
+            contentType="application/json",
+            accept="application/json"
+        )
+        return json.loads(response["body"].read())["embedding"]
+
+
+class VectorIndex:
+    """
+    Bounded in-memory index of unit vectors with a cached value each
+
+    Rows belong to a partition (model and parameters); a search only
+    matches rows of the query's partition that haven't expired.
+    """
+
+    def __init__(self, dimensions: int, capacity: int, ttl_seconds: float):
+        """
+        Args:
+            dimensions: Vector size
+            capacity: Max rows; when full, expired then least recently used rows are replaced
+            ttl_seconds: Time a row stays valid after being added
+        """
+        self.dimensions = dimensions
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.partitions = np.zeros(capacity, dtype=np.int64)
+        self.expires_at = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.values: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def search(self, queries, partitions: Sequence[int]) -> List[Optional[Tuple[float, Dict[str, Any]]]]:
+        """
+        Find the most similar live row for each query
+
+        Args:
+            queries: (n, dimensions) array of unit vectors
+            partitions: Partition of each query
+
+        Returns:
+            (cosine similarity, value) per query, or None where its partition has no rows
+        """
+        now = time.time()
+        with self._lock:
+            size = self.size
+            if not size:
+                return [None] * len(queries)
+            scores = np.asarray(queries, dtype=np.float32) @ self.vectors[:size].T
+            live = (self.partitions[:size][None, :] == np.asarray(partitions, dtype=np.int64)[:, None]) \
+                & (self.expires_at[:size] > now)[None, :]
+            scores = np.where(live, scores, -np.inf)
+            best = scores.argmax(axis=1)
+
+            results = []
+            for query, row in enumerate(best):
+                score = scores[query, row]
+                if not np.isfinite(score):
+                    results.append(None)
+                    continue
+                self.last_used[row] = now
+                results.append((float(score), self.values[row]))
+            return results
+
+    def add(self, vector, partition: int, value: Dict[str, Any]):
+        """Add a row, replacing an expired or the least recently used one when full"""
+        now = time.time()
+        with self._lock:
+            if self.size < self.capacity:
+                row = self.size
+                self.size += 1
+            else:
+                expired = np.flatnonzero(self.expires_at < now)
+                row = int(expired[0]) if len(expired) else int(self.last_used.argmin())
+            self._set_row(row, vector, partition, now + self.ttl_seconds, now, value)
+
+    def _set_row(self, row: int, vector, partition: int, expires_at: float, last_used: float, value):
+        self.vectors[row] = vector
+        self.partitions[row] = partition
+        self.expires_at[row] = expires_at
+        self.last_used[row] = last_used
+        self.values[row] = value
+
+    def to_bytes(self, meta: Dict[str, Any]) -> bytes:
+        """Serialize the live rows and `meta` as an .npz file"""
+        now = time.time()
+        with self._lock:
+            rows = np.flatnonzero(self.expires_at[:self.size] > now)
+            arrays = {
+                "vectors": self.vectors[rows].copy(),
+                "partitions": self.partitions[rows].copy(),
+                "expires_at": self.expires_at[rows].copy(),
+                "last_used": self.last_used[rows].copy()
+            }
+            values = [self.values[row] for row in rows]
+        document = json.dumps({**meta, "values": values}, ensure_ascii=False).encode("utf-8")
+        buffer = io.BytesIO()
+        np.savez(buffer, document=np.frombuffer(document, dtype=np.uint8), **arrays)
+        return buffer.getvalue()
+
+    def load_bytes(self, data: bytes, meta: Dict[str, Any]) -> int:
+        """
+        Replace the index with a snapshot written by to_bytes
+
+        Returns:
+            Rows loaded (0 if the snapshot's meta doesn't match `meta`)
+        """
+        with np.load(io.BytesIO(data), allow_pickle=False) as snapshot:
+            document = json.loads(snapshot["document"].tobytes())
+            if any(document.get(key) != value for key, value in meta.items()):
+                return 0
+            vectors = snapshot["vectors"]
+            if vectors.ndim != 2 or vectors.shape[1] != self.dimensions:
+                return 0
+            now = time.time()
+            # Most recently used first, so a smaller index keeps the hot rows
+            order = [row for row in np.argsort(-snapshot["last_used"]) if snapshot["expires_at"][row] > now]
+            order = order[:self.capacity]
+            with self._lock:
+                for row, source in enumerate(order):
+                    self._set_row(
+                        row,
+                        vectors[source],
+                        int(snapshot["partitions"][source]),
+                        float(snapshot["expires_at"][source]),
+                        float(snapshot["last_used"][source]),
+                        document["values"][source]
+                    )
+                self.size = len(order)
+        return len(order)
+
+
+class SemanticQuery:
+    """A request's partition and prompt text; its vector is computed on first lookup"""
+
+    def __init__(self, partition: int, text: str, threshold: float):
+        self.partition = partition
+        self.text = text
+        self.threshold = threshold
+        self.vector = None
+
+
+class SemanticCache:
+    """Near-duplicate prompt cache for Bedrock responses"""
+
+    def __init__(
+        self,
+        embedder,
+        index: VectorIndex,
+        threshold: float = 0.99,
+        model_thresholds: Optional[Dict[str, float]] = None,
+        deterministic_only: bool = True,
+        max_prompt_chars: int = 50000,
+        snapshot_path: str = "",
+        s3_client=None,
+        snapshot_s3_key: str = "",
+        snapshot_every: int = 50
+    ):
+        """
+        Args:
+            embedder: HashingEmbedder or TitanEmbedder
+            index: VectorIndex with the embedder's dimensions
+            threshold: Min cosine similarity for a hit
+            model_thresholds: Model ID prefix -> threshold (longest match wins)
+            deterministic_only: Only cache requests sent with temperature 0
+            max_prompt_chars: Longer prompts are not cached
+            snapshot_path: Local file the index is snapshotted to ("" = none)
+            s3_client: S3Client for snapshots in S3
+            snapshot_s3_key: S3 key the index is snapshotted to ("" = none)
+            snapshot_every: Inserts between snapshots
+        """
+        self.embedder = embedder
+        self.index = index
+        self.threshold = threshold
+        self._thresholds = sorted((model_thresholds or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.deterministic_only = deterministic_only
+        self.max_prompt_chars = max_prompt_chars
+        self.snapshot_path = snapshot_path
+        self.s3_client = s3_client
+        self.snapshot_s3_key = snapshot_s3_key
+        self.snapshot_every = snapshot_every
+        # Vectors of recent prompts, so repeats aren't embedded again
+        self._embeddings = TTLCache(1024, index.ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.restored = 0
+        self._inserts = 0
+        self._snapshotting = False
+        self._lock = threading.Lock()
+
+    def query(
+        self,
+        prompt: Optional[str],
+        model_id: str,
+        temperature: float,
+        max_tokens: int,
+        top_p: float,
+        system=None,
+        messages: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[SemanticQuery]:
+        """
+        Describe a request for lookup and insertion
+
+        Returns:
+            SemanticQuery, or None if the request should not be cached
+        """
+        if self.deterministic_only and temperature != 0:
+            return None
+        text = normalize_text(flatten_prompt(prompt, None, messages))
+        if not text or len(text) > self.max_prompt_chars:
+            return None
+        # Similar prompts only match under the same model, parameters and system prompt
+        scope = [model_id, float(temperature), int(max_tokens), float(top_p), normalize_text(flatten_prompt(None, system))]
+        if self.embedder.exact_text:
+            # ...and, for embedders that can't judge meaning, the same text
+            scope.append(text.casefold())
+        digest = hashlib.sha256(json.dumps(scope, ensure_ascii=False).encode("utf-8")).digest()
+        partition = int.from_bytes(digest[:8], "little", signed=True)
+        return SemanticQuery(partition, text, self._threshold_for(model_id))
+
+    def get(self, query: SemanticQuery) -> Optional[Dict[str, Any]]:
+        """
+        Cached response of the most similar earlier prompt
+
+        Returns:
+            The response with its "semantic_similarity", or None below the threshold
+        """
+        self._embed(query)
+        match = self.index.search(query.vector[None, :], [query.partition])[0]
+        with self._lock:
+            hit = match is not None and match[0] >= query.threshold
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        LOOKUPS.inc(result="hit" if hit else "miss")
+        if not hit:
+            return None
+        score, value = match
+        return {**value, "semantic_similarity": round(min(score, 1.0), 4)}
+
+    def set(self, query: SemanticQuery, value: Dict[str, Any]):
+        """Add a response, and snapshot the index every `snapshot_every` inserts"""
+        self._embed(query)
+        self.index.add(query.vector, query.partition, value)
+        with self._lock:
+            self._inserts += 1
+            due = self._inserts % self.snapshot_every == 0 and not self._snapshotting
+            if due:
+                self._snapshotting = True
+        if due:
+            threading.Thread(target=self._background_snapshot, name="semantic-cache-snapshot", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.index),
+            "capacity": self.index.capacity,
+            "restored": self.restored,
+            "embedder": self.embedder.name
+        }
+
+    def _threshold_for(self, model_id: str) -> float:
+        for prefix, threshold in self._thresholds:
+            if model_id.startswith(prefix):
+                return threshold
+        return self.threshold
+
+    def _embed(self, query: SemanticQuery):
+        if query.vector is not None:
+            return
+        key = hashlib.sha256(query.text.encode("utf-8")).hexdigest()
+        vector = self._embeddings.get(key)
+        if vector is None:
+            vector = self.embedder.embed([query.text])[0]
+            self._embeddings.set(key, vector)
+        query.vector = vector
+
+    # -- snapshots ----------------------------------------------------------
+
+    def _snapshot_meta(self) -> Dict[str, Any]:
+        return {"version": SNAPSHOT_VERSION, "embedder": self.embedder.name}
+
+    def snapshot(self):
+        """Write the index to the snapshot file and/or S3 key"""
+        if not self.snapshot_path and not self.snapshot_s3_key:
+            return
+        data = self.index.to_bytes(self._snapshot_meta())
+        if self.snapshot_path:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.snapshot_path)
+        if self.snapshot_s3_key:
+            self.s3_client.put_object_bytes(self.snapshot_s3_key, data, content_type="application/octet-stream")
+
+    def restore(self) -> int:
+        """
+        Load the latest snapshot: the local file if present, else S3
+
+        Returns:
+            Rows restored
+        """
+        data = None
+        if self.snapshot_path and os.path.isfile(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+        elif self.snapshot_s3_key:
+            data = self.s3_client.get_object_bytes(self.snapshot_s3_key)
+        if data:
+            self.restored = self.index.load_bytes(data, self._snapshot_meta())
+        return self.restored
+
+    def _background_snapshot(self):
+        try:
+            self.snapshot()
+        except Exception as e:
+            # The cache keeps working; the next snapshot retries
+            logger.warning("Semantic cache snapshot failed: %s", e)
+        finally:
+            with self._lock:
+                self._snapshotting = False
+
+
+def build_semantic_cache(settings: Settings, s3_client=None) -> Optional[SemanticCache]:
+    """
+    Build the semantic cache described by the settings
+
+    Args:
+        settings: Application settings
+        s3_client: S3Client used for snapshots in S3
+
+    Returns:
+        SemanticCache, or None if disabled
+    """
+    if not settings.semantic_cache_enabled:
+        return None
+    if np is None:
+        raise ValueError("The semantic cache needs numpy")
+
+    embedder_name = settings.semantic_cache_embedder.lower()
+    if embedder_name == "hashing":
+        embedder = HashingEmbedder(settings.semantic_cache_dimensions)
+    elif embedder_name == "titan":
+        from .aws import create_client
+        embedder = TitanEmbedder(
+            lambda: create_client("bedrock-runtime"),
+            model_id=settings.semantic_cache_embedding_model_id,
+            dimensions=settings.semantic_cache_dimensions
+        )
+    else:
+        raise ValueError(f"Unknown semantic cache embedder: {embedder_name}")
+
+    cache = SemanticCache(
+        embedder,
+        VectorIndex(
+            settings.semantic_cache_dimensions,
+            settings.semantic_cache_max_entries,
+            settings.semantic_cache_ttl_seconds
+        ),
+        threshold=settings.semantic_cache_threshold,
+        model_thresholds=settings.semantic_cache_model_thresholds,
+        deterministic_only=settings.semantic_cache_deterministic_only,
+        snapshot_path=settings.semantic_cache_snapshot_path,
+        s3_client=s3_client,
+        snapshot_s3_key=settings.semantic_cache_snapshot_s3_key if s3_client is not None else "",
+        snapshot_every=settings.semantic_cache_snapshot_every
+    )
+    try:
+        cache.restore()
+    except Exception as e:
+        # Start empty rather than fail every request over a bad snapshot
+        logger.warning("Could not restore the semantic cache snapshot: %s", e)
+    return cache
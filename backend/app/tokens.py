@@ -0,0 +1,146 @@
+"""
+Local token estimates
+
+Bedrock reports token usage only after a call, and the model families'
+tokenizers aren't available offline (Claude's isn't published, the others
+need vocabulary files the Lambda package doesn't ship). Prompts are
+measured instead with an approximation of each family's tokenizer: the
+text is split the way BPE / SentencePiece tokenizers pre-tokenize it
+(words with their leading space, digit runs, punctuation, whitespace) and
+each piece costs tokens by its UTF-8 length, with per-family parameters
+for vocabulary size and digit handling.
+
+Estimates are meant for budgeting (context windows, rate-limiter
+reservations), not billing. Tokenizers are built on first use per family
+and counts of recent texts are memoized, so a system prompt or template
+shared by many requests is only measured once.
+"""
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
+from .providers import REGION_PREFIXES
+
+# Model family per model ID prefix (longest match wins)
+FAMILIES = {
+    "anthropic.": "anthropic",
+    "meta.llama2": "llama2",
+    "meta.llama": "llama3",
+    "amazon.titan": "titan",
+    "amazon.nova": "titan",
+    "mistral.": "mistral",
+    "cohere.": "cohere",
+}
+
+# Tokenizer parameters per family:
+#   bytes_per_token: average UTF-8 bytes per token inside long words
+#   word_bytes: words up to this length (with the leading space) are one token
+#   digit_group: digits per token in numbers
+#   overhead: tokens added per message / content block by the chat format
+FAMILY_PARAMS = {
+    "anthropic": {"bytes_per_token": 3.6, "word_bytes": 8, "digit_group": 3, "overhead": 4},
+    "llama3": {"bytes_per_token": 4.0, "word_bytes": 9, "digit_group": 3, "overhead": 5},
+    "llama2": {"bytes_per_token": 3.2, "word_bytes": 6, "digit_group": 1, "overhead": 6},
+    "mistral": {"bytes_per_token": 3.2, "word_bytes": 6, "digit_group": 1, "overhead": 6},
+    "titan": {"bytes_per_token": 3.6, "word_bytes": 7, "digit_group": 3, "overhead": 4},
+    "cohere": {"bytes_per_token": 3.8, "word_bytes": 8, "digit_group": 3, "overhead": 4},
+    "default": {"bytes_per_token": 3.5, "word_bytes": 7, "digit_group": 1, "overhead": 6},
+}
+
+_FAMILY_PREFIXES = sorted(FAMILIES.items(), key=lambda item: len(item[0]), reverse=True)
+
+
+class Tokenizer:
+    """Approximate tokenizer of one model family"""
+
+    def __init__(self, family: str, bytes_per_token: float, word_bytes: int, digit_group: int, overhead: int):
+        self.family = family
+        self.bytes_per_token = bytes_per_token
+        self.word_bytes = word_bytes
+        self.digit_group = digit_group
+        self.overhead = overhead
+        # Pre-tokenizer: contractions, words, digit runs, punctuation runs, whitespace
+        self._pieces = re.compile(r"'(?:[sdmt]|ll|ve|re)\b| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|_+|\s+")
+
+    def count(self, text: str) -> int:
+        """Estimated number of tokens in a text"""
+        tokens = 0
+        for piece in self._pieces.findall(text):
+            first = piece[1] if piece[0] == " " and len(piece) > 1 else piece[0]
+            if first.isdigit():
+                tokens += math.ceil(len(piece.strip()) / self.digit_group)
+            elif first.isspace():
+                # Runs of spaces / newlines merge into one or a few tokens
+                tokens += math.ceil(len(piece) / 16)
+            else:
+                size = len(piece.encode("utf-8"))
+                tokens += 1 if size <= self.word_bytes else math.ceil(size / self.bytes_per_token)
+        return tokens
+
+
+def model_family(model_id: str) -> str:
+    """Tokenizer family of a model ID (inference profile prefixes ignored)"""
+    base_id = model_id
+    for region in REGION_PREFIXES:
+        if model_id.startswith(region):
+            base_id = model_id[len(region):]
+            break
+    for prefix, family in _FAMILY_PREFIXES:
+        if base_id.startswith(prefix):
+            return family
+    return "default"
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(family: str) -> Tokenizer:
+    """Tokenizer of a family, built on first use"""
+    return Tokenizer(family, **FAMILY_PARAMS.get(family, FAMILY_PARAMS["default"]))
+
+
+@lru_cache(maxsize=1024)
+def _count(family: str, text: str) -> int:
+    return get_tokenizer(family).count(text)
+
+
+def count_tokens(model_id: str, text: str) -> int:
+    """Estimated tokens of a text for a model"""
+    return _count(model_family(model_id), text) if text else 0
+
+
+def _content_tokens(family: str, content: Union[str, List[Dict[str, Any]], None]) -> int:
+    if not content:
+        return 0
+    if isinstance(content, str):
+        return _count(family, content)
+    return sum(_count(family, block["text"]) + get_tokenizer(family).overhead for block in content)
+
+
+def estimate_input_tokens(
+    model_id: str,
+    prompt: Optional[str] = None,
+    system: Union[str, List[Dict[str, Any]], None] = None,
+    messages: Optional[List[Dict[str, Any]]] = None
+) -> int:
+    """
+    Estimate the input tokens of a request
+
+    Args:
+        model_id: Bedrock model ID
+        prompt: Prompt text
+        system: System prompt (text or content blocks)
+        messages: Conversation ({"role", "content"} dicts)
+
+    Returns:
+        Estimated input tokens, including the chat format's overhead
+    """
+    family = model_family(model_id)
+    overhead = get_tokenizer(family).overhead
+    tokens = overhead
+    if system:
+        tokens += _content_tokens(family, system) + overhead
+    for message in messages or []:
+        tokens += _content_tokens(family, message["content"]) + overhead
+    if prompt:
+        tokens += _count(family, prompt) + overhead
+    return tokens
@@ -0,0 +1,257 @@
+"""
+API load benchmark against the local AWS stand-in
+
+Starts benchmarks/aws_standin.py and the API (uvicorn, in-process) with
+every AWS endpoint pointed at the stand-in. It then drives /api/prompt,
+/api/upload, /api/files and /api/process at a fixed concurrency and
+reports p50/p95/p99 latency and requests per second for each. The
+"variants" scenario resends a few questions with whitespace and casing
+changes, the traffic the semantic cache is for (SEMANTIC_CACHE_ENABLED=true).
+
+With --baseline, the run is compared to an earlier --json report. It
+exits with status 1 when a scenario's p95 rises, or its RPS drops, by more
+than --tolerance. CI can run it without AWS credentials.
+
+Usage (from the backend folder):
+    python -m benchmarks.api_load --requests 200 --concurrency 16 --json bench.json
+    python -m benchmarks.api_load --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.aws_standin import AWSStandIn
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+BUCKET = "bench-bucket"
+SCENARIOS = ("prompt", "variants", "upload", "files", "process")
+QUESTIONS = (
+    "What is artificial intelligence?",
+    "Explique o que é inteligência artificial em termos simples",
+    "Summarize the causes of the French Revolution in three bullet points",
+    "Write a haiku about cloud computing",
+)
+
+
+def configure_environment(standin_url: str, workdir: str):
+    """Point the app at the stand-in; must run before app is imported"""
+    os.environ.update({
+        "AWS_ENDPOINT_URL": standin_url,
+        "S3_ADDRESSING_STYLE": "path",
+        "AWS_ACCESS_KEY_ID": "standin",
+        "AWS_SECRET_ACCESS_KEY": "standin",
+        "S3_BUCKET_NAME": BUCKET,
+        "S3_UPLOAD_FOLDER": "uploads",
+        "PROCESSING_BACKEND": "remote",
+        "JOB_STORE": "memory",
+        "HISTORY_SQLITE_PATH": os.path.join(workdir, "history.db"),
+        "BEDROCK_CATALOG_CACHE_PATH": "",
+        "SEMANTIC_CACHE_SNAPSHOT_PATH": os.path.join(workdir, "semantic_cache.npz"),
+    })
+    # Measure the request path itself: no admission ramp-up, no response,
+    # processing or listing caches and no post-upload ingest jobs, which
+    # run in their own Lambda in production but here would share the
+    # process with the stand-in (each can be re-enabled from the environment)
+    os.environ.setdefault("BEDROCK_RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    os.environ.setdefault("S3_LIST_CACHE_TTL_SECONDS", "0")
+    os.environ.setdefault("PROCESSING_CACHE_ENABLED", "false")
+    os.environ.setdefault("INGEST_ENABLED", "false")
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def request(method: str, url: str, body: bytes = None, headers: dict = None) -> int:
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def multipart_csv(filename: str, data: bytes) -> tuple:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: text/csv\r\n\r\n"
+    ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def build_scenarios(base_url: str, upload_kb: int) -> dict:
+    """Scenario name -> callable sending one request and returning its HTTP status"""
+    csv_data = b"ID,AREA,GRADO\n" + b"".join(
+        f"{i},Matemáticas,{i % 12}\n".encode("utf-8") for i in range(upload_kb * 1024 // 20)
+    )
+    json_headers = {"Content-Type": "application/json"}
+
+    def prompt():
+        body = json.dumps({"prompt": f"ping {uuid.uuid4().hex}", "model_id": MODEL_ID, "max_tokens": 256})
+        return request("POST", f"{base_url}/api/prompt", body.encode("utf-8"), json_headers)
+
+    def variants():
+        question = random.choice(QUESTIONS)
+        words = [word.upper() if random.random() < 0.1 else word for word in question.split()]
+        text = random.choice((" ", "  ", "\n")).join(words) + random.choice(("", " ", "\n"))
+        body = json.dumps({"prompt": text, "model_id": MODEL_ID, "max_tokens": 256, "temperature": 0})
+        return request("POST", f"{base_url}/api/prompt", body.encode("utf-8"), json_headers)
+
+    def upload():
+        # A new file each time (identical content would be deduplicated)
+        body, headers = multipart_csv("bench.csv", csv_data + f"0,{uuid.uuid4().hex},0\n".encode("utf-8"))
+        return request("POST", f"{base_url}/api/upload", body, headers)
+
+    def files():
+        return request("GET", f"{base_url}/api/files?limit=100")
+
+    def process():
+        body = json.dumps({"body": {"csv_key": "uploads/seed_00000.csv", "target": "alumno",
+                                    "columns": ["ÁREA", "GRADO", "PERÍODO"]}})
+        return request("POST", f"{base_url}/api/process", body.encode("utf-8"), json_headers)
+
+    return {"prompt": prompt, "variants": variants, "upload": upload, "files": files, "process": process}
+
+
+def run_scenario(send, requests: int, concurrency: int) -> dict:
+    def timed_send(_):
+        start = time.perf_counter()
+        status = send()
+        return time.perf_counter() - start, status
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        outcomes = list(pool.map(timed_send, range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency, _ in outcomes)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, status in outcomes if status >= 400),
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "p99_ms": round(percentile(latencies, 0.99), 1),
+        "max_ms": round(latencies[-1], 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of p95 or RPS beyond the tolerance"""
+    failures = []
+    for name, result in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {result['p95_ms']} ms vs {before['p95_ms']} ms")
+        if result["rps"] < before["rps"] * (1 - tolerance):
+            failures.append(f"{name}: {result['rps']} RPS vs {before['rps']} RPS")
+        if result["errors"] > before["errors"]:
+            failures.append(f"{name}: {result['errors']} errors vs {before['errors']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per scenario")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Stand-in Bedrock latency")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--output-tokens", type=int, default=50)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--s3-latency-ms", type=float, default=5)
+    parser.add_argument("--lambda-latency-ms", type=float, default=100)
+    parser.add_argument("--lambda-payload-kb", type=int, default=4)
+    parser.add_argument("--upload-kb", type=int, default=64, help="Size of each uploaded CSV")
+    parser.add_argument("--seed-files", type=int, default=1000, help="Objects pre-loaded in the upload folder")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    standin = AWSStandIn(
+        port=0,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        output_tokens=args.output_tokens,
+        throttle_rate=args.throttle_rate,
+        s3_latency_ms=args.s3_latency_ms,
+        lambda_latency_ms=args.lambda_latency_ms,
+        lambda_payload_kb=args.lambda_payload_kb,
+        seed=42
+    ).start()
+    for i in range(args.seed_files):
+        standin.put_object(BUCKET, f"uploads/seed_{i:05d}.csv", b"ID,AREA\n1,Arte\n", "text/csv")
+
+    workdir = tempfile.mkdtemp(prefix="api_load_")
+    configure_environment(standin.url, workdir)
+
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    scenarios = build_scenarios(base_url, args.upload_kb)
+    results = {}
+    try:
+        for name in args.scenarios:
+            for _ in range(args.warmup):
+                scenarios[name]()
+            results[name] = run_scenario(scenarios[name], args.requests, args.concurrency)
+    finally:
+        server.should_exit = True
+        thread.join()
+        standin.stop()
+
+    print(f"{'scenario':<10}{'reqs':>6}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['requests']:>6}{r['errors']:>8}{r['rps']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+
+    report = {"settings": vars(args), "scenarios": results}
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        failures = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if failures:
+            for failure in failures:
+                print(f"FAIL: {failure}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
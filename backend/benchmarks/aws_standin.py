@@ -0,0 +1,733 @@
+"""
+Local stand-in for the AWS services the backend calls
+
+One HTTP server that answers the boto3 clients when AWS_ENDPOINT_URL
+points at it (with S3_ADDRESSING_STYLE=path), so the API can be run and
+benchmarked without AWS:
+
+- Bedrock runtime: InvokeModel and InvokeModelWithResponseStream (Anthropic
+  Messages format; the stream uses the binary event-stream encoding), and
+  InvokeModel on Titan embeddings models (hashed bag-of-words vectors)
+- Bedrock control plane: ListFoundationModels, ListInferenceProfiles and
+  batch inference (Create/GetModelInvocationJob). Jobs finish after a
+  delay, writing {"recordId", "modelOutput"} lines to
+  <output s3Uri>/<job id>/<input file>.out like Bedrock does
+- S3 (path-style): Put (with If-Match/If-None-Match)/Get (with Range)/Head/Copy/DeleteObjects, ListObjectsV2 and
+  multipart uploads (with ListMultipartUploads/ListParts), kept in memory
+  with their user metadata
+- Lambda: Invoke (RequestResponse returns a canned processing result of
+  configurable size; Event is accepted and dropped)
+
+Latency, throttling and payload sizes are tunable. Requests are not
+authenticated; any credentials work.
+
+Usage (from the backend folder):
+    python -m benchmarks.aws_standin --port 4566 --latency-ms 300 --throttle-rate 0.05
+
+    AWS_ENDPOINT_URL=http://127.0.0.1:4566 S3_ADDRESSING_STYLE=path \\
+        AWS_ACCESS_KEY_ID=standin AWS_SECRET_ACCESS_KEY=standin \\
+        uvicorn app.main:app
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+S3_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+FOUNDATION_MODELS = [
+    {
+        "modelId": "anthropic.claude-3-5-sonnet-20241022-v2:0",
+        "modelName": "Claude 3.5 Sonnet v2",
+        "providerName": "Anthropic",
+        "inputModalities": ["TEXT", "IMAGE"],
+        "outputModalities": ["TEXT"],
+        "responseStreamingSupported": True,
+        "inferenceTypesSupported": ["INFERENCE_PROFILE"],
+        "modelLifecycle": {"status": "ACTIVE"},
+    },
+    {
+        "modelId": "anthropic.claude-3-5-haiku-20241022-v1:0",
+        "modelName": "Claude 3.5 Haiku",
+        "providerName": "Anthropic",
+        "inputModalities": ["TEXT"],
+        "outputModalities": ["TEXT"],
+        "responseStreamingSupported": True,
+        "inferenceTypesSupported": ["ON_DEMAND", "INFERENCE_PROFILE"],
+        "modelLifecycle": {"status": "ACTIVE"},
+    },
+]
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+
+
+def event_stream_message(headers: Dict[str, str], payload: bytes) -> bytes:
+    """Encode one message of the application/vnd.amazon.eventstream format"""
+    encoded_headers = b"".join(
+        struct.pack(">B", len(name)) + name.encode("utf-8")
+        + b"\x07" + struct.pack(">H", len(value)) + value.encode("utf-8")
+        for name, value in headers.items()
+    )
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack(">II", total_length, len(encoded_headers))
+    prelude += struct.pack(">I", zlib.crc32(prelude))
+    message = prelude + encoded_headers + payload
+    return message + struct.pack(">I", zlib.crc32(message))
+
+
+def _chunk_event(chunk: dict) -> bytes:
+    payload = json.dumps({"bytes": base64.b64encode(json.dumps(chunk).encode("utf-8")).decode("ascii")})
+    return event_stream_message(
+        {":event-type": "chunk", ":content-type": "application/json", ":message-type": "event"},
+        payload.encode("utf-8")
+    )
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class StoredObject:
+    def __init__(self, data: bytes, content_type: str, metadata: Optional[Dict[str, str]] = None):
+        self.data = data
+        self.content_type = content_type
+        self.metadata = metadata or {}
+        self.etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self.last_modified = time.time()
+
+
+class AWSStandIn:
+    """In-process stand-in server; start() runs it on a daemon thread"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 4566,
+        latency_ms: float = 200,
+        jitter_ms: float = 0,
+        tokens_per_second: float = 0,
+        output_tokens: int = 50,
+        throttle_rate: float = 0.0,
+        max_concurrency: int = 0,
+        s3_latency_ms: float = 5,
+        lambda_latency_ms: float = 100,
+        lambda_payload_kb: int = 4,
+        batch_seconds: float = 2,
+        batch_error_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            host, port: Address to listen on (port 0 = any free port)
+            latency_ms: Bedrock time to first token
+            jitter_ms: Uniform random extra latency on every call
+            tokens_per_second: Bedrock generation speed (0 = instant)
+            output_tokens: Words in every Bedrock completion
+            throttle_rate: Fraction of Bedrock calls answered with ThrottlingException
+            max_concurrency: Bedrock calls in flight above which the stand-in
+                throttles (0 = no limit)
+            s3_latency_ms: Latency of every S3 call
+            lambda_latency_ms: Latency of a Lambda invocation
+            lambda_payload_kb: Approximate size of the Lambda result
+            batch_seconds: Time a batch inference job takes to complete
+            batch_error_rate: Fraction of batch records that fail
+            seed: Seed for the random throttling and jitter
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.throttle_rate = throttle_rate
+        self.max_concurrency = max_concurrency
+        self.s3_latency_ms = s3_latency_ms
+        self.lambda_latency_ms = lambda_latency_ms
+        self.lambda_payload_kb = lambda_payload_kb
+        self.batch_seconds = batch_seconds
+        self.batch_error_rate = batch_error_rate
+
+        self.buckets: Dict[str, Dict[str, StoredObject]] = {}
+        self.uploads: Dict[str, Dict[int, bytes]] = {}
+        self.upload_keys: Dict[str, tuple] = {}  # upload ID -> (bucket, key, initiated)
+        self.upload_metadata: Dict[str, tuple] = {}  # upload ID -> (content type, user metadata)
+        self.batch_jobs: Dict[str, dict] = {}
+        self.counts: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "AWSStandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="aws-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def put_object(self, bucket: str, key: str, data: bytes, content_type: str = "binary/octet-stream",
+                   metadata: Optional[Dict[str, str]] = None):
+        """Seed an object directly (no HTTP round trip)"""
+        with self._lock:
+            self.buckets.setdefault(bucket, {})[key] = StoredObject(data, content_type, metadata)
+
+    # -- behaviour knobs ----------------------------------------------------
+
+    def _count(self, operation: str):
+        with self._lock:
+            self.counts[operation] = self.counts.get(operation, 0) + 1
+
+    def _sleep(self, milliseconds: float):
+        extra = self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        if milliseconds + extra > 0:
+            time.sleep((milliseconds + extra) / 1000)
+
+    def _admit_bedrock(self) -> bool:
+        """False when this call should be throttled"""
+        with self._lock:
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                return False
+            if self.throttle_rate and self._random.random() < self.throttle_rate:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _leave_bedrock(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def completion(self) -> list:
+        return [WORDS[i % len(WORDS)] for i in range(self.output_tokens)]
+
+    def titan_embedding(self, request: dict) -> dict:
+        """Deterministic unit vector of the input's words, like a Titan embeddings response"""
+        words = re.findall(r"\w+", request.get("inputText", "").lower())
+        vector = [0.0] * request.get("dimensions", 1536)
+        for word in words:
+            digest = zlib.crc32(word.encode("utf-8"))
+            vector[digest % len(vector)] += 1.0 if digest & 1 else -1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return {"embedding": [v / norm for v in vector], "inputTextTokenCount": len(words)}
+
+    def anthropic_message(self, model_id: str, input_tokens: int) -> dict:
+        words = self.completion()
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model_id,
+            "content": [{"type": "text", "text": " ".join(words)}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": input_tokens, "output_tokens": len(words)}
+        }
+
+    # -- batch inference ----------------------------------------------------
+
+    def create_batch_job(self, request: dict) -> dict:
+        with self._lock:
+            for job in self.batch_jobs.values():
+                token = request.get("clientRequestToken")
+                if token and job["clientRequestToken"] == token:
+                    return job
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                "jobArn": f"arn:aws:bedrock:us-east-1:000000000000:model-invocation-job/{job_id}",
+                "jobName": request["jobName"],
+                "modelId": request["modelId"],
+                "clientRequestToken": request.get("clientRequestToken"),
+                "roleArn": request["roleArn"],
+                "status": "Submitted",
+                "submitTime": _iso(time.time()),
+                "inputDataConfig": request["inputDataConfig"],
+                "outputDataConfig": request["outputDataConfig"],
+                "timeoutDurationInHours": request.get("timeoutDurationInHours", 24),
+            }
+            self.batch_jobs[job_id] = job
+        for delay, action, args in (
+            (self.batch_seconds / 2, self._set_batch_status, (job_id, "InProgress")),
+            (self.batch_seconds, self._run_batch_job, (job_id,)),
+        ):
+            timer = threading.Timer(delay, action, args)
+            timer.daemon = True
+            timer.start()
+        return job
+
+    def get_batch_job(self, identifier: str) -> Optional[dict]:
+        return self.batch_jobs.get(identifier.rsplit("/", 1)[-1])
+
+    def _set_batch_status(self, job_id: str, status: str):
+        with self._lock:
+            job = self.batch_jobs[job_id]
+            if job["status"] not in ("Completed", "PartiallyCompleted", "Failed"):
+                job["status"] = status
+
+    def _run_batch_job(self, job_id: str):
+        job = self.batch_jobs[job_id]
+        in_bucket, _, in_prefix = job["inputDataConfig"]["s3InputDataConfig"]["s3Uri"][5:].partition("/")
+        out_bucket, _, out_prefix = job["outputDataConfig"]["s3OutputDataConfig"]["s3Uri"][5:].partition("/")
+        if out_prefix and not out_prefix.endswith("/"):
+            out_prefix += "/"
+        with self._lock:
+            inputs = sorted(
+                (key, stored.data) for key, stored in self.buckets.get(in_bucket, {}).items()
+                if key.startswith(in_prefix) and key.endswith(".jsonl")
+            )
+        if not inputs:
+            with self._lock:
+                job.update(status="Failed", message="No input files found", endTime=_iso(time.time()))
+            return
+
+        processed = errors = 0
+        for key, data in inputs:
+            lines = []
+            for line in data.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                processed += 1
+                output = {"recordId": record["recordId"], "modelInput": record["modelInput"]}
+                if self.batch_error_rate and self._random.random() < self.batch_error_rate:
+                    errors += 1
+                    output["error"] = {"errorCode": 400, "errorMessage": "Malformed input request"}
+                else:
+                    input_tokens = max(1, len(json.dumps(record["modelInput"])) // 4)
+                    output["modelOutput"] = self.anthropic_message(job["modelId"], input_tokens)
+                lines.append(json.dumps(output))
+            self.put_object(out_bucket, f"{out_prefix}{job_id}/{key.rsplit('/', 1)[-1]}.out",
+                            ("\n".join(lines) + "\n").encode("utf-8"))
+        manifest = {"totalRecordCount": processed, "processedRecordCount": processed,
+                    "successRecordCount": processed - errors, "errorRecordCount": errors}
+        self.put_object(out_bucket, f"{out_prefix}{job_id}/manifest.json.out", json.dumps(manifest).encode("utf-8"))
+        with self._lock:
+            job.update(status="PartiallyCompleted" if errors else "Completed", endTime=_iso(time.time()))
+
+
+def _make_handler(standin: AWSStandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        # -- plumbing -------------------------------------------------------
+
+        def _body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _send(self, status: int, body: bytes = b"", content_type: str = "application/json",
+                  headers: Optional[Dict[str, str]] = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("x-amzn-RequestId", uuid.uuid4().hex)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _json(self, status: int, data, headers: Optional[Dict[str, str]] = None):
+            self._send(status, json.dumps(data).encode("utf-8"), headers=headers)
+
+        def _json_error(self, status: int, code: str, message: str):
+            self._json(status, {"message": message}, headers={"x-amzn-ErrorType": code})
+
+        def _xml(self, status: int, xml: str):
+            self._send(status, f'<?xml version="1.0" encoding="UTF-8"?>\n{xml}'.encode("utf-8"), "application/xml")
+
+        def _s3_error(self, status: int, code: str, message: str):
+            self._xml(status, f"<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>")
+
+        def _route(self):
+            parts = urlsplit(self.path)
+            path = parts.path
+            query = {name: values[0] for name, values in parse_qs(parts.query, keep_blank_values=True).items()}
+            try:
+                if path.startswith("/model/"):
+                    return self._bedrock_runtime(path, query)
+                if path in ("/foundation-models", "/inference-profiles"):
+                    return self._bedrock_control(path)
+                if path.startswith("/model-invocation-job"):
+                    return self._batch_inference(path)
+                if path.startswith("/2015-03-31/functions/"):
+                    return self._lambda(path)
+                return self._s3(path, query)
+            except BrokenPipeError:
+                pass
+
+        do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _route
+
+        # -- Bedrock --------------------------------------------------------
+
+        def _bedrock_runtime(self, path: str, query: dict):
+            _, _, model_id, operation = path.split("/", 3)
+            model_id = unquote(model_id)
+            request = json.loads(self._body() or b"{}")
+            standin._count(f"bedrock:{operation}")
+            if not standin._admit_bedrock():
+                standin._count("bedrock:throttled")
+                return self._json_error(429, "ThrottlingException", "Too many requests, please wait before trying again.")
+            try:
+                if model_id.startswith("amazon.titan-embed"):
+                    standin._sleep(standin.latency_ms / 10)
+                    return self._json(200, standin.titan_embedding(request))
+                input_tokens = max(1, len(json.dumps(request.get("messages", ""))) // 4)
+                words = standin.completion()
+                if operation == "invoke":
+                    self._generate(len(words))
+                    return self._json(200, standin.anthropic_message(model_id, input_tokens), headers={
+                        "x-amzn-bedrock-input-token-count": str(input_tokens),
+                        "x-amzn-bedrock-output-token-count": str(len(words))
+                    })
+                if operation == "invoke-with-response-stream":
+                    return self._stream(words, input_tokens)
+                return self._json_error(404, "UnknownOperationException", operation)
+            finally:
+                standin._leave_bedrock()
+
+        def _generate(self, tokens: int):
+            standin._sleep(standin.latency_ms)
+            if standin.tokens_per_second:
+                time.sleep(tokens / standin.tokens_per_second)
+
+        def _stream(self, words: list, input_tokens: int):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("x-amzn-RequestId", uuid.uuid4().hex)
+            self.end_headers()
+
+            def write(event: dict):
+                data = _chunk_event(event)
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            standin._sleep(standin.latency_ms)
+            write({"type": "message_start", "message": {"usage": {"input_tokens": input_tokens}}})
+            write({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+            for i, word in enumerate(words):
+                if standin.tokens_per_second:
+                    time.sleep(1 / standin.tokens_per_second)
+                write({"type": "content_block_delta", "index": 0,
+                       "delta": {"type": "text_delta", "text": word if i == 0 else f" {word}"}})
+            write({"type": "content_block_stop", "index": 0})
+            write({"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                   "usage": {"output_tokens": len(words)}})
+            write({"type": "message_stop", "amazon-bedrock-invocationMetrics": {
+                "inputTokenCount": input_tokens, "outputTokenCount": len(words)
+            }})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _bedrock_control(self, path: str):
+            standin._count(f"bedrock:{path.strip('/')}")
+            if path == "/foundation-models":
+                return self._json(200, {"modelSummaries": FOUNDATION_MODELS})
+            return self._json(200, {"inferenceProfileSummaries": [
+                {
+                    "inferenceProfileId": f"us.{model['modelId']}",
+                    "inferenceProfileName": f"US {model['modelName']}",
+                    "description": f"Routes requests to {model['modelName']} in US regions",
+                    "status": "ACTIVE",
+                    "type": "SYSTEM_DEFINED"
+                }
+                for model in FOUNDATION_MODELS
+            ]})
+
+        def _batch_inference(self, path: str):
+            if self.command == "POST":
+                standin._count("bedrock:CreateModelInvocationJob")
+                job = standin.create_batch_job(json.loads(self._body() or b"{}"))
+                return self._json(200, {"jobArn": job["jobArn"]})
+            standin._count("bedrock:GetModelInvocationJob")
+            job = standin.get_batch_job(unquote(path.split("/", 2)[2]))
+            if job is None:
+                return self._json_error(404, "ResourceNotFoundException", "Model invocation job not found")
+            with standin._lock:
+                return self._json(200, dict(job))
+
+        # -- Lambda ---------------------------------------------------------
+
+        def _lambda(self, path: str):
+            function_name = unquote(path.split("/")[3])
+            payload = json.loads(self._body() or b"{}")
+            standin._count("lambda:Invoke")
+            if self.headers.get("X-Amz-Invocation-Type") == "Event":
+                return self._send(202)
+            standin._sleep(standin.lambda_latency_ms)
+            body = payload.get("body", {})
+            columns = body.get("columns") or ["value"]
+            # Pad the per-column summaries to the configured result size
+            values = max(1, standin.lambda_payload_kb * 1024 // (24 * len(columns)))
+            data = {
+                "function": function_name,
+                "csv_key": body.get("csv_key"),
+                "target": body.get("target"),
+                "columns": {
+                    column: {f"value_{i:05d}": i for i in range(values)}
+                    for column in columns
+                }
+            }
+            return self._json(200, {"statusCode": 200, "data": data},
+                              headers={"X-Amz-Executed-Version": "$LATEST"})
+
+        # -- S3 -------------------------------------------------------------
+
+        def _s3(self, path: str, query: dict):
+            standin._sleep(standin.s3_latency_ms)
+            bucket, _, key = path.lstrip("/").partition("/")
+            bucket, key = unquote(bucket), unquote(key)
+            with standin._lock:
+                objects = standin.buckets.setdefault(bucket, {})
+
+            if not key:
+                if self.command == "GET" and query.get("list-type") == "2":
+                    standin._count("s3:ListObjectsV2")
+                    return self._list(bucket, objects, query)
+                if self.command == "GET" and "uploads" in query:
+                    standin._count("s3:ListMultipartUploads")
+                    prefix = query.get("prefix", "")
+                    with standin._lock:
+                        pending = sorted(
+                            (target[1], upload_id, target[2])
+                            for upload_id, target in standin.upload_keys.items()
+                            if target[0] == bucket and target[1].startswith(prefix)
+                        )
+                    uploads_xml = "".join(
+                        f"<Upload><Key>{escape(k)}</Key><UploadId>{upload_id}</UploadId>"
+                        f"<Initiated>{_iso(initiated)}</Initiated></Upload>"
+                        for k, upload_id, initiated in pending
+                    )
+                    return self._xml(200, (
+                        f'<ListMultipartUploadsResult xmlns="{S3_NS}"><Bucket>{escape(bucket)}</Bucket>'
+                        f"<Prefix>{escape(prefix)}</Prefix><IsTruncated>false</IsTruncated>"
+                        f"{uploads_xml}</ListMultipartUploadsResult>"
+                    ))
+                if self.command == "POST" and "delete" in query:
+                    standin._count("s3:DeleteObjects")
+                    root = ElementTree.fromstring(self._body())
+                    keys = [element.text for element in root.iter() if element.tag.endswith("Key")]
+                    with standin._lock:
+                        for deleted in keys:
+                            objects.pop(deleted, None)
+                    deleted_xml = "".join(f"<Deleted><Key>{escape(k)}</Key></Deleted>" for k in keys)
+                    return self._xml(200, f'<DeleteResult xmlns="{S3_NS}">{deleted_xml}</DeleteResult>')
+                return self._s3_error(400, "InvalidRequest", f"Unsupported bucket operation {self.command}")
+
+            if self.command == "PUT" and "uploadId" in query:
+                standin._count("s3:UploadPart")
+                data = self._body()
+                with standin._lock:
+                    parts = standin.uploads.get(query["uploadId"])
+                    if parts is None:
+                        return self._s3_error(404, "NoSuchUpload", "Upload not found")
+                    parts[int(query["partNumber"])] = data
+                return self._send(200, headers={"ETag": f'"{hashlib.md5(data).hexdigest()}"'})
+            if self.command == "PUT" and "x-amz-copy-source" in self.headers:
+                standin._count("s3:CopyObject")
+                self._body()
+                source_bucket, _, source_key = unquote(self.headers["x-amz-copy-source"]).lstrip("/").partition("/")
+                with standin._lock:
+                    source = standin.buckets.get(source_bucket, {}).get(source_key)
+                    if source is None:
+                        return self._s3_error(404, "NoSuchKey", "The specified key does not exist.")
+                    if self.headers.get("x-amz-metadata-directive") == "REPLACE":
+                        stored = StoredObject(source.data, self.headers.get("Content-Type", source.content_type),
+                                              self._user_metadata())
+                    else:
+                        stored = StoredObject(source.data, source.content_type, dict(source.metadata))
+                    objects[key] = stored
+                return self._xml(200, (
+                    f'<CopyObjectResult xmlns="{S3_NS}"><LastModified>{_iso(stored.last_modified)}</LastModified>'
+                    f"<ETag>{escape(stored.etag)}</ETag></CopyObjectResult>"
+                ))
+            if self.command == "PUT":
+                standin._count("s3:PutObject")
+                stored = StoredObject(
+                    self._body(), self.headers.get("Content-Type", "binary/octet-stream"), self._user_metadata()
+                )
+                with standin._lock:
+                    # Conditional writes: If-Match (ETag) and If-None-Match: *
+                    current = objects.get(key)
+                    if_match = self.headers.get("If-Match")
+                    if (if_match is not None and (current is None or current.etag.strip('"') != if_match.strip('"'))) \
+                            or (self.headers.get("If-None-Match") == "*" and current is not None):
+                        return self._s3_error(412, "PreconditionFailed", "At least one of the pre-conditions you specified did not hold")
+                    objects[key] = stored
+                return self._send(200, headers={"ETag": stored.etag})
+            if self.command == "POST" and "uploads" in query:
+                standin._count("s3:CreateMultipartUpload")
+                upload_id = uuid.uuid4().hex
+                with standin._lock:
+                    standin.uploads[upload_id] = {}
+                    standin.upload_keys[upload_id] = (bucket, key, time.time())
+                    standin.upload_metadata[upload_id] = (
+                        self.headers.get("Content-Type", "binary/octet-stream"), self._user_metadata()
+                    )
+                return self._xml(200, (
+                    f'<InitiateMultipartUploadResult xmlns="{S3_NS}"><Bucket>{escape(bucket)}</Bucket>'
+                    f"<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                ))
+            if self.command == "GET" and "uploadId" in query:
+                standin._count("s3:ListParts")
+                with standin._lock:
+                    parts = dict(standin.uploads.get(query["uploadId"]) or {})
+                    if query["uploadId"] not in standin.uploads:
+                        return self._s3_error(404, "NoSuchUpload", "Upload not found")
+                parts_xml = "".join(
+                    f"<Part><PartNumber>{n}</PartNumber><ETag>&quot;{hashlib.md5(parts[n]).hexdigest()}&quot;</ETag>"
+                    f"<Size>{len(parts[n])}</Size></Part>"
+                    for n in sorted(parts)
+                )
+                return self._xml(200, (
+                    f'<ListPartsResult xmlns="{S3_NS}"><Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>'
+                    f"<UploadId>{query['uploadId']}</UploadId><IsTruncated>false</IsTruncated>"
+                    f"{parts_xml}</ListPartsResult>"
+                ))
+            if self.command == "POST" and "uploadId" in query:
+                standin._count("s3:CompleteMultipartUpload")
+                self._body()
+                with standin._lock:
+                    standin.upload_keys.pop(query["uploadId"], None)
+                    content_type, metadata = standin.upload_metadata.pop(
+                        query["uploadId"], ("binary/octet-stream", {})
+                    )
+                    parts = standin.uploads.pop(query["uploadId"], None)
+                    if parts is None:
+                        return self._s3_error(404, "NoSuchUpload", "Upload not found")
+                    stored = StoredObject(b"".join(parts[n] for n in sorted(parts)), content_type, metadata)
+                    objects[key] = stored
+                return self._xml(200, (
+                    f'<CompleteMultipartUploadResult xmlns="{S3_NS}"><Location>{self.path}</Location>'
+                    f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                    f"<ETag>{escape(stored.etag)}</ETag></CompleteMultipartUploadResult>"
+                ))
+            if self.command == "DELETE" and "uploadId" in query:
+                standin._count("s3:AbortMultipartUpload")
+                with standin._lock:
+                    standin.upload_keys.pop(query["uploadId"], None)
+                    standin.upload_metadata.pop(query["uploadId"], None)
+                    standin.uploads.pop(query["uploadId"], None)
+                return self._send(204)
+            if self.command == "DELETE":
+                standin._count("s3:DeleteObject")
+                with standin._lock:
+                    objects.pop(key, None)
+                return self._send(204)
+            if self.command in ("GET", "HEAD"):
+                standin._count(f"s3:{'GetObject' if self.command == 'GET' else 'HeadObject'}")
+                stored = objects.get(key)
+                if stored is None:
+                    if self.command == "HEAD":
+                        return self._send(404)
+                    return self._s3_error(404, "NoSuchKey", "The specified key does not exist.")
+                headers = {
+                    "ETag": stored.etag,
+                    "Last-Modified": formatdate(stored.last_modified, usegmt=True),
+                    **{f"x-amz-meta-{name}": value for name, value in stored.metadata.items()}
+                }
+                byte_range = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if byte_range and self.command == "GET":
+                    start = int(byte_range.group(1))
+                    end = min(int(byte_range.group(2) or len(stored.data) - 1), len(stored.data) - 1)
+                    headers["Content-Range"] = f"bytes {start}-{end}/{len(stored.data)}"
+                    return self._send(206, stored.data[start:end + 1], stored.content_type, headers=headers)
+                return self._send(200, stored.data, stored.content_type, headers=headers)
+            return self._s3_error(400, "InvalidRequest", f"Unsupported object operation {self.command}")
+
+        def _user_metadata(self) -> Dict[str, str]:
+            return {
+                name[len("x-amz-meta-"):].lower(): value
+                for name, value in self.headers.items()
+                if name.lower().startswith("x-amz-meta-")
+            }
+
+        def _list(self, bucket: str, objects: Dict[str, StoredObject], query: dict):
+            prefix = query.get("prefix", "")
+            max_keys = int(query.get("max-keys", 1000))
+            start_after = query.get("continuation-token") or query.get("start-after") or ""
+            with standin._lock:
+                keys = sorted(k for k in objects if k.startswith(prefix) and k > start_after)
+            page, truncated = keys[:max_keys], len(keys) > max_keys
+            contents = "".join(
+                f"<Contents><Key>{escape(k)}</Key><LastModified>{_iso(objects[k].last_modified)}</LastModified>"
+                f"<ETag>{escape(objects[k].etag)}</ETag><Size>{len(objects[k].data)}</Size>"
+                f"<StorageClass>STANDARD</StorageClass></Contents>"
+                for k in page
+            )
+            next_token = f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>" if truncated else ""
+            return self._xml(200, (
+                f'<ListBucketResult xmlns="{S3_NS}"><Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>'
+                f"<KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+                f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{contents}{next_token}"
+                f"</ListBucketResult>"
+            ))
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4566)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Bedrock time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Generation speed (0 = instant)")
+    parser.add_argument("--output-tokens", type=int, default=50)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Throttle above this many calls (0 = off)")
+    parser.add_argument("--s3-latency-ms", type=float, default=5)
+    parser.add_argument("--lambda-latency-ms", type=float, default=100)
+    parser.add_argument("--lambda-payload-kb", type=int, default=4)
+    parser.add_argument("--batch-seconds", type=float, default=2, help="Batch inference job duration")
+    parser.add_argument("--batch-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    standin = AWSStandIn(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        throttle_rate=args.throttle_rate,
+        max_concurrency=args.max_concurrency,
+        s3_latency_ms=args.s3_latency_ms,
+        lambda_latency_ms=args.lambda_latency_ms,
+        lambda_payload_kb=args.lambda_payload_kb,
+        batch_seconds=args.batch_seconds,
+        batch_error_rate=args.batch_error_rate
+    )
+    print(f"AWS stand-in listening on {standin.url} (Ctrl+C to stop)")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
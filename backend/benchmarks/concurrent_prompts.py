@@ -0,0 +1,123 @@
+"""
+Load test for /api/prompt against a stubbed Bedrock endpoint
+
+Fires N concurrent prompts at a local uvicorn server whose Bedrock client
+sleeps for a fixed latency instead of calling AWS. With a non-blocking
+invocation path the whole wave should finish in about the time of a single
+call, and /api/health should keep answering while it runs.
+
+Usage (from the backend folder):
+    python -m benchmarks.concurrent_prompts --requests 10 --latency 1.0
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Measure the invocation path itself, not the AIMD ramp-up of the admission control
+os.environ.setdefault("BEDROCK_RATE_LIMIT_ENABLED", "false")
+
+import uvicorn
+
+from app.clients import get_bedrock_client
+from app.main import app
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+
+class StubBedrockRuntime:
+    """Stands in for the boto3 bedrock-runtime client"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> dict:
+        time.sleep(self.latency)
+        payload = {
+            "content": [{"type": "text", "text": "stub response"}],
+            "usage": {"input_tokens": 10, "output_tokens": 2}
+        }
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+
+def post_prompt(base_url: str) -> float:
+    """Send one prompt and return its latency in seconds"""
+    data = json.dumps({"prompt": "ping", "model_id": MODEL_ID}).encode("utf-8")
+    req = urllib.request.Request(
+        f"{base_url}/api/prompt",
+        data=data,
+        headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def get_health(base_url: str) -> float:
+    """Call the health check and return its latency in seconds"""
+    start = time.perf_counter()
+    with urllib.request.urlopen(f"{base_url}/api/health") as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def main():
+    bedrock_client = get_bedrock_client()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=bedrock_client.max_concurrency)
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub latency in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--max-ratio", type=float, default=1.5,
+        help="Fail if each wave takes longer than this many single-call latencies"
+    )
+    args = parser.parse_args()
+
+    bedrock_client.client = StubBedrockRuntime(args.latency)
+
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        single = post_prompt(base_url)
+
+        with ThreadPoolExecutor(max_workers=args.requests + 1) as pool:
+            start = time.perf_counter()
+            futures = [pool.submit(post_prompt, base_url) for _ in range(args.requests)]
+            time.sleep(args.latency / 4)
+            health = get_health(base_url)
+            latencies = [f.result() for f in futures]
+            wave = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    # Requests beyond the concurrency limit queue for a second wave
+    waves = math.ceil(args.requests / bedrock_client.max_concurrency)
+    ratio = wave / single
+    print(f"single call:        {single * 1000:8.1f} ms")
+    print(f"{args.requests:3d} concurrent:     {wave * 1000:8.1f} ms (x{ratio:.2f})")
+    print(f"slowest in wave:    {max(latencies) * 1000:8.1f} ms")
+    print(f"health during wave: {health * 1000:8.1f} ms")
+
+    if ratio > waves * args.max_ratio:
+        print(f"FAIL: expected {waves} wave(s) of about one call each, got x{ratio:.2f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Local vs. remote CSV processing benchmark
+
+Generates synthetic student/teacher CSVs and times
+invoke_processing(csv_key, target, columns) for each size and target. The
+local engine reads the files from disk. With --remote the files are also
+uploaded to S3 and processed by the preprocessing Lambda (needs AWS
+credentials).
+
+Usage (from the backend folder):
+    python -m benchmarks.processing --rows 10000 1000000 [--remote]
+"""
+import argparse
+import csv
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.local_processing import LocalProcessingClient
+
+COLUMNS = ["ÁREA", "GRADO", "PERÍODO"]
+TARGETS = {
+    "alumno": ["ID_ALUMNO", "ÁREA", "GRADO", "PERÍODO", "NOTA", "ASISTENCIA"],
+    "professor": ["ID_PROFESOR", "ÁREA", "GRADO", "PERÍODO", "EVALUACION", "HORAS"],
+}
+AREAS = ["Matemáticas", "Lenguaje", "Ciencias", "Historia", "Inglés", "Arte"]
+PERIODS = ["2023-1", "2023-2", "2024-1", "2024-2"]
+
+
+def generate_csv(path: Path, target: str, rows: int, seed: int = 42):
+    rng = random.Random(seed)
+    header = TARGETS[target]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(rows):
+            writer.writerow([
+                i,
+                rng.choice(AREAS),
+                rng.randint(1, 12),
+                rng.choice(PERIODS),
+                round(rng.uniform(1, 7), 1),
+                rng.randint(0, 100),
+            ])
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def time_call(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--remote", action="store_true", help="Also run the Lambda backend")
+    args = parser.parse_args()
+
+    local = LocalProcessingClient()
+    if args.remote:
+        from app.clients import get_lambda_client, get_s3_client
+        s3_client = get_s3_client()
+        remote = get_lambda_client()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'target':10s} {'rows':>9s} {'backend':8s} {'seconds':>8s} {'rows/s':>11s} {'max RSS':>9s}")
+        for rows in args.rows:
+            for target in TARGETS:
+                path = Path(tmp) / f"{target}_{rows}.csv"
+                generate_csv(path, target, rows)
+
+                elapsed = time_call(local.invoke_processing, str(path), target, COLUMNS)
+                print(f"{target:10s} {rows:9d} {'local':8s} {elapsed:8.2f} "
+                      f"{rows / elapsed:11.0f} {max_rss_mb():7.0f}MB")
+
+                if args.remote:
+                    with open(path, "rb") as f:
+                        key = s3_client.upload_stream(f, path.name)["key"]
+                    elapsed = time_call(remote.invoke_processing, key, target, COLUMNS)
+                    print(f"{target:10s} {rows:9d} {'remote':8s} {elapsed:8.2f} "
+                          f"{rows / elapsed:11.0f} {'-':>9s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Cold-start benchmark for the Lambda handler
+
+Each run starts a fresh interpreter (like a new Lambda execution
+environment), imports app.lambda_handler and sends API Gateway events
+through the Mangum handler. Reports the median of import time, the first
+/api/health call, and the first /api/models call (which builds the Bedrock
+client).
+
+Usage (from the backend folder):
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import json, sys, time
+
+def event(path):
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {"Host": "localhost"},
+        "multiValueHeaders": {"Host": ["localhost"]},
+        "queryStringParameters": None,
+        "multiValueQueryStringParameters": None,
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "path": path},
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+start = time.perf_counter()
+from app.lambda_handler import handler
+imported = time.perf_counter()
+handler(event("/api/health"), None)
+health = time.perf_counter()
+boto3_loaded = "boto3" in sys.modules
+handler(event("/api/models"), None)
+models = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_health_ms": (health - imported) * 1000,
+    "first_models_ms": (models - health) * 1000,
+    "boto3_loaded_by_health": boto3_loaded,
+}))
+"""
+
+
+def run_once() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+
+    for name in ("import_ms", "first_health_ms", "first_models_ms"):
+        values = [r[name] for r in results]
+        print(f"{name:18s} median {statistics.median(values):8.1f} ms"
+              f"   min {min(values):8.1f}   max {max(values):8.1f}")
+    print(f"boto3 loaded by /api/health: {results[0]['boto3_loaded_by_health']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Shared fixtures
+
+Every AWS endpoint points at the in-process stand-in
+(benchmarks/aws_standin.py), so the suite runs offline. The environment
+has to be set before app.main is imported: settings and clients are
+built once per process.
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.api_load import BUCKET, configure_environment
+from benchmarks.aws_standin import AWSStandIn
+
+STANDIN = AWSStandIn(port=0, latency_ms=0, s3_latency_ms=0, lambda_latency_ms=0, seed=1).start()
+configure_environment(STANDIN.url, tempfile.mkdtemp(prefix="tests_"))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    STANDIN.stop()
+
+
+@pytest.fixture
+def standin():
+    return STANDIN
+
+
+@pytest.fixture
+def bucket():
+    return BUCKET
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
@@ -0,0 +1,21 @@
+from app.aws import create_client, get_session
+from app.config import get_settings
+
+
+def test_clients_share_one_session_and_the_tuned_config(standin):
+    settings = get_settings()
+    assert get_session() is get_session()
+
+    bedrock = create_client("bedrock-runtime")
+    s3 = create_client("s3")
+    for client in (bedrock, s3):
+        config = client.meta.config
+        assert config.max_pool_connections == settings.aws_max_pool_connections
+        assert config.connect_timeout == settings.aws_connect_timeout
+        assert config.retries == {
+            "mode": settings.aws_retry_mode, "total_max_attempts": settings.aws_max_attempts
+        }
+        assert client.meta.endpoint_url == standin.url
+    assert bedrock.meta.config.read_timeout == settings.bedrock_read_timeout
+    assert s3.meta.config.read_timeout == settings.s3_read_timeout
+    assert create_client("sts").meta.config.read_timeout == settings.aws_read_timeout
@@ -0,0 +1,63 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from app.aws import create_client
+from app.config import get_settings
+from benchmarks.api_load import compare, percentile
+from benchmarks.aws_standin import AWSStandIn
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+
+def _invoke(url: str) -> int:
+    request = urllib.request.Request(
+        f"{url}/model/{MODEL_ID}/invoke",
+        data=json.dumps({"messages": [{"role": "user", "content": "Hi"}]}).encode(),
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_standin_throttles_at_the_configured_rate():
+    standin = AWSStandIn(port=0, latency_ms=0, throttle_rate=1.0, seed=1).start()
+    try:
+        assert _invoke(standin.url) == 429
+        assert standin.counts["bedrock:throttled"] == 1
+        standin.throttle_rate = 0
+        assert _invoke(standin.url) == 200
+    finally:
+        standin.stop()
+
+
+def test_per_service_endpoint_overrides_the_shared_one(standin, monkeypatch):
+    monkeypatch.setattr(get_settings(), "s3_endpoint_url", "http://127.0.0.1:9")
+    assert create_client("s3").meta.endpoint_url == "http://127.0.0.1:9"
+    assert create_client("lambda").meta.endpoint_url == standin.url
+
+
+def test_baseline_comparison_flags_regressions_beyond_the_tolerance():
+    baseline = {"scenarios": {
+        "prompt": {"p95_ms": 100, "rps": 50, "errors": 0},
+        "files": {"p95_ms": 10, "rps": 500, "errors": 0},
+    }}
+    results = {
+        "prompt": {"p95_ms": 120, "rps": 45, "errors": 0},
+        "files": {"p95_ms": 20, "rps": 300, "errors": 1},
+        "upload": {"p95_ms": 999, "rps": 1, "errors": 0},
+    }
+    failures = compare(results, baseline, tolerance=0.25)
+    assert failures == [
+        "files: p95 20 ms vs 10 ms", "files: 300 RPS vs 500 RPS", "files: 1 errors vs 0"
+    ]
+
+
+@pytest.mark.parametrize("fraction, expected", [(0.5, 5), (0.95, 10), (0.0, 1)])
+def test_percentile_is_nearest_rank(fraction, expected):
+    assert percentile(list(range(1, 11)), fraction) == expected
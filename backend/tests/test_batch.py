@@ -0,0 +1,29 @@
+from app.models import BatchPromptRequest, ParameterGrid
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+
+def grid(**values):
+    return {"prompts": ["Olá"], "model_ids": [MODEL_ID], **values}
+
+
+def test_grid_size_is_computed_without_expanding():
+    request = BatchPromptRequest(grid=ParameterGrid(**grid(temperatures=[0.0, 0.5, 1.0], max_tokens=[1, 2])))
+    assert request.size() == 6
+    assert len(request.expand()) == 6
+
+
+def test_invalid_grid_values_are_rejected_with_422(client):
+    for values in ({"temperatures": [2.0]}, {"max_tokens": [0]}, {"top_p": [-0.1]}, {"prompts": [""]}):
+        response = client.post("/api/prompt/batch", json={"grid": grid(**values)})
+        assert response.status_code == 422, values
+
+
+def test_oversized_grid_is_rejected_before_expanding(client, monkeypatch):
+    def fail():
+        raise AssertionError("expanded an oversized grid")
+    monkeypatch.setattr(ParameterGrid, "expand", lambda self: fail())
+    huge = grid(prompts=[f"p{i}" for i in range(1000)], temperatures=[i / 1000 for i in range(1000)])
+    response = client.post("/api/prompt/batch", json={"grid": huge})
+    assert response.status_code == 400
+    assert "1000000" in response.json()["detail"]
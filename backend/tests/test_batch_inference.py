@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from app.batch_inference import BatchInferenceError, BatchInferenceRunner
+from app.clients import get_s3_client
+from app.jobs import MemoryJobStore
+from app.providers import ProviderRegistry
+
+MODELS = ["anthropic.claude-3-haiku-20240307-v1:0", "meta.llama3-8b-instruct-v1:0"]
+
+
+class FakeControl:
+    def __init__(self, fail_on=None, status="Completed"):
+        self.fail_on = fail_on
+        self.status = status
+        self.created = []
+
+    def create_model_invocation_job(self, **params):
+        if params["modelId"] == self.fail_on:
+            self.fail_on = None
+            raise RuntimeError("Lambda timed out")
+        self.created.append(params)
+        return {"jobArn": f"arn:job/{params['clientRequestToken']}"}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        return {"status": self.status}
+
+
+def _runner(control, job_id, count=3):
+    runner = BatchInferenceRunner(
+        lambda: control, get_s3_client(), MemoryJobStore(), ProviderRegistry(),
+        role_arn="arn:role", prefix="test-batch", min_records=1, poll_seconds=0
+    )
+    requests = [
+        {"model_id": MODELS[i % 2], "prompt": f"p{i}", "temperature": 0.5, "max_tokens": 10, "top_p": 0.9}
+        for i in range(count)
+    ]
+    runner.check_requests(requests)
+    runner.store_requests(job_id, requests)
+    return runner
+
+
+def test_reentering_submit_only_creates_missing_jobs():
+    control = FakeControl(fail_on=MODELS[1])
+    runner = _runner(control, "resubmit")
+    with pytest.raises(RuntimeError):
+        runner.run("resubmit")
+    assert [params["modelId"] for params in control.created] == [MODELS[0]]
+
+    control.status = "Failed"
+    with pytest.raises(BatchInferenceError) as error:
+        runner.run("resubmit")
+    # The first model's job was recorded and not created again
+    assert [params["modelId"] for params in control.created] == MODELS
+    assert [job["status"] for job in error.value.jobs] == ["Failed", "Failed"]
+    names = [params["jobName"] for params in control.created]
+    assert names == ["prompt-tester-resubmit-0", "prompt-tester-resubmit-1"]
+
+
+def test_outputs_are_collected_in_record_order(standin, bucket):
+    control = FakeControl()
+    runner = _runner(control, "collect")
+    s3_client = get_s3_client()
+    claude_output = {"content": [{"text": "resposta"}], "usage": {"output_tokens": 4}}
+    standin.put_object(bucket, "test-batch/collect/output/anthropic-claude-3-haiku-20240307-v1-0/00000.jsonl.out", (
+        json.dumps({"recordId": "00000000000", "modelOutput": claude_output}) + "\n"
+        + json.dumps({"recordId": "00000000002", "error": {"errorMessage": "bad input"}}) + "\n"
+    ).encode(), "application/x-ndjson")
+
+    summary = runner.run("collect")
+    assert summary["records"] == 2
+    assert summary["errors"] == 1
+    assert summary["tokens_used"] == 4
+    results = [json.loads(line) for line in s3_client.get_object_bytes(summary["results_key"]).splitlines()]
+    assert results[0]["response"]["response_text"] == "resposta"
+    assert results[1] == {"index": 2, "model_id": MODELS[0], "response": None, "error": "bad input"}
@@ -0,0 +1,159 @@
+import asyncio
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.bedrock_client import BedrockClient
+from app.cache import TTLCache
+from app.config import Settings
+from app.rate_limiter import AdmissionTimeoutError, RateLimiter
+from app.response_cache import ResponseCache
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+
+@pytest.fixture
+def bedrock():
+    limiter = RateLimiter(Settings(
+        bedrock_initial_concurrency=1, bedrock_max_concurrency=1, bedrock_queue_timeout_seconds=0.2
+    ))
+    return BedrockClient(response_cache=ResponseCache(TTLCache(100, 60)), rate_limiter=limiter)
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def test_cache_hit_skips_a_saturated_limiter(standin, bedrock):
+    first = asyncio.run(bedrock.invoke_model_async("Hello", MODEL_ID, temperature=0))
+    assert first["cached"] is False
+    calls = standin.counts.get("bedrock:invoke", 0)
+    assert calls > 0
+
+    async def saturated():
+        # Hold the model's only slot while the cached request comes in
+        held = await bedrock.rate_limiter.acquire(MODEL_ID, 1)
+        try:
+            cached = await bedrock.invoke_model_async("Hello", MODEL_ID, temperature=0)
+            streamed = await _collect(
+                bedrock.invoke_model_stream_async("Hello", MODEL_ID, temperature=0)
+            )
+            with pytest.raises(AdmissionTimeoutError):
+                await bedrock.invoke_model_async("Something else", MODEL_ID, temperature=0)
+            return cached, streamed
+        finally:
+            held.release()
+
+    cached, streamed = asyncio.run(saturated())
+    assert cached["cached"] is True
+    assert cached["response_text"] == first["response_text"]
+    assert streamed[-1]["type"] == "done" and streamed[-1]["cached"] is True
+    assert standin.counts.get("bedrock:invoke", 0) == calls
+
+
+def test_titan_refund_counts_only_output_tokens(bedrock):
+    from app.providers import TitanAdapter
+
+    result = TitanAdapter().parse_response(
+        {"inputTextTokenCount": 40, "results": [{"outputText": "ok", "tokenCount": 10}]}, {}
+    )
+    assert (result["tokens_used"], result["output_tokens"]) == (50, 10)
+
+    class Admission:
+        def release(self, throttled, unused_tokens):
+            self.unused_tokens = unused_tokens
+
+    admission = Admission()
+    bedrock._release(admission, reserved=141, max_tokens=100, result=result, throttled=False)
+    assert admission.unused_tokens == 90
+
+
+class SlowRuntime:
+    """bedrock-runtime stub whose calls block, tracking how many overlap"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> dict:
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self.lock:
+            self.active -= 1
+        payload = {"content": [{"type": "text", "text": "ok"}], "usage": {"output_tokens": 1}}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+
+def test_invocations_run_on_a_bounded_pool_off_the_event_loop():
+    bedrock = BedrockClient()
+    bedrock.client = SlowRuntime(latency=0.2)
+    bedrock._executor = ThreadPoolExecutor(max_workers=2)
+
+    async def run():
+        ticks = 0
+        calls = asyncio.gather(*(
+            bedrock.invoke_model_async(f"Prompt {index}", MODEL_ID) for index in range(4)
+        ))
+        while not calls.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return await calls, ticks
+
+    results, ticks = asyncio.run(run())
+    assert [result["response_text"] for result in results] == ["ok"] * 4
+    assert bedrock.client.peak == 2
+    # Two waves of 0.2s: the loop kept ticking the whole time
+    assert ticks >= 20
+
+
+def test_identical_deterministic_calls_share_one_invocation():
+    bedrock = BedrockClient()
+    bedrock.client = SlowRuntime(latency=0.1)
+
+    async def run(temperature):
+        return await asyncio.gather(*(
+            bedrock.invoke_model_async("Same prompt", MODEL_ID, temperature=temperature) for _ in range(3)
+        ))
+
+    results = asyncio.run(run(0))
+    assert bedrock.client.calls == 1
+    assert sorted(bool(result.get("deduplicated")) for result in results) == [False, True, True]
+    assert {result["response_text"] for result in results} == {"ok"}
+
+    # Sampled (temperature > 0) calls are never shared
+    asyncio.run(run(0.7))
+    assert bedrock.client.calls == 4
+
+
+def test_followers_get_the_leader_error():
+    bedrock = BedrockClient()
+
+    class FailingRuntime:
+        calls = 0
+
+        def invoke_model(self, **kwargs):
+            FailingRuntime.calls += 1
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+    bedrock.client = FailingRuntime()
+
+    async def run():
+        return await asyncio.gather(*(
+            bedrock.invoke_model_async("Same prompt", MODEL_ID, temperature=0) for _ in range(3)
+        ), return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert FailingRuntime.calls == 1
+    assert all("boom" in str(error) for error in errors)
+    assert bedrock._in_flight == {}
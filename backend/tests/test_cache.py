@@ -0,0 +1,50 @@
+import time
+
+from app.cache import SQLiteCacheTier, TTLCache
+from app.metrics import REGISTRY
+from app.response_cache import LOOKUPS, PERSISTENT_ERRORS, ResponseCache
+
+
+def expires_at(cache: TTLCache, key: str) -> float:
+    return cache._entries[key][0]
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(2, 60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_persistent_hit_keeps_its_remaining_ttl(tmp_path):
+    tier = SQLiteCacheTier(str(tmp_path / "cache.db"), ttl_seconds=1000)
+    tier.set("key", {"response_text": "hi"})
+    # About to expire in the persistent tier
+    tier._conn.execute("UPDATE cache SET expires_at = ?", (time.time() + 5,))
+
+    cache = ResponseCache(TTLCache(10, 1000), tier)
+    assert cache.get("key") == {"response_text": "hi"}
+    assert cache.persistent_hits == 1
+    assert expires_at(cache.memory, "key") <= time.time() + 5
+
+
+def test_persistent_write_errors_are_counted():
+    class BrokenTier:
+        def get_entry(self, key):
+            return None
+
+        def set(self, key, value):
+            raise RuntimeError("S3 unavailable")
+
+    cache = ResponseCache(TTLCache(10, 1000), BrokenTier())
+    errors = PERSISTENT_ERRORS.value(operation="set")
+    misses, hits = LOOKUPS.value(result="miss"), LOOKUPS.value(result="hit")
+
+    assert cache.get("key") is None
+    cache.set("key", {"response_text": "hi"})
+    assert cache.get("key") == {"response_text": "hi"}
+    assert PERSISTENT_ERRORS.value(operation="set") - errors == 1
+    assert (LOOKUPS.value(result="miss") - misses, LOOKUPS.value(result="hit") - hits) == (1, 1)
+    assert "response_cache_lookups_total{" in REGISTRY.render()
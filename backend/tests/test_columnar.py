@@ -0,0 +1,60 @@
+import hashlib
+import json
+import random
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.columnar import ColumnarIndexer
+from app.s3_client import S3Client
+
+
+def _csv(rows):
+    rng = random.Random(7)
+    lines = ["id,score,payload"]
+    for i in range(rows):
+        score = ("nan", "inf", f"{rng.random():.6f}")[i % 3]
+        lines.append(f"{i},{score},{rng.getrandbits(256):064x}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.fixture
+def s3():
+    client = S3Client()
+    # Small parts so the Parquet copy goes up as a multipart upload
+    client.part_size = 64 * 1024
+    return client
+
+
+def test_parquet_copy_is_uploaded_in_parts_while_it_is_written(standin, bucket, s3):
+    data = _csv(20000)
+    key = f"uploads/{hashlib.sha256(data).hexdigest()[:16]}_scores.csv"
+    standin.put_object(bucket, key, data, "text/csv")
+    completed = standin.counts.get("s3:CompleteMultipartUpload", 0)
+
+    index = ColumnarIndexer(s3, chunk_rows=5000).ingest(key)
+
+    assert standin.counts.get("s3:CompleteMultipartUpload", 0) == completed + 1
+    assert s3.head_object(index["columnar_key"])["size"] > s3.part_size
+    batches = list(ColumnarIndexer(s3).iter_columns(index, ["id"], 10000))
+    assert sum(len(batch["id"]) for batch in batches) == 20000
+
+    # nan/inf are not JSON: stored as null, and the index stays standard JSON
+    score = index["columns"][1]
+    assert score["type"] == "number" and score["max"] is None
+    json.loads(s3.get_object_bytes(ColumnarIndexer.index_key(key)), parse_constant=pytest.fail)
+
+
+def test_mismatching_content_leaves_no_parquet_copy(standin, bucket, s3):
+    data = _csv(20000)
+    key = f"uploads/{'0' * 16}_forged.csv"
+    standin.put_object(bucket, key, data, "text/csv")
+    aborted = standin.counts.get("s3:AbortMultipartUpload", 0)
+
+    with pytest.raises(ValueError):
+        ColumnarIndexer(s3, chunk_rows=5000).ingest(key)
+    assert s3.head_object(key) is None
+    assert s3.head_object(ColumnarIndexer.columnar_key(key)) is None
+    # The parts already uploaded were discarded
+    assert standin.counts.get("s3:AbortMultipartUpload", 0) == aborted + 1
@@ -0,0 +1,66 @@
+import asyncio
+import csv
+import io
+
+import pytest
+
+from app.clients import get_s3_client
+from app.evaluation import EvaluationRunner, PromptTemplate
+from app.jobs import JobContinuation, MemoryJobStore
+
+
+class CountingBedrock:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def invoke_model_async(self, prompt, **params):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return {"response_text": prompt.upper(), "tokens_used": 3}
+
+
+def test_template_renders_columns_with_spaces_and_literal_braces():
+    template = PromptTemplate("Resuma {{texto}}: { descrição curta }")
+    assert template.columns == ["descrição curta"]
+    assert template.render({"descrição curta": "olá"}) == "Resuma {texto}: olá"
+
+
+def test_evaluation_keeps_rows_in_flight_across_chunks(standin, bucket):
+    s3_client = get_s3_client()
+    rows = "".join(f"{i},item {i}\n" for i in range(20))
+    standin.put_object(bucket, "uploads/eval.csv", ("id,name\n" + rows).encode(), "text/csv")
+    bedrock = CountingBedrock()
+    store = MemoryJobStore()
+    job = store.create("evaluate", {})
+    runner = EvaluationRunner(bedrock, s3_client, store, prefix="test-evaluations", chunk_rows=3)
+
+    summary = runner.run(job["job_id"], "uploads/eval.csv", "say {name}", "m", concurrency=5)
+
+    # Chunks of 3 rows never cap the 5 rows allowed in flight
+    assert bedrock.max_in_flight == 5
+    assert summary["rows_done"] == 20
+    assert store.get(job["job_id"])["progress"]["rows_done"] == 20
+    results = list(csv.DictReader(io.StringIO(s3_client.get_object_bytes(summary["results_key"]).decode())))
+    assert [r["row"] for r in results] == [str(i) for i in range(20)]
+    assert results[7]["response_text"] == "SAY ITEM 7"
+
+
+def test_evaluation_out_of_time_continues_from_its_checkpoint(standin, bucket):
+    s3_client = get_s3_client()
+    rows = "".join(f"{i},item {i}\n" for i in range(10))
+    standin.put_object(bucket, "uploads/eval-budget.csv", ("id,name\n" + rows).encode(), "text/csv")
+    store = MemoryJobStore()
+    job = store.create("evaluate", {})
+    runner = EvaluationRunner(CountingBedrock(), s3_client, store, prefix="test-evaluations",
+                              chunk_rows=4, time_budget_seconds=0)
+
+    with pytest.raises(JobContinuation):
+        runner.run(job["job_id"], "uploads/eval-budget.csv", "say {name}", "m")
+    assert store.get(job["job_id"])["progress"]["rows_done"] == 4
+
+    runner.time_budget_seconds = 60
+    summary = runner.run(job["job_id"], "uploads/eval-budget.csv", "say {name}", "m")
+    assert summary["rows_done"] == 10
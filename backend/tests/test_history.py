@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import time
+
+from app.history import RECORDS_DROPPED, HistoryStore
+
+
+class FailingS3:
+    def __init__(self):
+        self.failing = True
+        self.objects = {}
+
+    def put_object_bytes(self, key, data, content_type=None):
+        if self.failing:
+            raise RuntimeError("S3 unavailable")
+        self.objects[key] = data
+
+
+def test_unshipped_records_are_capped_while_s3_fails():
+    s3 = FailingS3()
+    path = os.path.join(tempfile.mkdtemp(), "history.db")
+    store = HistoryStore(path, s3_client=s3, flush_records=1, max_unshipped=5)
+    dropped = RECORDS_DROPPED.value()
+
+    for i in range(12):
+        store.append({"model_id": "m", "prompt": f"prompt {i}"})
+    store.flush()
+
+    # Everything is still in the local index; only the S3 backlog is capped
+    assert store.count() == 12
+    assert [r["prompt"] for r in store._unshipped] == [f"prompt {i}" for i in range(7, 12)]
+    assert RECORDS_DROPPED.value() - dropped == 7
+
+    s3.failing = False
+    store.append({"model_id": "m", "prompt": "prompt 12"})
+    store.flush()
+    assert store._unshipped == []
+    assert len(s3.objects) == 1
+
+
+class MemoryS3:
+    def __init__(self):
+        self.objects = {}
+        self.gets = 0
+
+    def put_object_bytes(self, key, data, content_type=None):
+        self.objects[key] = data
+
+    def get_object_bytes(self, key):
+        self.gets += 1
+        return self.objects.get(key)
+
+    def list_keys(self, prefix, start_after=None):
+        return [k for k in sorted(self.objects) if k.startswith(prefix) and (not start_after or k > start_after)]
+
+    def delete_keys(self, keys):
+        for key in keys:
+            self.objects.pop(key, None)
+
+
+def _store(s3, **kwargs):
+    return HistoryStore(os.path.join(tempfile.mkdtemp(), "history.db"), s3_client=s3, **kwargs)
+
+
+def test_ship_immediately_writes_a_segment_per_flush():
+    s3 = MemoryS3()
+    store = _store(s3, flush_records=100, flush_seconds=60, ship_immediately=True)
+
+    store.append({"model_id": "m", "prompt": "one"})
+    store.flush()
+    assert len(s3.objects) == 1
+    store.append({"model_id": "m", "prompt": "two"})
+    store.flush()
+    assert len(s3.objects) == 2
+
+
+def test_past_days_are_compacted_and_read_by_a_cold_instance():
+    s3 = MemoryS3()
+    for i in range(5):
+        record = json.dumps({"id": f"old{i}", "timestamp": "2024-01-01T00:00:00", "model_id": "m", "prompt": f"old {i}"})
+        s3.objects[f"history/segments/20240101T00000{i}000000-aaaa{i}.jsonl"] = (record + "\n").encode()
+    writer = _store(s3, ship_immediately=True)
+    writer.append({"model_id": "m", "prompt": "today"})
+    writer.flush()
+
+    compactor = _store(s3)
+    compactor.query()
+    compacted = [k for k in s3.objects if k.startswith("history/compacted/20240101-")]
+    assert len(compacted) == 1
+    assert not any(k.startswith("history/segments/20240101") for k in s3.objects)
+
+    # A fresh instance reads one compacted object plus today's segment
+    s3.gets = 0
+    cold = _store(s3)
+    page = cold.query()
+    assert s3.gets == 2
+    assert sorted(item["prompt"] for item in page["items"]) == ["old 0", "old 1", "old 2", "old 3", "old 4", "today"]
+
+
+def test_queries_wait_a_bounded_time_for_a_slow_sync():
+    class SlowS3(MemoryS3):
+        def list_keys(self, prefix, start_after=None):
+            time.sleep(0.5)
+            return super().list_keys(prefix, start_after)
+
+    store = _store(SlowS3(), sync_wait_seconds=0.05, compact_interval_seconds=0)
+    started = time.monotonic()
+    store.query()
+    assert time.monotonic() - started < 0.4
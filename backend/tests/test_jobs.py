@@ -0,0 +1,171 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.clients import get_s3_client
+from app.jobs import (
+    FAILED, PENDING, RUNNING, SUCCEEDED, JobContinuation, JobRunner, MemoryJobStore, S3JobStore, SQLiteJobStore
+)
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object_bytes(self, key, data, content_type=None):
+        self.objects[key] = data
+
+    def get_object_bytes(self, key):
+        return self.objects.get(key)
+
+    def get_object_with_etag(self, key):
+        data = self.objects.get(key)
+        return (data, str(hash(data))) if data is not None else None
+
+    def put_object_if_match(self, key, data, etag, content_type=None):
+        if key not in self.objects or str(hash(self.objects[key])) != etag:
+            return False
+        self.objects[key] = data
+        return True
+
+
+def test_lambda_dispatch_rejects_memory_store():
+    with pytest.raises(ValueError):
+        JobRunner(MemoryJobStore(), FakeS3(), dispatch="lambda")
+
+
+def test_lambda_dispatch_accepts_shared_store():
+    s3 = FakeS3()
+    runner = JobRunner(S3JobStore(s3, "jobs"), s3, dispatch="lambda")
+    assert runner.dispatch == "lambda"
+
+
+def test_auto_dispatch_falls_back_to_threads_with_memory_store(monkeypatch):
+    from app import clients
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "llm-prompt-tester")
+    monkeypatch.setenv("JOB_STORE", "memory")
+    monkeypatch.setenv("JOB_DISPATCH", "auto")
+    clients.get_settings.cache_clear()
+    clients.get_job_runner.cache_clear()
+    try:
+        assert clients.get_job_runner().dispatch == "thread"
+    finally:
+        monkeypatch.undo()
+        clients.get_settings.cache_clear()
+        clients.get_job_runner.cache_clear()
+
+
+def test_failed_job_is_recorded():
+    s3 = FakeS3()
+    runner = JobRunner(MemoryJobStore(), s3)
+
+    def boom(job_id):
+        raise RuntimeError("boom")
+
+    runner.register("ok", lambda job_id: {"done": True})
+    runner.register("boom", boom)
+
+    job = runner.store.create("boom", {})
+    assert runner.run(job["job_id"])["status"] == FAILED
+    assert runner.get(job["job_id"])["error"] == "boom"
+
+    job = runner.store.create("ok", {})
+    assert runner.run(job["job_id"])["status"] == SUCCEEDED
+    assert runner.get_result(job["job_id"]) == {"done": True}
+
+
+def test_dispatch_failure_is_recorded(monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "llm-prompt-tester")
+
+    class BrokenLambda:
+        def invoke_event(self, function_name, payload):
+            raise RuntimeError("Lambda unavailable")
+
+    s3 = FakeS3()
+    runner = JobRunner(S3JobStore(s3, "jobs"), s3, lambda_client=BrokenLambda(), dispatch="lambda")
+    runner.register("ingest", lambda job_id, csv_key: {})
+    with pytest.raises(RuntimeError):
+        runner.submit("ingest", {"csv_key": "data/a.csv"}, job_id="ingest-a")
+
+    job = runner.get("ingest-a")
+    assert job["status"] == FAILED
+    assert "Lambda unavailable" in job["error"]
+
+
+def test_only_stale_running_jobs_can_be_resumed():
+    runner = JobRunner(MemoryJobStore(), FakeS3(), stale_after_seconds=60)
+    runner.register("ok", lambda job_id: {"done": True})
+    job = runner.store.create("ok", {})
+    runner.store.update(job["job_id"], status=RUNNING)
+    with pytest.raises(ValueError):
+        runner.resume(job["job_id"])
+
+    # The execution died without recording it: no heartbeat for too long
+    stale = runner.store.get(job["job_id"])
+    stale["updated_at"] = (datetime.utcnow() - timedelta(seconds=120)).isoformat()
+    runner.store.save(stale)
+    runner.resume(job["job_id"])
+    runner._executor.shutdown(wait=True)
+    assert runner.get(job["job_id"])["status"] == SUCCEEDED
+
+
+def test_running_jobs_heartbeat():
+    runner = JobRunner(MemoryJobStore(), FakeS3(), stale_after_seconds=0.2)
+    release = threading.Event()
+    runner.register("slow", lambda job_id: release.wait(5))
+    job = runner.store.create("slow", {})
+    thread = threading.Thread(target=runner.run, args=(job["job_id"],))
+    thread.start()
+    time.sleep(0.5)
+    assert not runner._is_stale(runner.get(job["job_id"]))
+    release.set()
+    thread.join()
+
+
+@pytest.mark.parametrize("make_store", [
+    MemoryJobStore,
+    lambda: SQLiteJobStore(":memory:"),
+    lambda: S3JobStore(FakeS3(), "jobs"),
+    lambda: S3JobStore(get_s3_client(), "test-jobs")
+])
+def test_duplicate_deliveries_run_a_job_once(make_store):
+    runner = JobRunner(make_store(), FakeS3())
+    calls = []
+    runner.register("count", lambda job_id: calls.append(job_id) or len(calls))
+    job = runner.store.create("count", {})
+
+    assert runner.run(job["job_id"])["status"] == SUCCEEDED
+    # A second delivery of the same event finds the job already done
+    assert runner.run(job["job_id"])["status"] == SUCCEEDED
+    assert calls == [job["job_id"]]
+    assert runner.store.claim(job["job_id"]) is None
+
+
+def test_continued_jobs_are_claimed_again():
+    runner = JobRunner(MemoryJobStore(), FakeS3())
+    steps = []
+
+    def two_steps(job_id):
+        steps.append(len(steps))
+        if len(steps) == 1:
+            raise JobContinuation()
+        return {"steps": len(steps)}
+
+    runner.register("two_steps", two_steps)
+    job = runner.store.create("two_steps", {})
+    assert runner.run(job["job_id"])["status"] == PENDING
+    runner._executor.shutdown(wait=True)
+    assert runner.get(job["job_id"])["status"] == SUCCEEDED
+    assert runner.get_result(job["job_id"]) == {"steps": 2}
+
+
+def test_s3_conditional_write_loses_to_a_concurrent_writer():
+    s3_client = get_s3_client()
+    s3_client.put_object_bytes("test-jobs/race.json", b"v1")
+    data, etag = s3_client.get_object_with_etag("test-jobs/race.json")
+    s3_client.put_object_bytes("test-jobs/race.json", b"v2")
+    assert s3_client.put_object_if_match("test-jobs/race.json", b"v3", etag) is False
+    assert s3_client.put_object_if_match("test-jobs/race.json", b"v3", s3_client.get_object_with_etag("test-jobs/race.json")[1])
+    assert s3_client.get_object_bytes("test-jobs/race.json") == b"v3"
@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+from app.local_processing import LocalProcessingClient
+from app.s3_client import S3Client
+
+CSV = "name,age,city\nada,36,london\ngrace,,new york\nalan,41,london\nkatherine,x\n"
+
+
+def test_aggregates_do_not_depend_on_the_chunk_size():
+    whole = LocalProcessingClient().process_stream(io.StringIO(CSV), "alumno", ["age", "city"])
+    chunked = LocalProcessingClient(chunk_rows=1).process_stream(io.StringIO(CSV), "alumno", ["age", "city"])
+    assert chunked == whole
+    assert whole["row_count"] == 4
+
+    city = whole["columns"]["city"]
+    # The short last row counts as missing
+    assert (city["count"], city["missing"], city["distinct"]) == (3, 1, 2)
+    assert city["top_values"][0] == {"value": "london", "count": 2}
+    assert city["numeric"] is None
+    # One non-numeric value drops the numeric summary
+    assert whole["columns"]["age"]["numeric"] is None
+
+
+def test_numeric_summary_and_distinct_cap():
+    rows = "value\n" + "".join(f"{i}\n" for i in range(10))
+    result = LocalProcessingClient(max_distinct=4, top_n=2).process_stream(io.StringIO(rows), "alumno", ["value"])
+    value = result["columns"]["value"]
+    assert value["numeric"] == {"min": 0.0, "max": 9.0, "mean": 4.5}
+    assert value["distinct_truncated"] is True
+    assert value["distinct"] == 4
+    assert len(value["top_values"]) == 2
+
+
+def test_csv_is_streamed_from_s3(standin, bucket):
+    standin.put_object(bucket, "uploads/local.csv", ("\ufeff" + CSV).encode(), "text/csv")
+    client = LocalProcessingClient(S3Client())
+    result = client.invoke_processing("uploads/local.csv", "professor", ["name"])
+    assert result["csv_key"] == "uploads/local.csv"
+    assert result["columns"]["name"]["count"] == 4
+
+    with pytest.raises(Exception, match="Columns not found in CSV: email"):
+        client.invoke_processing("uploads/local.csv", "professor", ["email"])
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.metrics import MODEL_LABELS, LabelValues
+from app.providers import ProviderRegistry
+from app.rate_limiter import ADMISSION_WAIT_SECONDS, RateLimiter
+from app.config import Settings
+
+
+def test_label_values_are_admitted_up_to_the_cap():
+    labels = LabelValues(max_values=2)
+    assert labels("a") == "other"
+    labels.admit("a")
+    labels.admit("b")
+    labels.admit("c")
+    assert (labels("a"), labels("b"), labels("c")) == ("a", "b", "other")
+
+
+def test_unknown_model_ids_share_one_series():
+    limiter = RateLimiter(Settings(bedrock_default_rpm=1000, bedrock_default_tpm=10 ** 6))
+
+    async def admit(model_id):
+        admission = await limiter.acquire(model_id, 10)
+        admission.release(unused_request=True)
+
+    for i in range(5):
+        asyncio.run(admit(f"random.model-{i}"))
+    assert not any(key[0].startswith("random.") for key in ADMISSION_WAIT_SECONDS._series)
+    assert limiter._per_label("in_flight") == {("other",): 0}
+    assert MODEL_LABELS("random.model-0") == "other"
+
+
+def test_provider_memo_is_bounded():
+    registry = ProviderRegistry(default="converse")
+    for i in range(ProviderRegistry.MEMO_SIZE + 10):
+        assert registry.resolve(f"random.model-{i}").name == "converse"
+    assert len(registry._resolved) == ProviderRegistry.MEMO_SIZE
+
+
+def test_rate_limiter_keeps_a_bounded_set_of_models():
+    limiter = RateLimiter(Settings(bedrock_default_rpm=10 ** 6, bedrock_default_tpm=10 ** 9))
+
+    async def admit(model_id, release=True):
+        admission = await limiter.acquire(model_id, 10)
+        if release:
+            admission.release(unused_request=True)
+        return admission
+
+    busy = asyncio.run(admit("busy.model", release=False))
+    for i in range(RateLimiter.MAX_MODELS + 20):
+        asyncio.run(admit(f"random.model-{i}"))
+    assert len(limiter._models) == RateLimiter.MAX_MODELS
+    # A model with requests in flight is never dropped
+    assert limiter.for_model("busy.model") is busy
@@ -0,0 +1,30 @@
+import time
+
+from app.model_catalog import ModelCatalog
+from app.providers import ProviderRegistry
+
+
+def _wait_for_refresh(catalog):
+    deadline = time.time() + 5
+    while catalog._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_failed_refresh_backs_off():
+    calls = []
+
+    def failing_client():
+        calls.append(1)
+        raise RuntimeError("AccessDenied")
+
+    catalog = ModelCatalog(failing_client, ProviderRegistry(), fallback=[], ttl_seconds=3600)
+    for _ in range(3):
+        assert catalog.list_models() == []
+        _wait_for_refresh(catalog)
+    assert len(calls) == 1
+
+    # Retried once the backoff has passed
+    catalog._failed_at -= ModelCatalog.RETRY_SECONDS
+    catalog.list_models()
+    _wait_for_refresh(catalog)
+    assert len(calls) == 2
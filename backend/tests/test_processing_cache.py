@@ -0,0 +1,73 @@
+import json
+import time
+
+from app.cache import S3CacheTier, TTLCache
+from app.processing_cache import LOOKUPS, ProcessingCache
+
+
+class FakeS3:
+    """head_object / get / put of an S3Client, in memory"""
+
+    def __init__(self):
+        self.objects = {}
+        self.etag = "v1"
+
+    def head_object(self, key):
+        return {"etag": self.etag, "size": 1}
+
+    def get_object_bytes(self, key):
+        return self.objects.get(key)
+
+    def put_object_bytes(self, key, data, content_type=None):
+        self.objects[key] = data
+
+
+class CountingProcessor:
+    def __init__(self):
+        self.calls = []
+
+    def invoke_processing(self, csv_key, target, columns):
+        self.calls.append(list(columns))
+        return {"row_count": 2, "columns": {column: {"count": 2} for column in columns}}
+
+
+def expires_at(cache: TTLCache, key: str) -> float:
+    return cache._entries[key][0]
+
+
+def test_processing_cache_answers_subsets_from_a_cached_superset():
+    processor = CountingProcessor()
+    s3 = FakeS3()
+    cache = ProcessingCache(processor, s3, TTLCache(100, 60))
+    misses, superset_hits = LOOKUPS.value(result="miss"), LOOKUPS.value(result="superset_hit")
+
+    full = cache.invoke_processing("uploads/a.csv", "alumno", ["A", "B", "C"])
+    subset = cache.invoke_processing("uploads/a.csv", "alumno", ["C", "A"])
+    assert processor.calls == [["A", "B", "C"]]
+    assert list(subset["columns"]) == ["C", "A"]
+    assert subset["columns"]["A"] == full["columns"]["A"]
+    assert LOOKUPS.value(result="miss") - misses == 1
+    assert LOOKUPS.value(result="superset_hit") - superset_hits == 1
+
+    # A new object version is never answered from the old results
+    s3.etag = "v2"
+    cache.invoke_processing("uploads/a.csv", "alumno", ["A"])
+    assert processor.calls[-1] == ["A"]
+
+
+def test_processing_cache_promotion_keeps_remaining_ttl():
+    s3 = FakeS3()
+    tier = S3CacheTier(s3, "cache/processing", ttl_seconds=1000)
+    first = ProcessingCache(CountingProcessor(), s3, TTLCache(100, 1000), tier)
+    first.invoke_processing("uploads/a.csv", "alumno", ["A"])
+
+    # Another instance, with the shared entries close to expiring
+    for key, data in s3.objects.items():
+        entry = json.loads(data)
+        entry["expires_at"] = time.time() + 5
+        s3.objects[key] = json.dumps(entry).encode("utf-8")
+    processor = CountingProcessor()
+    second = ProcessingCache(processor, s3, TTLCache(100, 1000), tier)
+    second.invoke_processing("uploads/a.csv", "alumno", ["A"])
+    assert processor.calls == []
+    assert all(expires_at(second.memory, key) <= time.time() + 5 for key in second.memory._entries)
@@ -0,0 +1,92 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models import PromptRequest
+from app.providers import AnthropicAdapter, ConverseAdapter, ProviderRegistry
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+SYSTEM = [{"text": "You grade essays.", "cache": False}, {"text": "Rubric: ...", "cache": True}]
+
+
+def test_flagged_blocks_end_a_cacheable_prefix():
+    messages = [{"role": "user", "content": [{"text": "Essay", "cache": False}]}]
+    body = AnthropicAdapter().build_request(None, 0, 100, 0.9, SYSTEM, messages)
+    assert body["system"] == [
+        {"type": "text", "text": "You grade essays."},
+        {"type": "text", "text": "Rubric: ...", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert body["messages"] == [{"role": "user", "content": [{"type": "text", "text": "Essay"}]}]
+
+    request = ConverseAdapter().build_request("Essay", 0, 100, 0.9, SYSTEM)
+    assert request["system"] == [
+        {"text": "You grade essays."}, {"text": "Rubric: ..."}, {"cachePoint": {"type": "default"}}
+    ]
+
+
+def test_cache_token_counts_are_reported():
+    result = AnthropicAdapter().parse_response({
+        "content": [{"type": "text", "text": "B+"}],
+        "usage": {"output_tokens": 2, "cache_read_input_tokens": 1200, "cache_creation_input_tokens": 0}
+    }, {})
+    assert (result["cache_read_tokens"], result["cache_write_tokens"]) == (1200, 0)
+
+    usage = {}
+    adapter = AnthropicAdapter()
+    adapter.parse_stream_chunk({"type": "message_start", "message": {"usage": {
+        "input_tokens": 5, "cache_creation_input_tokens": 1200
+    }}}, usage)
+    adapter.parse_stream_chunk({"type": "message_delta", "usage": {"output_tokens": 3}}, usage)
+    assert adapter.stream_usage(usage)["cache_write_tokens"] == 1200
+
+
+def test_cache_checkpoints_are_limited():
+    blocks = [{"text": f"Part {i}", "cache": True} for i in range(5)]
+    with pytest.raises(ValidationError):
+        PromptRequest(model_id=MODEL_ID, system=blocks[:3], messages=[{"role": "user", "content": blocks[3:]}])
+    request = PromptRequest(model_id=MODEL_ID, system=blocks[:4], prompt="Go")
+    assert request.invocation_params()["system"][3] == {"text": "Part 3", "cache": True}
+
+
+def test_structured_prompts_are_accepted_by_the_api(client):
+    response = client.post("/api/prompt", json={
+        "model_id": MODEL_ID,
+        "system": SYSTEM,
+        "messages": [
+            {"role": "user", "content": "First essay"},
+            {"role": "assistant", "content": "B"},
+            {"role": "user", "content": [{"text": "Second essay"}]}
+        ]
+    })
+    assert response.status_code == 200
+    assert response.json()["response_text"]
+
+
+@pytest.mark.parametrize("model_id, adapter", [
+    (MODEL_ID, "anthropic"),
+    ("meta.llama3-70b-instruct-v1:0", "llama"),
+    ("eu.meta.llama3-2-3b-instruct-v1:0", "llama"),
+    ("amazon.titan-text-express-v1", "titan"),
+    ("mistral.mistral-large-2402-v1:0", "mistral"),
+    ("cohere.command-r-plus-v1:0", "cohere"),
+    ("us.amazon.nova-pro-v1:0", "converse"),
+])
+def test_builtin_prefixes_resolve_to_their_adapter(model_id, adapter):
+    assert ProviderRegistry().resolve(model_id).name == adapter
+
+
+def test_overrides_and_default_adapter():
+    registry = ProviderRegistry(
+        overrides={"anthropic.claude-3-haiku": "converse", "ai21.jamba": "converse"},
+        default="titan"
+    )
+    # The longest matching prefix wins
+    assert registry.resolve("anthropic.claude-3-haiku-20240307-v1:0").name == "converse"
+    assert registry.resolve("anthropic.claude-3-opus-20240229-v1:0").name == "anthropic"
+    assert registry.resolve("ai21.jamba-1-5-large-v1:0").name == "converse"
+    assert registry.resolve("writer.palmyra-x5-v1:0").name == "titan"
+
+    with pytest.raises(ValueError, match="Unsupported model"):
+        ProviderRegistry().resolve("writer.palmyra-x5-v1:0")
+    with pytest.raises(ValueError, match="Unknown provider adapter"):
+        ProviderRegistry(overrides={"ai21.": "jurassic"})
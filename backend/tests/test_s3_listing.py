@@ -0,0 +1,31 @@
+from app.s3_client import S3Client
+
+
+def test_filtered_listing_stops_after_the_page_budget(standin, bucket):
+    for i in range(2500):
+        standin.put_object(bucket, f"t008/file_{i:05d}.csv", b"A\n1\n", "text/csv")
+    standin.put_object(bucket, "t008/zz_needle.csv", b"A\n1\n", "text/csv")
+    s3 = S3Client()
+    s3.list_max_pages = 2
+
+    before = standin.counts.get("s3:ListObjectsV2", 0)
+    page = s3.list_files(prefix="t008/", name_contains="needle")
+    assert standin.counts["s3:ListObjectsV2"] - before == 2
+    assert page["files"] == []
+    assert page["next_cursor"] == "t008/file_01999.csv"
+
+    page = s3.list_files(prefix="t008/", cursor=page["next_cursor"], name_contains="needle")
+    assert [f["filename"] for f in page["files"]] == ["zz_needle.csv"]
+    assert page["next_cursor"] is None
+
+
+def test_unfiltered_listing_pages_with_a_cursor(standin, bucket):
+    for i in range(5):
+        standin.put_object(bucket, f"t008b/f{i}.csv", b"A\n1\n", "text/csv")
+        standin.put_object(bucket, f"t008b/f{i}.csv.index.json", b"{}", "application/json")
+    s3 = S3Client()
+    first = s3.list_files(prefix="t008b/", limit=3)
+    assert [f["filename"] for f in first["files"]] == ["f0.csv", "f1.csv", "f2.csv"]
+    rest = s3.list_files(prefix="t008b/", limit=3, cursor=first["next_cursor"])
+    assert [f["filename"] for f in rest["files"]] == ["f3.csv", "f4.csv"]
+    assert rest["next_cursor"] is None
@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.semantic_cache import LOOKUPS, HashingEmbedder, SemanticCache, VectorIndex
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+TEMPLATE = (
+    "You are a sentiment classifier. Read the customer review below and answer with exactly one word, "
+    "positive or negative, and nothing else. Do not explain your answer. Review: the product arrived "
+    "on time, the packaging was intact and overall the experience was {}."
+)
+
+
+def _cache():
+    return SemanticCache(HashingEmbedder(512), VectorIndex(512, 100, 3600))
+
+
+def _lookup(cache, prompt):
+    return cache.get(cache.query(prompt, MODEL_ID, 0, 100, 0.9))
+
+
+def test_hashing_embedder_misses_a_one_word_template_change():
+    cache = _cache()
+    cache.set(cache.query(TEMPLATE.format("great"), MODEL_ID, 0, 100, 0.9), {"response_text": "positive"})
+
+    # Almost the same n-grams, opposite answer
+    great, terrible = cache.embedder.embed([TEMPLATE.format("great"), TEMPLATE.format("terrible")])
+    assert float(great @ terrible) > 0.97
+    assert _lookup(cache, TEMPLATE.format("terrible")) is None
+
+
+def test_hashing_embedder_hits_whitespace_and_casing_changes():
+    cache = _cache()
+    cache.set(cache.query(TEMPLATE.format("great"), MODEL_ID, 0, 100, 0.9), {"response_text": "positive"})
+    hits = LOOKUPS.value(result="hit")
+
+    hit = _lookup(cache, "  " + TEMPLATE.format("GREAT").replace(" ", "\n  ", 2))
+    assert hit["response_text"] == "positive"
+    assert hit["semantic_similarity"] >= 0.99
+    assert LOOKUPS.value(result="hit") - hits == 1
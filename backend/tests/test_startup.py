@@ -0,0 +1,14 @@
+from benchmarks.startup import run_once
+
+
+def test_health_check_does_not_load_boto3():
+    # Fresh interpreter, like a new Lambda execution environment
+    result = run_once()
+    assert result["boto3_loaded_by_health"] is False
+
+
+def test_aws_clients_are_built_once_on_first_use():
+    from app import clients
+
+    assert clients.get_s3_client() is clients.get_s3_client()
+    assert clients.get_bedrock_client() is clients.get_bedrock_client()
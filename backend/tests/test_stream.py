@@ -0,0 +1,34 @@
+import json
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_sends_chunks_then_the_full_response(client, standin):
+    streams = standin.counts.get("bedrock:invoke-with-response-stream", 0)
+    response = client.post("/api/prompt/stream", json={"prompt": "Tell me a story", "model_id": MODEL_ID})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(response.text)
+    chunks = [data["text"] for event, data in events if event == "chunk"]
+    assert len(chunks) > 1
+    event, done = events[-1]
+    assert event == "done"
+    assert done["response_text"] == "".join(chunks)
+    assert done["tokens_used"] == len(chunks)
+    assert done["cached"] is False
+    assert standin.counts.get("bedrock:invoke-with-response-stream", 0) == streams + 1
+
+
+def test_stream_errors_before_the_first_event_are_http_errors(client):
+    response = client.post("/api/prompt/stream", json={"prompt": "Hi", "model_id": "unknown.model-v1"})
+    assert response.status_code == 500
+    assert "Unsupported model" in response.json()["detail"]
@@ -0,0 +1,49 @@
+from app.rate_limiter import estimate_request_tokens
+from app.tokens import count_tokens, estimate_input_tokens, model_family
+
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+
+def test_families_ignore_inference_profile_prefixes():
+    assert model_family(MODEL_ID) == "anthropic"
+    assert model_family("meta.llama2-13b-chat-v1") == "llama2"
+    assert model_family("eu.meta.llama3-2-3b-instruct-v1:0") == "llama3"
+    assert model_family("writer.palmyra-x5-v1:0") == "default"
+
+
+def test_counts_follow_the_family_tokenizer():
+    assert count_tokens(MODEL_ID, "") == 0
+    assert count_tokens(MODEL_ID, "Hello world") == 2
+    # Llama 2 splits numbers into single digits, Llama 3 into groups of three
+    assert count_tokens("meta.llama2-13b-chat-v1", "123456") == 6
+    assert count_tokens("meta.llama3-70b-instruct-v1:0", "123456") == 2
+    assert count_tokens(MODEL_ID, "internationalization") > 1
+
+
+def test_structured_prompts_add_their_chat_overhead():
+    plain = estimate_input_tokens(MODEL_ID, prompt="Grade this essay")
+    with_system = estimate_input_tokens(MODEL_ID, prompt="Grade this essay", system="You are a teacher")
+    assert with_system > plain
+    conversation = estimate_input_tokens(MODEL_ID, messages=[
+        {"role": "user", "content": [{"text": "Grade this essay"}]},
+        {"role": "assistant", "content": "B"},
+    ])
+    assert conversation > plain
+    assert estimate_request_tokens("Grade this essay", 100, MODEL_ID) == count_tokens(MODEL_ID, "Grade this essay") + 101
+
+
+def test_requests_over_the_model_limits_are_rejected_before_calling_bedrock(client, standin):
+    calls = standin.counts.get("bedrock:invoke", 0)
+
+    estimate = client.post("/api/prompt/estimate", json={"prompt": "Hello world", "model_id": MODEL_ID}).json()
+    assert estimate["fits"] is True
+    assert estimate["context_tokens"] == 200000
+
+    too_long = client.post("/api/prompt", json={"prompt": "word " * 300000, "model_id": MODEL_ID, "max_tokens": 1000})
+    assert too_long.status_code == 422
+    assert "context window" in too_long.json()["detail"]
+
+    too_many = client.post("/api/prompt", json={"prompt": "Hi", "model_id": MODEL_ID, "max_tokens": 10 ** 6})
+    assert too_many.status_code == 422
+    assert "exceeds the limit" in too_many.json()["detail"]
+    assert standin.counts.get("bedrock:invoke", 0) == calls
@@ -0,0 +1,144 @@
+import hashlib
+import time
+import urllib.request
+
+import pytest
+
+from app.s3_client import S3Client
+
+CSV = b"name,score\nada,3\ngrace,5\n"
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _wait_for(predicate, timeout: float = 5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_upload_is_deduplicated_by_full_hash(client, standin):
+    data = b"id,value\n1,t022-dedup\n"
+    first = client.post("/api/upload", files={"file": ("dedup.csv", data, "text/csv")}).json()
+    assert first["deduplicated"] is False
+    puts = standin.counts.get("s3:PutObject", 0)
+
+    second = client.post("/api/upload", files={"file": ("dedup.csv", data, "text/csv")}).json()
+    assert second["deduplicated"] is True
+    assert second["key"] == first["key"]
+    assert standin.counts.get("s3:PutObject", 0) == puts
+
+
+def test_hash_prefix_collision_is_not_a_match(client, standin, bucket):
+    sha256 = _sha256(b"id\nt022-collision\n")
+    other = sha256[:16] + "0" * 48
+    # Same key prefix, different content
+    standin.put_object(
+        bucket, f"uploads/{sha256[:16]}_other.csv", b"id\nother\n", "text/csv", metadata={"sha256": other}
+    )
+    assert client.post("/api/upload/check", json={"sha256": sha256}).json()["exists"] is False
+    assert client.post("/api/upload/check", json={"sha256": other}).json()["exists"] is True
+
+
+def _direct_multipart_upload(client, filename: str, data: bytes, declared: str) -> dict:
+    started = client.post("/api/upload/multipart", json={
+        "filename": filename, "part_count": 1, "sha256": declared
+    }).json()
+    request = urllib.request.Request(started["urls"][0]["url"], data=data, method="PUT")
+    with urllib.request.urlopen(request) as response:
+        etag = response.headers["ETag"]
+    completed = client.post("/api/upload/multipart/complete", json={
+        "key": started["key"],
+        "upload_id": started["upload_id"],
+        "parts": [{"part_number": 1, "etag": etag}]
+    })
+    assert completed.status_code == 200
+    return completed.json()
+
+
+def test_direct_upload_moves_to_its_content_key_once_verified(client):
+    s3 = S3Client()
+    sha256 = _sha256(CSV)
+    result = _direct_multipart_upload(client, "verified.csv", CSV, sha256)
+    content_key = s3.content_key(sha256, "verified.csv")
+    staging_key = s3.staging_key(sha256, "verified.csv")
+    # The response names the final key; it exists once the job succeeds
+    assert (result["key"], result["status"], result["filename"]) == (content_key, "verifying", "verified.csv")
+    assert _wait_for(lambda: client.get(f"/api/jobs/{result['job_id']}").json()["status"] == "succeeded")
+    assert s3.head_object(content_key) is not None
+    assert s3.head_object(staging_key) is None
+    assert s3.get_object_bytes(content_key) == CSV
+    assert s3.head_object(content_key)["metadata"]["sha256"] == sha256
+
+    check = client.post("/api/upload/check", json={"sha256": sha256}).json()
+    assert check["exists"] is True and check["file"]["key"] == content_key
+    # Known content: no upload URLs
+    again = client.post("/api/upload/multipart", json={
+        "filename": "verified.csv", "part_count": 1, "sha256": sha256
+    }).json()
+    assert again["exists"] is True and again["urls"] == []
+    presigned = client.post("/api/upload/presigned", json={"filename": "verified.csv", "sha256": sha256}).json()
+    assert presigned["exists"] is True and presigned["key"] == content_key
+
+
+def test_direct_upload_with_a_wrong_hash_is_discarded(client):
+    s3 = S3Client()
+    declared = _sha256(b"something else entirely")
+    result = _direct_multipart_upload(client, "forged.csv", CSV, declared)
+
+    assert _wait_for(lambda: client.get(f"/api/jobs/{result['job_id']}").json()["status"] == "failed")
+    assert s3.head_object(s3.staging_key(declared, "forged.csv")) is None
+    assert s3.head_object(s3.content_key(declared, "forged.csv")) is None
+    assert client.post("/api/upload/check", json={"sha256": declared}).json()["exists"] is False
+
+
+def test_verify_staged_upload_rejects_mismatched_content(standin, bucket):
+    s3 = S3Client()
+    staging_key = s3.staging_key(_sha256(b"declared"), "direct.csv")
+    standin.put_object(bucket, staging_key, b"actual", "text/csv")
+    with pytest.raises(ValueError):
+        s3.verify_staged_upload(staging_key)
+    assert s3.head_object(staging_key) is None
+
+
+def _large_csv(rows: int) -> bytes:
+    return b"id,payload\n" + b"".join(b"%d,%s\n" % (i, b"x" * 90) for i in range(rows))
+
+
+def test_large_upload_is_streamed_in_parts(client, standin, monkeypatch):
+    from app.clients import get_s3_client
+
+    s3 = get_s3_client()
+    monkeypatch.setattr(s3, "part_size", 64 * 1024)
+    data = _large_csv(2500)
+    parts = standin.counts.get("s3:UploadPart", 0)
+
+    result = client.post("/api/upload", files={"file": ("large.csv", data, "text/csv")}).json()
+    assert result["success"] is True
+    assert standin.counts.get("s3:UploadPart", 0) - parts == -(-len(data) // s3.part_size)
+    assert s3.get_object_bytes(result["key"]) == data
+
+
+def test_failed_streamed_upload_is_aborted(standin):
+    s3 = S3Client()
+    s3.part_size = 64 * 1024
+    uploads = set(standin.upload_keys)
+
+    class BrokenFile:
+        def __init__(self):
+            self.reads = 0
+
+        def read(self, size: int) -> bytes:
+            self.reads += 1
+            if self.reads > 1:
+                raise IOError("connection reset")
+            return b"x" * size
+
+    with pytest.raises(Exception, match="connection reset"):
+        s3.upload_stream(BrokenFile(), "broken.csv")
+    assert set(standin.upload_keys) == uploads
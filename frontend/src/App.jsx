@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useState, useEffect } from 'react';
 import ModelSelector from './components/ModelSelector';
 import ParametersPanel from './components/ParametersPanel';
 import PromptInput from './components/PromptInput';
@@ -23,6 +23,15 @@ function App() {
   // State for history
   const [history, setHistory] = useState([]);
 
+  // Load the history stored by the backend
+  useEffect(() => {
+    apiService.getHistory({ limit: 50, errors: false })
+      .then(page => setHistory(page.items.slice().reverse()))
+      .catch(() => {
+        // History is optional; keep the local one
+      });
+  }, []);
+
   // Handle prompt submission
   const handleSubmit = async () => {
     if (!prompt.trim() || !selectedModel) return;
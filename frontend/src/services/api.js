@@ -34,6 +34,51 @@ export const apiService = {
     return response.data;
   },
 
+  // Get past prompt runs stored by the backend, newest first.
+  // params: { cursor, limit, q, model_id, since, until, errors }
+  async getHistory(params = {}) {
+    const response = await api.get('/history', { params });
+    return response.data;
+  },
+
+  // Send prompt and receive the response as Server-Sent Events.
+  // onChunk is called with each text delta; resolves with the final response.
+  async streamPrompt(promptData, onChunk) {
+    const response = await fetch(`${API_BASE_URL}/prompt/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(promptData),
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const message = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        const event = message.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(message.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'chunk') onChunk?.(data.text);
+        else if (event === 'done') result = data;
+        else if (event === 'error') throw new Error(data.detail);
+      }
+    }
+    return result;
+  },
+
   // Upload CSV file
   async uploadFile(formData) {
     const response = await axios.post(`${API_BASE_URL}/upload`, formData, {